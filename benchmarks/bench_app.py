@@ -0,0 +1,188 @@
+"""
+Benchmark do app em escala: tempo e pico de memória das funções centrais.
+
+Para cada ponto de escala (usuários x anos de logs) gera um banco sintético
+(gerar_dados.py) e mede as funções do sparta_core e, para as telas, o
+study_app importado sem servidor (modo "bare" do Streamlit, num diretório
+temporário):
+
+    load / save          SpartaDataManager (save sem Sheets e sem snapshot)
+    calculate_streak     fogo de todos os usuários
+    ranking              ranking_rows sobre o banco inteiro
+    dashboard            limites de data + filtro por matéria do usuário com mais logs
+    serie_montagem       DailySeries (arrays por dia) de todos os usuários
+    serie_streak/serie_dashboard  fogo e filtros do Dashboard sobre as séries já montadas
+    tela_ranking         render_ranking (leitura + agregação + montagem da tela)
+    tela_dashboard       render_dashboard do usuário com mais logs (inclui gráficos)
+    tree_svg             generate_tree_svg para a árvore de cada usuário (sem o cache)
+    simulados_frio/quente pipeline de simulados (o que load_simulados chama) sem e com banco indexado
+
+O tempo é a mediana de --repeticoes execuções; o pico de memória vem de uma
+execução separada sob tracemalloc. --comparar aponta regressões em relação a
+um resultado salvo com --saida-json (código de saída 1).
+
+Uso:
+    python benchmarks/bench_app.py [--escalas 100x1 1000x1 1000x5] [--repeticoes 3]
+                                   [--saida-json base.json] [--comparar base.json --tolerancia 0.25]
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gerar_dados
+from sparta_core import daily_series, progression, simulados_pipeline, study_logs, tree
+from sparta_core.dates import get_today_br
+
+
+def parse_scale(text):
+    users, years = text.lower().split("x")
+    return int(users), float(years)
+
+
+def import_app(workdir):
+    """Importa study_app fora do servidor, com o banco e os snapshots dentro de workdir."""
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    os.chdir(workdir)
+    os.makedirs(".streamlit", exist_ok=True)
+    with open(os.path.join(".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+        f.write("# benchmark: sem Google Sheets\n")
+    import study_app
+    streamlit.logger.set_log_level("error")  # loggers criados durante o import
+    return study_app
+
+
+def measure(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mediana_s": statistics.median(samples), "min_s": min(samples), "pico_mb": peak / 1e6}
+
+
+def build_cases(app, db, pasta, bank_file):
+    users = {k: v for k, v in db.items() if k != "global_alerts"}
+    heaviest = max(users, key=lambda u: len(users[u]["logs"]))
+    dm = app.data_manager
+
+    def simulados_frio():
+        if os.path.exists(bank_file): os.remove(bank_file)
+        simulados_pipeline.load_bank(pasta, bank_file, workers=1)
+
+    def dashboard():
+        logs = users[heaviest]["logs"]
+        start, end = study_logs.date_bounds(logs)
+        study_logs.questions_by_subject(logs, start, end, users[heaviest]["subjects_list"])
+
+    series = {u: daily_series.DailySeries.build(d["logs"], d["subjects_list"]) for u, d in users.items()}
+
+    def serie_dashboard():
+        s = series[heaviest]
+        start, end = s.date_bounds()
+        s.questions_by_subject(start, end, users[heaviest]["subjects_list"])
+
+    def tree_svg():
+        tree.generate_tree_svg.cache_clear()
+        for d in users.values():
+            tree.generate_tree_svg(d["tree_branches"])
+
+    return [
+        ("load", dm.load),
+        ("save", lambda: dm.save(db, sync=False)),
+        ("calculate_streak", lambda: [progression.calculate_streak(d["logs"]) for d in users.values()]),
+        ("ranking", lambda: progression.ranking_rows(db)),
+        ("dashboard", dashboard),
+        ("serie_montagem", lambda: [daily_series.DailySeries.build(d["logs"], d["subjects_list"]) for d in users.values()]),
+        ("serie_streak", lambda: [s.streak(get_today_br()) for s in series.values()]),
+        ("serie_dashboard", serie_dashboard),
+        ("tela_ranking", lambda: app.render_ranking(heaviest, users[heaviest])),
+        ("tela_dashboard", lambda: app.render_dashboard(heaviest, users[heaviest])),
+        ("tree_svg", tree_svg),
+        ("simulados_frio", simulados_frio),
+        ("simulados_quente", lambda: simulados_pipeline.expand_simulados(simulados_pipeline.load_bank(pasta, bank_file, workers=1))),
+    ]
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for scale, cases in results.items():
+        for case, r in cases.items():
+            base = baseline.get(scale, {}).get(case)
+            if not base: continue
+            for metric in ("mediana_s", "pico_mb"):
+                if base[metric] > 0 and r[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f"{scale} {case} {metric}: {base[metric]:.4f} -> {r[metric]:.4f} (+{(r[metric] / base[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--escalas", nargs="+", default=["100x1", "1000x1", "1000x5"], help="usuários x anos")
+    parser.add_argument("--simulados", type=int, default=20)
+    parser.add_argument("--questoes", type=int, default=40)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--casos", nargs="+", default=None, help="Roda só estes casos")
+    parser.add_argument("--saida-json", default=None)
+    parser.add_argument("--comparar", default=None, help="Resultado anterior (--saida-json) para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="sparta_bench_")
+    cwd = os.getcwd()
+    try:
+        pasta = os.path.join(workdir, "simulados_sinteticos")
+        bank_file = os.path.join(workdir, "banco_sintetico.json")
+        gerar_dados.generate_bank(pasta, args.simulados, args.questoes)
+        app = import_app(workdir)
+        app.data_manager.snapshot_store = None
+
+        results = {}
+        print(f"{'escala':<10} {'caso':<18} {'mediana':>10} {'mínimo':>10} {'pico mem':>10}")
+        for scale in args.escalas:
+            n_users, years = parse_scale(scale)
+            db = gerar_dados.generate_db(n_users, years, simulados=args.simulados, questions=args.questoes)
+            with open(app.data_manager.db_file, "w", encoding="utf-8") as f:
+                json.dump(db, f, indent=4, default=str)
+            results[scale] = {}
+            for name, fn in build_cases(app, db, pasta, bank_file):
+                if args.casos and name not in args.casos: continue
+                r = measure(fn, args.repeticoes)
+                results[scale][name] = r
+                print(f"{scale:<10} {name:<18} {r['mediana_s']*1000:8.1f}ms {r['min_s']*1000:8.1f}ms {r['pico_mb']:8.1f}MB")
+            del db
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerancia)
+        for line in regressions:
+            print(f"[REGRESSÃO] {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Sessões concorrentes contra o JSON local e um Google Sheets falso.
+
+Cada sessão simulada (uma thread) faz login e alterna entre salvar um dia
+no Diário e responder uma questão de simulado, pelos mesmos caminhos do app
+(data_manager, credentials, cache de sessões e tabelas da coorte). O Sheets é
+o serviço em memória de fake_sheets.py, com latência e falhas injetadas.
+
+No fim compara o que cada sessão gravou com o estado final:
+    perdidas      escritas confirmadas que sumiram do JSON local
+    corrompido    JSON local ilegível
+    divergentes   linhas do Sheets diferentes do JSON local
+    duplicadas    usuários com mais de uma linha no Sheets
+e reporta vazão e latência (p50/p95/p99) por fluxo. Sai com código 1 se
+houver perda, corrupção ou divergência.
+
+Como o serviço falso vive no processo, as sessões são threads.
+
+Uso:
+    python benchmarks/bench_concurrency.py [--sessoes 32] [--usuarios 8] [--iteracoes 10]
+                                           [--latencia 0.05] [--falhas 0.02]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_app
+import fake_sheets
+import gerar_dados
+
+PASSWORD = "Senha123"
+SIMULADO = gerar_dados.simulado_key(1)
+
+
+def percentile(samples, p):
+    if not samples: return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Session:
+    """Uma aba de navegador: token próprio e as escritas que o app confirmou para ela."""
+
+    def __init__(self, app, username, index):
+        self.app = app
+        self.username = username
+        self.index = index
+        self.token = uuid.uuid4().hex
+        self.logs = set()
+        self.answers = set()
+        self.latencies = {"login": [], "diario": [], "simulado": []}
+        self.errors = []
+
+    def _timed(self, flow, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            self.errors.append(f"{flow}: {type(e).__name__}: {e}")
+            return False
+        finally:
+            self.latencies[flow].append(time.perf_counter() - start)
+        return True
+
+    def _record(self):
+        app = self.app
+        return app.get_user_cache().get(self.username, self.token, lambda: app.data_manager.load().get(self.username))
+
+    def _save(self, record):
+        # Mesmo caminho de save_current_user_data()
+        app = self.app
+        app.data_manager.save_user(self.username, record)
+        app.get_question_stats().update_user(self.username, record.get("simulados_progress", {}))
+        app.get_cohort_analytics().update_user(self.username, record)
+
+    def login(self):
+        app = self.app
+        db = app.data_manager.load()
+        if self.username not in db:
+            raise RuntimeError("usuário não encontrado no login")
+        ok, _ = app.credentials.verify_password(db[self.username]["password"], PASSWORD)
+        if not ok:
+            raise RuntimeError("senha recusada")
+        app.get_login_limiter().register_success(self.username)
+        app.get_user_cache().acquire(self.username, self.token, lambda: db[self.username])
+
+    def save_diario(self, i):
+        # Data exclusiva desta sessão/iteração, para saber exatamente o que deveria persistir
+        d = (date(2000, 1, 1) + timedelta(days=self.index * 1000 + i)).isoformat()
+        record = self._record()
+        record["logs"].append({
+            "data": d, "acordou": "06:00", "dormiu": "22:30", "paginas": 10, "series": 0,
+            "questoes": 5, "questoes_detalhadas": {"Penal": 5}, "estudou": True,
+        })
+        record["tree_branches"] = record.get("tree_branches", 1) + 1
+        self._save(record)
+        self.logs.add(d)
+
+    def answer(self, i):
+        q_id = f"s{self.index}_q{i}"
+        record = self._record()
+        progress = record.setdefault("simulados_progress", {}).setdefault(SIMULADO, {})
+        progress[q_id] = {"resposta": "Certo", "acertou": i % 3 != 0}
+        self._save(record)
+        self.answers.add(q_id)
+
+    def run(self, iterations):
+        if not self._timed("login", self.login): return self
+        for i in range(iterations):
+            if i % 2 == 0:
+                self._timed("diario", lambda: self.save_diario(i))
+            else:
+                self._timed("simulado", lambda: self.answer(i))
+        self.app.get_user_cache().release(self.token)
+        return self
+
+
+def check_integrity(app, service, sessions):
+    report = {"corrompido": False, "perdidas": 0, "divergentes": 0, "duplicadas": 0, "detalhes": []}
+    try:
+        with open(app.data_manager.db_file, "r", encoding="utf-8") as f:
+            local = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        report["corrompido"] = True
+        report["detalhes"].append(f"JSON local ilegível: {e}")
+        return report
+
+    for s in sessions:
+        record = local.get(s.username, {})
+        dates = {l.get("data") for l in record.get("logs", [])}
+        progress = record.get("simulados_progress", {}).get(SIMULADO, {})
+        lost = [d for d in s.logs if d not in dates] + [q for q in s.answers if q not in progress]
+        report["perdidas"] += len(lost)
+        if lost:
+            report["detalhes"].append(f"{s.username} (sessão {s.index}): {len(lost)} escrita(s) perdida(s)")
+
+    rows = service.spreadsheet(app.data_manager.sheet_name).sheet1.get_all_values()
+    seen = {}
+    for row in rows:
+        if len(row) >= 2:
+            seen.setdefault(row[0], []).append(row[1])
+    for username in {s.username for s in sessions}:
+        cloud = seen.get(username, [])
+        if len(cloud) > 1:
+            report["duplicadas"] += 1
+        try:
+            same = bool(cloud) and json.loads(cloud[-1]) == json.loads(json.dumps(local.get(username), default=str))
+        except json.JSONDecodeError:
+            same = False
+        if not same:
+            report["divergentes"] += 1
+            report["detalhes"].append(f"{username}: Sheets diverge do JSON local")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=32)
+    parser.add_argument("--usuarios", type=int, default=8, help="Menos usuários que sessões = várias abas por usuário")
+    parser.add_argument("--iteracoes", type=int, default=10)
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência média por chamada ao Sheets (s)")
+    parser.add_argument("--falhas", type=float, default=0.02, help="Probabilidade de falha por chamada ao Sheets")
+    parser.add_argument("--anos", type=float, default=0.5, help="Histórico inicial de cada usuário")
+    parser.add_argument("--iteracoes-kdf", type=int, default=10_000)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="sparta_conc_")
+    cwd = os.getcwd()
+    try:
+        app = bench_app.import_app(workdir)
+        app.credentials.PBKDF2_ITERATIONS = args.iteracoes_kdf
+        password_hash = app.credentials.hash_password(PASSWORD)
+        db = gerar_dados.generate_db(args.usuarios, args.anos, args.semente)
+        for record in db.values():
+            if isinstance(record, dict): record["password"] = password_hash
+        with open(app.data_manager.db_file, "w", encoding="utf-8") as f:
+            json.dump(db, f, indent=4, default=str)
+
+        service = fake_sheets.FakeSheetsService(args.latencia, args.falhas, args.semente)
+        service.spreadsheet(app.data_manager.sheet_name).sheet1.load_rows(
+            [[k, json.dumps(v, default=str)] for k, v in db.items()])
+        app.data_manager.client_factory = service.client
+        app.data_manager.snapshot_store = None
+
+        users = [u for u in db if u != "global_alerts"]
+        sessions = [Session(app, users[i % len(users)], i) for i in range(args.sessoes)]
+        start_barrier = threading.Barrier(args.sessoes)
+
+        def run(session):
+            start_barrier.wait()
+            return session.run(args.iteracoes)
+
+        wall = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessoes) as pool:
+            list(pool.map(run, sessions))
+        wall = time.perf_counter() - wall
+
+        print(f"{args.sessoes} sessões, {args.usuarios} usuários, {args.iteracoes} ações/sessão | "
+              f"Sheets: latência {args.latencia*1000:.0f}ms, falhas {args.falhas:.0%}")
+        for flow in ("login", "diario", "simulado"):
+            samples = [x for s in sessions for x in s.latencies[flow]]
+            print(f"  {flow:<9} n={len(samples):<5} p50={percentile(samples, 50)*1000:8.1f}ms "
+                  f"p95={percentile(samples, 95)*1000:8.1f}ms p99={percentile(samples, 99)*1000:8.1f}ms")
+        total_ops = sum(len(v) for s in sessions for v in s.latencies.values())
+        print(f"  vazão: {total_ops / wall:.1f} ações/s em {wall:.2f}s")
+        print(f"  chamadas ao Sheets: {sum(service.calls.values())} ({service.failures} falhas injetadas) {service.calls}")
+
+        errors = [e for s in sessions for e in s.errors]
+        if errors:
+            print(f"  erros nas sessões: {len(errors)} (ex.: {errors[0]})")
+
+        report = check_integrity(app, service, sessions)
+        print(f"  integridade: perdidas={report['perdidas']} corrompido={report['corrompido']} "
+              f"divergentes={report['divergentes']} duplicadas={report['duplicadas']}")
+        for line in report["detalhes"][:10]:
+            print(f"    - {line}")
+        problems = report["corrompido"] or report["perdidas"] or report["divergentes"]
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
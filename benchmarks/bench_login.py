@@ -0,0 +1,70 @@
+"""
+Latência de login sob logins concorrentes.
+
+Compara o esquema legado (SHA-256 sem sal) com o KDF atual, verificando
+senhas em N threads simultâneas (como as sessões do app, cada uma na sua
+thread), com e sem o cache de verificação.
+
+Uso:
+    python benchmarks/bench_login.py [--logins 64] [--concorrencia 1 4 16] [--iteracoes 310000]
+"""
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sparta_core import credentials
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run(label, stored, password, logins, concurrency, clear_cache):
+    def one_login(_):
+        if clear_cache:
+            credentials._cache = credentials._VerifyCache(credentials.VERIFY_CACHE_SIZE)
+        start = time.perf_counter()
+        ok, _ = credentials.verify_password(stored, password)
+        assert ok
+        return time.perf_counter() - start
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as sessions:
+        samples = list(sessions.map(one_login, range(logins)))
+    wall = time.perf_counter() - wall
+    print(f"{label:<28} conc={concurrency:<3} p50={percentile(samples, 50)*1000:8.2f}ms "
+          f"p95={percentile(samples, 95)*1000:8.2f}ms p99={percentile(samples, 99)*1000:8.2f}ms "
+          f"média={statistics.mean(samples)*1000:8.2f}ms vazão={logins / wall:8.1f} logins/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--iteracoes", type=int, default=credentials.PBKDF2_ITERATIONS)
+    args = parser.parse_args(argv)
+
+    credentials.PBKDF2_ITERATIONS = args.iteracoes
+    password = "Senha128"
+    cases = [
+        ("legado sha256", hashlib.sha256(password.encode()).hexdigest(), True),
+        (f"pbkdf2 {args.iteracoes} sem cache", credentials.hash_password(password), True),
+        (f"pbkdf2 {args.iteracoes} com cache", credentials.hash_password(password), False),
+        ("scrypt sem cache", credentials.hash_password(password, scheme="scrypt"), True),
+    ]
+    print(f"Pool de KDF: {credentials.KDF_WORKERS} threads | {args.logins} logins por cenário")
+    for label, stored, clear_cache in cases:
+        for concurrency in args.concorrencia:
+            run(label, stored, password, args.logins, concurrency, clear_cache)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark de memória: histórico em JSON (dicts) x forma compacta (sparta_core.compact).
+
+Para cada ponto de escala (usuários x anos) gera um banco sintético
+(gerar_dados.py), serializa logs e progresso de simulados e mede com
+tracemalloc quanto cada forma ocupa depois de carregada: json.loads puro
+contra CompactHistory/CompactProgress montados a partir dele (com o JSON já
+descartado). Também confere que a volta para JSON é idêntica.
+
+Uso:
+    python benchmarks/bench_memoria.py [--escalas 100x1 100x5 300x5] [--simulados 20 --questoes 40]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gerar_dados
+from bench_app import parse_scale
+from sparta_core.compact import CompactHistory, compact_progress, expand_progress
+
+
+def retained(build):
+    """Bytes que continuam alocados depois de build() (o resultado é mantido vivo)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def measure_scale(users, years, simulados, questions):
+    db = gerar_dados.generate_db(users, years, seed=0, simulados=simulados, questions=questions)
+    db.pop("global_alerts", None)
+    logs_json = json.dumps({u: d["logs"] for u, d in db.items()})
+    prog_json = json.dumps({u: d.get("simulados_progress", {}) for u, d in db.items()})
+    subjects = {u: d["subjects_list"] for u, d in db.items()}
+    n_logs = sum(len(d["logs"]) for d in db.values())
+    n_answers = sum(len(p) for d in db.values() for p in d.get("simulados_progress", {}).values())
+    del db
+
+    logs, logs_dict = retained(lambda: json.loads(logs_json))
+    progress, prog_dict = retained(lambda: json.loads(prog_json))
+
+    def build_compact():
+        return ({u: CompactHistory.from_logs(l, subjects[u]) for u, l in json.loads(logs_json).items()},
+                {u: compact_progress({"simulados_progress": p}) for u, p in json.loads(prog_json).items()})
+    (hist, cprog), compact_size = retained(build_compact)
+
+    ok = (all(hist[u].to_logs() == logs[u] for u in logs)
+          and all(expand_progress(cprog[u]) == progress[u] for u in progress))
+    raw = sum(1 for h in hist.values() for l in h.logs if l.raw is not None)
+    dict_size = logs_dict + prog_dict
+    return {
+        "usuarios": users, "anos": years, "logs": n_logs, "respostas": n_answers,
+        "json_mb": dict_size / 1e6, "compacto_mb": compact_size / 1e6,
+        "bytes_por_log_json": logs_dict / max(n_logs, 1),
+        "reducao": 1 - compact_size / max(dict_size, 1), "ida_e_volta_ok": ok, "fora_do_formato": raw,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--escalas", nargs="+", default=["100x1", "100x5", "300x5"], help="usuários x anos")
+    parser.add_argument("--simulados", type=int, default=20)
+    parser.add_argument("--questoes", type=int, default=40)
+    parser.add_argument("--saida-json", default=None)
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'escala':>10} {'logs':>9} {'respostas':>10} {'JSON MB':>9} {'compacto MB':>12} {'B/log':>7} {'redução':>8}")
+    for text in args.escalas:
+        users, years = parse_scale(text)
+        r = measure_scale(users, years, args.simulados, args.questoes)
+        results.append(r)
+        print(f"{text:>10} {r['logs']:>9} {r['respostas']:>10} {r['json_mb']:>9.1f} {r['compacto_mb']:>12.1f} "
+              f"{r['bytes_por_log_json']:>7.0f} {r['reducao']:>7.0%}" + ("" if r["ida_e_volta_ok"] else "  ida e volta DIVERGENTE"))
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r["ida_e_volta_ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Substituto em processo do gspread para testes de carga sem rede.
+
+Implementa o subconjunto da API usado pelo SpartaDataManager e pelo SheetTab
+(open().sheet1, worksheet, add_worksheet, find, update_cell, append_row,
+append_rows, get_all_values, clear, update, col_values, batch_get) sobre uma lista de linhas em memória, com latência e taxa de falha
+configuráveis por chamada. Cada chamada é atômica (um lock por planilha),
+como uma requisição isolada à API real; sequências de chamadas não são.
+"""
+import random
+import threading
+import time
+
+
+class FakeAPIError(Exception):
+    """Falha injetada (equivale a um gspread.exceptions.APIError)."""
+
+
+class WorksheetNotFound(Exception):
+    """Aba inexistente (equivale a gspread.exceptions.WorksheetNotFound)."""
+
+
+class Cell:
+    __slots__ = ("row", "col", "value")
+
+    def __init__(self, row, col, value):
+        self.row = row
+        self.col = col
+        self.value = value
+
+
+def _a1_to_index(a1):
+    """'B3' -> (linha 3, coluna 2), ambos a partir de 1."""
+    letters = "".join(ch for ch in a1 if ch.isalpha()).upper()
+    digits = "".join(ch for ch in a1 if ch.isdigit())
+    col = 0
+    for ch in letters:
+        col = col * 26 + (ord(ch) - 64)
+    return int(digits or 1), col or 1
+
+
+class FakeWorksheet:
+    def __init__(self, service):
+        self._service = service
+        self._rows = []
+        self._lock = threading.Lock()
+
+    # --- Leitura ---
+    def get_all_values(self):
+        self._service._call("get_all_values")
+        with self._lock:
+            return [list(r) for r in self._rows]
+
+    def col_values(self, col):
+        self._service._call("col_values")
+        with self._lock:
+            return [r[col - 1] if len(r) >= col else "" for r in self._rows]
+
+    def batch_get(self, ranges):
+        """Aceita intervalos do tipo 'A2:B5' ou 'B7'; devolve uma lista de matrizes."""
+        self._service._call("batch_get")
+        result = []
+        with self._lock:
+            for rng in ranges:
+                start, _, end = rng.partition(":")
+                r1, c1 = _a1_to_index(start)
+                r2, c2 = _a1_to_index(end or start)
+                block = []
+                for r in range(r1, min(r2, len(self._rows)) + 1):
+                    row = self._rows[r - 1]
+                    block.append([row[c - 1] if len(row) >= c else "" for c in range(c1, c2 + 1)])
+                result.append(block)
+        return result
+
+    def find(self, query, in_column=None):
+        self._service._call("find")
+        with self._lock:
+            for i, row in enumerate(self._rows, 1):
+                cols = [in_column] if in_column else range(1, len(row) + 1)
+                for c in cols:
+                    if len(row) >= c and row[c - 1] == query:
+                        return Cell(i, c, query)
+        return None
+
+    # --- Escrita ---
+    def update_cell(self, row, col, value):
+        self._service._call("update_cell")
+        with self._lock:
+            while len(self._rows) < row:
+                self._rows.append([])
+            target = self._rows[row - 1]
+            while len(target) < col:
+                target.append("")
+            target[col - 1] = str(value)
+
+    def append_row(self, values, value_input_option=None):
+        self._service._call("append_row")
+        with self._lock:
+            self._rows.append([str(v) for v in values])
+
+    def append_rows(self, values, value_input_option=None):
+        self._service._call("append_rows")
+        with self._lock:
+            self._rows.extend([str(v) for v in row] for row in values)
+
+    def clear(self):
+        self._service._call("clear")
+        with self._lock:
+            self._rows = []
+
+    def update(self, range_name, values, value_input_option=None):
+        self._service._call("update")
+        r1, c1 = _a1_to_index(range_name)
+        with self._lock:
+            for i, values_row in enumerate(values):
+                r = r1 + i
+                while len(self._rows) < r:
+                    self._rows.append([])
+                target = self._rows[r - 1]
+                while len(target) < c1 - 1 + len(values_row):
+                    target.append("")
+                for j, v in enumerate(values_row):
+                    target[c1 - 1 + j] = str(v)
+
+    def load_rows(self, rows):
+        """Carga inicial direta (sem latência nem falhas)."""
+        with self._lock:
+            self._rows = [[str(v) for v in r] for r in rows]
+
+
+class FakeSpreadsheet:
+    def __init__(self, service):
+        self._service = service
+        self.sheet1 = FakeWorksheet(service)
+        self._tabs = {}
+        self._lock = threading.Lock()
+
+    def worksheet(self, title):
+        self._service._call("worksheet")
+        with self._lock:
+            if title not in self._tabs:
+                raise WorksheetNotFound(title)
+            return self._tabs[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self._service._call("add_worksheet")
+        with self._lock:
+            return self._tabs.setdefault(title, FakeWorksheet(self._service))
+
+
+class FakeSheetsService:
+    """
+    Estado compartilhado do serviço falso. client() devolve um cliente
+    compatível com gspread.authorize(...) para usar como client_factory.
+    latency: segundos médios por chamada (distribuição exponencial);
+    failure_rate: probabilidade de FakeAPIError por chamada.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._spreadsheets = {}
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.failures = 0
+
+    def _call(self, method):
+        with self._rng_lock:
+            delay = self._rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+            fail = self._rng.random() < self.failure_rate
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if fail: self.failures += 1
+        if delay: time.sleep(delay)
+        if fail:
+            raise FakeAPIError(f"Falha injetada em {method}")
+
+    def spreadsheet(self, name):
+        with self._lock:
+            if name not in self._spreadsheets:
+                self._spreadsheets[name] = FakeSpreadsheet(self)
+            return self._spreadsheets[name]
+
+    def client(self):
+        return _FakeClient(self)
+
+
+class _FakeClient:
+    def __init__(self, service):
+        self._service = service
+
+    def open(self, name):
+        self._service._call("open")
+        return self._service.spreadsheet(name)
@@ -0,0 +1,158 @@
+"""
+Gerador de dados sintéticos para benchmarks: banco de usuários e banco de simulados.
+
+Os registros seguem o formato gravado pelo app (logs com questoes_detalhadas,
+acordou/dormiu e os minutos migrados, agendas, progresso de simulados), com
+frequência de estudo, volume de questões e matérias variando por aluno.
+Mesma semente, mesmo banco.
+
+Uso:
+    python benchmarks/gerar_dados.py --usuarios 1000 --anos 5 --saida sparta_users.json
+    python benchmarks/gerar_dados.py --usuarios 0 --simulados 40 --questoes 60 --pasta-simulados simulados_sinteticos
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+SUBJECTS = [
+    "Constitucional", "Administrativo", "Penal", "Civil", "Processo Civil", "Processo Penal",
+    "Tributário", "Empresarial", "Trabalho", "Previdenciário", "Ambiental", "Português",
+]
+DEFAULT_SUBJECTS = SUBJECTS[:5]
+PASSWORD_HASH = "pbkdf2_sha256$1000$c2FsdHNhbHRzYWx0c2FsdA==$YmVuY2htYXJrYmVuY2htYXJrYmVuY2htYXJrYmVuY2g="
+
+WORDS = ("administração", "contrato", "licitação", "princípio", "servidor", "ato", "lei", "edital",
+         "competência", "recurso", "prazo", "garantia", "processo", "autoridade", "poder", "dever")
+
+
+def _hhmm(minutes):
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def generate_user(rng, today, years, simulado_keys=(), questions_per_simulado=0):
+    """Um aluno com 'years' anos de histórico até 'today'."""
+    subjects = DEFAULT_SUBJECTS + rng.sample(SUBJECTS[5:], rng.randint(0, 4))
+    diligence = rng.uniform(0.3, 0.95)       # chance de estudar num dia
+    volume = rng.randint(10, 80)             # questões médias por dia de estudo
+    wake = rng.randint(4 * 60 + 30, 8 * 60)  # horário típico de acordar (min)
+    sleep = rng.randint(21 * 60, 24 * 60 + 60)
+
+    logs = []
+    branches = 1
+    day = today - timedelta(days=int(365 * years))
+    while day <= today:
+        if rng.random() < 0.85:  # dias sem registro nenhum
+            studied = rng.random() < diligence
+            detalhes = {}
+            if studied:
+                for m in rng.sample(subjects, rng.randint(1, min(3, len(subjects)))):
+                    detalhes[m] = max(1, int(rng.gauss(volume / 2, volume / 4)))
+            woke, slept = wake + rng.randint(-40, 40), sleep + rng.randint(-60, 60)
+            logs.append({
+                "data": day.isoformat(),
+                "acordou": _hhmm(woke),
+                "dormiu": _hhmm(slept),
+                "acordou_min": woke % (24 * 60),
+                "dormiu_min": slept % (24 * 60),
+                "paginas": rng.randint(5, 60) if studied and rng.random() < 0.6 else 0,
+                "series": rng.randint(0, 12) if rng.random() < 0.3 else 0,
+                "questoes": sum(detalhes.values()),
+                "questoes_detalhadas": detalhes,
+                "estudou": studied,
+            })
+            branches = branches + 1 if studied else max(0, branches - 2)
+        day += timedelta(days=1)
+
+    agendas = {}
+    day = today - timedelta(days=int(365 * years))
+    while day <= today + timedelta(days=7):
+        if rng.random() < diligence * 0.5:
+            m = rng.choice(subjects)
+            agendas[day.isoformat()] = f"Fazer {rng.randint(1, 4)} cadernos de {m} e revisar resumos."
+        day += timedelta(days=1)
+
+    progress = {}
+    for key in simulado_keys:
+        if rng.random() < 0.4: continue
+        answered = rng.randint(1, questions_per_simulado)
+        prog = {str(i): {"resposta": rng.choice(("Certo", "Errado")), "acertou": rng.random() < 0.65} for i in range(1, answered + 1)}
+        prog["em_andamento"] = answered < questions_per_simulado
+        progress[key] = prog
+
+    record = {
+        "password": PASSWORD_HASH,
+        "logs": logs,
+        "agendas": agendas,
+        "subjects_list": subjects,
+        "tree_branches": branches,
+        "created_at": f"{(today - timedelta(days=int(365 * years))).isoformat()} 08:00:00",
+        "mod_message": "",
+    }
+    if progress: record["simulados_progress"] = progress
+    return record
+
+
+def simulado_key(i):
+    return f"simulado_sintetico_{i:03d}"
+
+
+def generate_db(users, years, seed=0, today=None, simulados=0, questions=0):
+    rng = random.Random(seed)
+    today = today or date.today()
+    keys = [simulado_key(i) for i in range(1, simulados + 1)]
+    db = {f"aluno_{i:05d}": generate_user(rng, today, years, keys, questions) for i in range(users)}
+    db["global_alerts"] = [{"date": today.strftime("%d/%m/%Y 08:00"), "text": "Aviso sintético."}]
+    return db
+
+
+def generate_bank(pasta, simulados, questions, seed=0, duplicate_ratio=0.1):
+    """Arquivos simulado_*.json na pasta; uma fração das questões repete enunciados de outros simulados."""
+    rng = random.Random(seed)
+    os.makedirs(pasta, exist_ok=True)
+    seen = []
+    for i in range(1, simulados + 1):
+        questoes = []
+        for q in range(1, questions + 1):
+            if seen and rng.random() < duplicate_ratio:
+                enunciado = rng.choice(seen)
+            else:
+                enunciado = " ".join(rng.choice(WORDS) for _ in range(rng.randint(25, 60))).capitalize() + "."
+                seen.append(enunciado)
+            questoes.append({
+                "id": str(q), "enunciado": enunciado,
+                "resposta_correta": rng.choice(("Certo", "Errado")),
+                "justificativa": " ".join(rng.choice(WORDS) for _ in range(30)) + ".",
+            })
+        content = {simulado_key(i): {"titulo": f"Simulado Sintético {i:03d}", "materia": rng.choice(SUBJECTS), "questoes": questoes}}
+        with open(os.path.join(pasta, f"simulado_sintetico_{i:03d}.json"), "w", encoding="utf-8") as f:
+            json.dump(content, f, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=100)
+    parser.add_argument("--anos", type=float, default=1)
+    parser.add_argument("--simulados", type=int, default=10)
+    parser.add_argument("--questoes", type=int, default=30)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default="sparta_users_sintetico.json")
+    parser.add_argument("--pasta-simulados", default=None, help="Também gera os arquivos de simulado nesta pasta")
+    args = parser.parse_args(argv)
+
+    if args.usuarios:
+        db = generate_db(args.usuarios, args.anos, args.semente, simulados=args.simulados, questions=args.questoes)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(db, f, indent=4, default=str)
+        print(f"{args.usuarios} usuários x {args.anos} anos -> {args.saida} ({os.path.getsize(args.saida) / 1e6:.1f} MB)")
+    if args.pasta_simulados:
+        generate_bank(args.pasta_simulados, args.simulados, args.questoes, args.semente)
+        print(f"{args.simulados} simulados x {args.questoes} questões -> {args.pasta_simulados}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+"""
+Núcleo do Mentor SpartaJus: regras de negócio, modelos e persistência, sem Streamlit.
+
+study_app.py é só a camada de interface; benchmarks, scripts de manutenção e
+jobs em lote importam daqui os mesmos caminhos de código.
+"""
+from .compact import CompactHistory, CompactLog, CompactProgress, SubjectTable
+from .dates import BRT, get_now_br, get_today_br, parse_log_date
+from .models import DEFAULT_SUBJECTS, Attempt, LogEntry, Question, Simulado
+from .progression import calculate_streak, get_patent, get_stars, ranking_rows, totals
+from .storage import SpartaDataManager
+from .tree import generate_tree_svg
+from .users import ensure_structure, new_user_record
+
+__all__ = [
+    "BRT", "get_now_br", "get_today_br", "parse_log_date",
+    "DEFAULT_SUBJECTS", "Attempt", "LogEntry", "Question", "Simulado",
+    "CompactHistory", "CompactLog", "CompactProgress", "SubjectTable",
+    "calculate_streak", "get_patent", "get_stars", "ranking_rows", "totals",
+    "SpartaDataManager", "generate_tree_svg",
+    "ensure_structure", "new_user_record",
+]
@@ -0,0 +1,185 @@
+"""
+Consistência do planejamento (aba Agenda).
+
+user_data['agendas'] guarda as metas avulsas ('YYYY-MM-DD' -> texto) e
+user_data['agenda_templates'] as recorrentes ({"dias_semana": [0..6],
+"texto", "inicio", "fim"}). AgendaIndex agrupa as metas por mês (mantido junto em save_goal e add/remove_template)
+e expande as recorrentes só na consulta, sem gravar um dia por ocorrência.
+"""
+import bisect
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+from .dates import format_date, parse_log_date
+from .session_store import DerivedCache
+
+WEEKDAYS = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+
+
+def format_month(month: str) -> str:
+    """'2026-10' -> '10/2026'"""
+    y, m = month.split("-")
+    return f"{m}/{y}"
+
+
+def _month_range(month: str) -> tuple[date, date]:
+    year, mon = (int(x) for x in month.split("-"))
+    start = date(year, mon, 1)
+    return start, start + timedelta(days=calendar.monthrange(year, mon)[1] - 1)
+
+
+def _shift_month(month: str, delta: int) -> str:
+    year, mon = (int(x) for x in month.split("-"))
+    y, m = divmod(year * 12 + mon - 1 + delta, 12)
+    return f"{y:04d}-{m + 1:02d}"
+
+
+@dataclass(slots=True)
+class RecurringGoal:
+    """Meta que se repete nos dias da semana escolhidos (0 = segunda) entre inicio e fim (None = sem fim)."""
+    weekdays: frozenset[int]
+    texto: str
+    inicio: date
+    fim: date | None = None
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "RecurringGoal":
+        return cls(frozenset(int(w) for w in d.get("dias_semana", [])), str(d.get("texto", "")),
+                   parse_log_date(d.get("inicio")) or date.min, parse_log_date(d.get("fim")))
+
+    def to_dict(self) -> dict:
+        return {"dias_semana": sorted(self.weekdays), "texto": self.texto, "inicio": format_date(self.inicio),
+                "fim": format_date(self.fim) if self.fim else None}
+
+    def matches(self, day: date) -> bool:
+        return day.weekday() in self.weekdays and self.inicio <= day and (self.fim is None or day <= self.fim)
+
+    def mask(self, start: date, end: date) -> np.ndarray:
+        """Ocorrências em [start, end] (índice 0 = start), sem percorrer dia a dia."""
+        n = max((end - start).days + 1, 0)
+        offsets = np.arange(n)
+        hit = np.isin((offsets + start.weekday()) % 7, list(self.weekdays))
+        hit &= offsets >= (self.inicio - start).days
+        if self.fim is not None: hit &= offsets <= (self.fim - start).days
+        return hit
+
+    def describe(self) -> str:
+        dias = ", ".join(WEEKDAYS[w] for w in sorted(self.weekdays))
+        fim = f" até {self.fim.strftime('%d/%m/%Y')}" if self.fim else ""
+        return f"{dias} (desde {self.inicio.strftime('%d/%m/%Y')}{fim}): {self.texto}"
+
+
+class AgendaIndex:
+    """Metas avulsas agrupadas por mês ('YYYY-MM' -> dias ordenados) mais as recorrentes."""
+    __slots__ = ("months", "templates")
+
+    def __init__(self, agendas: dict, templates=()):
+        self.months: dict[str, list[str]] = {}
+        for key, text in agendas.items():
+            self._track(key, text)
+        self.templates = [RecurringGoal.from_dict(t) for t in templates]
+
+    @classmethod
+    def from_user(cls, user_data: dict) -> "AgendaIndex":
+        return cls(user_data.get("agendas", {}), user_data.get("agenda_templates", []))
+
+    def _track(self, key: str, text):
+        d = parse_log_date(key)
+        if not d: return
+        key = format_date(d)
+        days = self.months.setdefault(key[:7], [])
+        i = bisect.bisect_left(days, key)
+        present = i < len(days) and days[i] == key
+        if text and str(text).strip():
+            if not present: days.insert(i, key)
+        elif present:
+            del days[i]
+            if not days: del self.months[key[:7]]
+
+    # --- consultas ---
+    def goal_for(self, agendas: dict, day: date) -> tuple[str, bool]:
+        """(texto da meta do dia, se veio de uma meta recorrente)."""
+        text = agendas.get(format_date(day), "")
+        if text: return text, False
+        for t in self.templates:
+            if t.matches(day): return t.texto, True
+        return "", False
+
+    def months_with_goals(self, today: date) -> list[str]:
+        """Meses ('YYYY-MM') com metas avulsas mais o atual, do mais recente ao mais antigo."""
+        return sorted(set(self.months) | {today.strftime("%Y-%m")}, reverse=True)
+
+    def planned_mask(self, start: date, end: date) -> np.ndarray:
+        """Dias de [start, end] com meta avulsa ou recorrente (índice 0 = start)."""
+        mask = np.zeros(max((end - start).days + 1, 0), dtype=bool)
+        month = start.strftime("%Y-%m")
+        last = end.strftime("%Y-%m")
+        lo, hi = format_date(start), format_date(end)
+        while month <= last:
+            for key in self.months.get(month, ()):
+                if lo <= key <= hi: mask[(date.fromisoformat(key) - start).days] = True
+            month = _shift_month(month, 1)
+        for t in self.templates:
+            mask |= t.mask(start, end)
+        return mask
+
+    def planned_days(self, month: str) -> tuple[int, int]:
+        """(dias planejados no mês, dias do mês); sem recorrentes, é só o tamanho do balde."""
+        start, end = _month_range(month)
+        if not self.templates: return len(self.months.get(month, ())), end.day
+        return int(self.planned_mask(start, end).sum()), end.day
+
+    def trend(self, last_month: str, n: int) -> list[tuple[str, int, int]]:
+        """(mês, dias planejados, dias do mês) dos n meses até last_month, do mais antigo ao mais recente."""
+        return [(m, *self.planned_days(m)) for m in (_shift_month(last_month, -k) for k in range(n - 1, -1, -1))]
+
+
+def save_goal(user_data: dict, day, text: str, index: AgendaIndex | None = None) -> bool:
+    """Grava a meta do dia (texto vazio remove). Retorna se algo mudou; 'index' é atualizado junto."""
+    key = format_date(day)
+    agendas = user_data.setdefault("agendas", {})
+    if text.strip():
+        agendas[key] = text
+    elif key in agendas:
+        del agendas[key]
+    else:
+        return False
+    if index is not None: index._track(key, text)
+    return True
+
+
+def add_template(user_data: dict, goal: RecurringGoal, index: AgendaIndex | None = None):
+    user_data.setdefault("agenda_templates", []).append(goal.to_dict())
+    if index is not None: index.templates.append(goal)
+
+
+def remove_template(user_data: dict, position: int, index: AgendaIndex | None = None):
+    del user_data.get("agenda_templates", [])[position]
+    if index is not None: del index.templates[position]
+
+
+class AgendaIndexCache(DerivedCache):
+    """Um AgendaIndex por usuário; remontado quando 'agendas' ou 'agenda_templates' são trocados."""
+
+    def __init__(self, max_users: int = 256):
+        super().__init__(("agendas", "agenda_templates"), AgendaIndex.from_user, max_users)
+
+
+def planned_vs_executed(index: AgendaIndex, series, month: str, today: date) -> dict[str, int]:
+    """
+    Metas x dias estudados no mês ('YYYY-MM'), a partir do índice da agenda e da DailySeries.
+    Dias depois de hoje só contam como 'futuro' (ainda não dá para cumprir ou falhar).
+    """
+    start, end = _month_range(month)
+    planned = index.planned_mask(start, end)
+    studied = series.values_between("estudou", start, end) > 0
+    past = np.arange(planned.size) <= (today - start).days
+    return {
+        "cumpridos": int((planned & studied & past).sum()),
+        "nao_cumpridos": int((planned & ~studied & past).sum()),
+        "sem_meta": int((~planned & studied & past).sum()),
+        "futuros": int((planned & ~past).sum()),
+    }
@@ -0,0 +1,333 @@
+"""
+Avisos: alertas gerais e mensagens pessoais do mentor, fora do banco de usuários.
+
+Tudo fica num arquivo JSONL só de acréscimo (avisos.jsonl). Publicar, mandar
+mensagem ou apagar escreve uma linha e nada é reescrito. O id de um aviso é a
+posição dele no seu canal ('*' = geral, ou o nome do usuário), então todos os
+processos chegam aos mesmos ids lendo o arquivo na mesma ordem. Cada processo
+lê só as linhas acrescentadas desde a última leitura.
+
+O que cada usuário já leu fica em avisos_leitura.json: o último id visto por
+canal. Com a contagem acumulada de avisos vivos de cada canal, os não lidos
+saem em O(1), sem percorrer o histórico.
+
+Os dois arquivos são cópias locais: com um espelho (storage.SheetTab) cada
+linha gravada sobe para a aba 'avisos' da planilha e os cursores para
+'avisos_leitura'. restore() na partida baixa o que falta aqui (deploy novo
+começa sem os arquivos) e sobe o que só existe aqui.
+"""
+import json
+import os
+import threading
+
+from .db_keys import RESERVED_KEYS
+from .table_store import JsonTableStore
+
+ALERTS_FILE = "avisos.jsonl"
+CURSORS_FILE = "avisos_leitura.json"
+ALERTS_SHEET = "avisos"
+CURSORS_SHEET = "avisos_leitura"
+GLOBAL = "*"
+PAGE_SIZE = 10
+
+PUBLISH = "publicar"
+DELETE = "apagar"
+
+
+class Feed:
+    """Avisos de um canal em ordem de chegada (id = posição + 1); apagados ficam marcados."""
+    __slots__ = ("items", "live", "_prefix")
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.live: list[int] = []       # ids dos avisos não apagados, crescentes
+        self._prefix: list[int] = [0]   # _prefix[i] = avisos vivos entre os i primeiros
+
+    @property
+    def last_id(self) -> int:
+        return len(self.items)
+
+    def append(self, item: dict):
+        item["id"] = len(self.items) + 1
+        self.items.append(item)
+        self.live.append(item["id"])
+        self._prefix.append(self._prefix[-1] + 1)
+
+    def is_live(self, item_id: int) -> bool:
+        return 1 <= item_id <= len(self.items) and not self.items[item_id - 1].get("apagado")
+
+    def delete(self, item_id: int) -> bool:
+        if not self.is_live(item_id): return False
+        self.items[item_id - 1]["apagado"] = True
+        self.live.remove(item_id)
+        for i in range(item_id, len(self._prefix)):
+            self._prefix[i] -= 1
+        return True
+
+    def unread(self, cursor: int) -> int:
+        """Avisos vivos com id maior que o cursor."""
+        return self._prefix[-1] - self._prefix[min(max(cursor, 0), len(self.items))]
+
+    def pages(self, size: int = PAGE_SIZE) -> int:
+        return max(1, -(-len(self.live) // size))
+
+    def page(self, number: int, size: int = PAGE_SIZE) -> list[dict]:
+        """Página 'number' (a partir de 0), do mais recente para o mais antigo."""
+        end = len(self.live) - number * size
+        ids = self.live[max(end - size, 0):max(end, 0)]
+        return [self.items[i - 1] for i in reversed(ids)]
+
+    def latest(self) -> dict | None:
+        return self.items[self.live[-1] - 1] if self.live else None
+
+
+def _advance(current: dict, positions: dict) -> bool:
+    changed = False
+    for channel, last in positions.items():
+        if isinstance(last, int) and last > current.get(channel, 0):
+            current[channel] = last
+            changed = True
+    return changed
+
+
+class CursorStore(JsonTableStore):
+    """Último id lido por usuário e canal: {'cursores': {usuario: {canal: id}}}."""
+
+    def __init__(self, path, remote=None):
+        super().__init__(path)
+        self.remote = remote   # uma linha por usuário: [usuario, JSON dos cursores]
+
+    def empty_table(self):
+        return {"versao": self.version, "cursores": {}}
+
+    def cursor(self, username, channel) -> int:
+        return self.table()["cursores"].get(username, {}).get(channel, 0)
+
+    def advance(self, username, positions: dict) -> bool:
+        changed = self.mutate(lambda table: _advance(table["cursores"].setdefault(username, {}), positions))
+        if changed and self.remote is not None:
+            try: self._put(username)
+            except Exception as e: print(f"[Erro Avisos Sheets]: {e}")
+        return changed
+
+    def _put(self, username):
+        self.remote.put(username, [json.dumps(self.table()["cursores"].get(username, {}), ensure_ascii=False)])
+
+    def restore(self) -> int:
+        """Mescla os cursores da aba (vale o maior id por canal) e sobe os usuários à frente aqui; retorna quantos subiram."""
+        rows = self.remote.rows() if self.remote is not None else None
+        if rows is None: return 0
+        remote = {}
+        for row in rows:
+            if len(row) < 2 or not row[0]: continue
+            try: positions = json.loads(row[1])
+            except json.JSONDecodeError: continue
+            if isinstance(positions, dict): remote[row[0]] = positions
+        def apply(table):
+            changed = False
+            for username, positions in remote.items():
+                changed = _advance(table["cursores"].setdefault(username, {}), positions) or changed
+            return changed
+        self.mutate(apply)
+        ahead = [u for u, positions in self.table()["cursores"].items() if positions != remote.get(u)]
+        for username in ahead:
+            self._put(username)
+        return len(ahead)
+
+
+def _is_publish(line: str) -> bool:
+    try: return json.loads(line).get("op") == PUBLISH
+    except (json.JSONDecodeError, AttributeError): return False
+
+
+class AlertStore:
+    """Canais de avisos de um processo, sincronizados com o arquivo JSONL."""
+
+    def __init__(self, path=ALERTS_FILE, cursors_path=CURSORS_FILE, remote=None, cursors_remote=None):
+        self.path = path
+        self.cursors = CursorStore(cursors_path, cursors_remote)
+        self.remote = remote                  # uma linha por evento: a linha do JSONL na coluna A
+        self._lock = threading.Lock()
+        self._feeds: dict[str, Feed] = {}
+        self._offset = 0
+        self._restored = remote is None       # arquivo local já alinhado com a aba
+        self._unsent: list[str] = []          # linhas gravadas aqui que a aba ainda não tem
+        self._offline = False                 # sem cliente do Sheets: só os arquivos locais, como o banco
+
+    @property
+    def synced(self) -> bool:
+        """True se a aba tem tudo que foi gravado aqui (ou não há espelho nem planilha)."""
+        return (self._restored or self._offline) and not self._unsent
+
+    # --- arquivo ---
+    def _apply(self, event: dict):
+        channel = event.get("canal")
+        if not isinstance(channel, str): return
+        feed = self._feeds.setdefault(channel, Feed())
+        if event.get("op") == PUBLISH:
+            feed.append({"data": event.get("data", ""), "texto": event.get("texto", "")})
+        elif event.get("op") == DELETE and isinstance(event.get("id"), int):
+            feed.delete(event["id"])
+
+    def _refresh_locked(self):
+        """Aplica as linhas novas do arquivo; se ele encolheu (foi trocado), relê do começo."""
+        try: size = os.stat(self.path).st_size
+        except OSError: size = 0
+        if size < self._offset:
+            self._feeds, self._offset = {}, 0
+        if size == self._offset: return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1   # linha incompleta (gravação em curso) fica para a próxima leitura
+        for line in chunk[:end].splitlines():
+            try: self._apply(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError): continue
+        self._offset += end
+
+    def _write_locked(self, text: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # Relê em vez de aplicar direto: acréscimos de outros processos entram na mesma ordem do arquivo
+        self._refresh_locked()
+        self._mirror_locked(text.splitlines())
+
+    def _local_lines_locked(self) -> list[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return []
+        return [line for line in text[:text.rfind("\n") + 1].splitlines() if line.strip()]
+
+    def _replace_locked(self, lines: list[str]):
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+        self._feeds, self._offset = {}, 0
+        self._refresh_locked()
+
+    # --- espelho na planilha ---
+    def _send_locked(self):
+        if not self._unsent: return
+        try:
+            if self.remote.append([[line] for line in self._unsent]):
+                self._unsent = []
+        except Exception as e:
+            print(f"[Erro Avisos Sheets]: {e}")
+
+    def _mirror_locked(self, lines: list[str]):
+        if self.remote is None: return
+        if not self._restored:
+            # Sem alinhar antes, os ids daqui podiam não bater com os da aba; o alinhamento já sobe estas linhas
+            try: self._restore_locked()
+            except Exception as e: print(f"[Erro Avisos Sheets]: {e}")
+            return
+        self._unsent.extend(lines)
+        self._send_locked()
+
+    def _restore_locked(self) -> bool:
+        rows = self.remote.rows()
+        self._offline = rows is None
+        if rows is None: return False
+        remote = [row[0] for row in rows if row and row[0]]
+        local = self._local_lines_locked()
+        if local[:len(remote)] == remote:
+            self._unsent = local[len(remote):]
+        else:
+            if remote[:len(local)] == local:
+                self._unsent = []
+            else:
+                # Históricos divergentes: vale a aba; avisos publicados só aqui entram no fim e
+                # remoções feitas só aqui se perdem (o id apagado pode não ser o mesmo lá)
+                known = set(remote)
+                self._unsent = [line for line in local if line not in known and _is_publish(line)]
+            self._replace_locked(remote + self._unsent)
+        self._restored = True
+        self._send_locked()
+        return True
+
+    def restore(self) -> bool:
+        """Alinha avisos e cursores locais com as abas da planilha; False offline ou sem espelho."""
+        if self.remote is None: return False
+        with self._lock:
+            restored = self._restore_locked()
+        self.cursors.restore()
+        return restored
+
+    def _append_locked(self, event: dict):
+        self._write_locked(json.dumps(event, ensure_ascii=False) + "\n")
+
+    # --- escrita ---
+    def publish(self, text: str, when: str, channel: str = GLOBAL) -> dict:
+        """Novo aviso no canal (geral por padrão, ou mensagem pessoal com channel=usuário)."""
+        with self._lock:
+            self._refresh_locked()
+            self._append_locked({"op": PUBLISH, "canal": channel, "data": when, "texto": text})
+            return self._feeds[channel].latest()
+
+    def send(self, username: str, text: str, when: str) -> dict:
+        return self.publish(text, when, channel=username)
+
+    def send_many(self, usernames, text: str, when: str) -> int:
+        """A mesma mensagem pessoal para vários usuários numa única gravação; retorna quantas foram."""
+        lines = [json.dumps({"op": PUBLISH, "canal": u, "data": when, "texto": text}, ensure_ascii=False) + "\n"
+                 for u in dict.fromkeys(usernames)]
+        if not lines: return 0
+        with self._lock:
+            self._refresh_locked()
+            self._write_locked("".join(lines))
+        return len(lines)
+
+    def delete(self, channel: str, item_id: int) -> bool:
+        with self._lock:
+            self._refresh_locked()
+            feed = self._feeds.get(channel)
+            if feed is None or not feed.is_live(item_id): return False
+            self._append_locked({"op": DELETE, "canal": channel, "id": item_id})
+            return True
+
+    # --- leitura ---
+    def feed(self, channel: str = GLOBAL) -> Feed:
+        with self._lock:
+            self._refresh_locked()
+            return self._feeds.get(channel) or Feed()
+
+    def unread(self, username: str) -> tuple[int, int]:
+        """(alertas gerais, mensagens pessoais) ainda não lidos pelo usuário."""
+        return (self.feed(GLOBAL).unread(self.cursors.cursor(username, GLOBAL)),
+                self.feed(username).unread(self.cursors.cursor(username, username)))
+
+    def mark_read(self, username: str) -> bool:
+        """Move os cursores do usuário para o último aviso de cada canal dele."""
+        return self.cursors.advance(username, {GLOBAL: self.feed(GLOBAL).last_id, username: self.feed(username).last_id})
+
+
+def import_legacy(store: AlertStore, db: dict) -> bool:
+    """
+    Leva 'global_alerts' e os 'mod_message' do banco antigo para o AlertStore e
+    os tira do banco, mas só quando a aba de avisos já recebeu tudo (senão ficam
+    para a próxima vez). Aviso com mesmo texto (e data) já presente não é
+    repetido, então rodar de novo não duplica. Retorna True se o banco mudou.
+    """
+    legacy = db.get("global_alerts")
+    if isinstance(legacy, list):
+        seen = {(a["data"], a["texto"]) for a in store.feed(GLOBAL).items}
+        for a in reversed(legacy):   # a lista antiga guardava o mais recente primeiro
+            if isinstance(a, dict) and (a.get("date", ""), a.get("text", "")) not in seen:
+                store.publish(a.get("text", ""), a.get("date", ""))
+    messages = [username for username, data in db.items()
+                if username not in RESERVED_KEYS and isinstance(data, dict) and "mod_message" in data]
+    for username in messages:
+        message = db[username]["mod_message"]
+        if message and all(m["texto"] != message for m in store.feed(username).items):
+            store.send(username, message, "")
+    if not store.synced: return False
+    for username in messages:
+        del db[username]["mod_message"]
+    return db.pop("global_alerts", None) is not None or bool(messages)
@@ -0,0 +1,275 @@
+"""
+Backup e restauração do banco de usuários.
+
+Formato: JSON Lines compactado com gzip. A primeira linha é um cabeçalho e
+cada linha seguinte carrega um único registro ({"chave": ..., "valor": ...}),
+de modo que exportar e restaurar processam um usuário por vez, sem montar o
+JSON inteiro em memória. Backups antigos (o JSON completo do banco) continuam
+aceitos na restauração.
+
+Uso:
+    python -m sparta_core.backup exportar --db sparta_users.json --saida backup.jsonl.gz [--usuario nome]
+    python -m sparta_core.backup restaurar backup.jsonl.gz --db sparta_users.json [--modo mesclar|substituir]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+
+BACKUP_FORMAT = "sparta-backup"
+BACKUP_VERSION = 1
+RESTORE_CHUNK_SIZE = 200
+RESTORE_MODES = ("mesclar", "substituir")
+
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_WBITS = 31   # zlib com cabeçalho e rodapé gzip
+# Arquivo truncado ou corrompido: gzip, zlib e a decodificação falham com estes
+CORRUPT_ERRORS = (OSError, EOFError, zlib.error, UnicodeDecodeError)
+
+
+def backup_filename(now, username=None):
+    escopo = username or "completo"
+    return f"backup_{escopo}_{now.strftime('%Y%m%d_%H%M')}.jsonl.gz"
+
+
+def iter_export_lines(db, keys=None):
+    """Gera as linhas do backup (bytes), um registro por vez."""
+    selected = list(db.keys()) if keys is None else [k for k in keys if k in db]
+    header = {
+        "formato": BACKUP_FORMAT, "versao": BACKUP_VERSION,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "escopo": "completo" if keys is None else "parcial",
+        "registros": len(selected),
+    }
+    yield (json.dumps(header) + "\n").encode("utf-8")
+    for key in selected:
+        yield (json.dumps({"chave": key, "valor": db[key]}, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def iter_export_gzip(db, keys=None):
+    """Gera o backup já compactado (gzip), em pedaços, à medida que os registros são lidos."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, GZIP_WBITS)
+    for line in iter_export_lines(db, keys):
+        chunk = compressor.compress(line)
+        if chunk: yield chunk
+    yield compressor.flush()
+
+
+def write_export(db, fileobj, keys=None):
+    """Escreve o backup compactado em fileobj, pedaço a pedaço."""
+    for chunk in iter_export_gzip(db, keys):
+        fileobj.write(chunk)
+
+
+def export_bytes(db, keys=None):
+    """
+    Backup compactado pronto para download (gerado no clique do botão, nunca
+    guardado na sessão). O st.download_button pede os bytes inteiros: só os
+    pedaços já compactados são juntados, nunca as linhas em texto.
+    """
+    return b"".join(iter_export_gzip(db, keys))
+
+
+def _open_text(fileobj):
+    head = fileobj.read(2)
+    fileobj.seek(0)
+    raw = gzip.GzipFile(fileobj=fileobj, mode="rb") if head == GZIP_MAGIC else fileobj
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def open_backup(fileobj):
+    """
+    Abre um backup no formato novo (linha a linha) ou legado (JSON completo).
+    Retorna (total_de_registros ou None, iterador de (chave, valor)).
+    Levanta ValueError se o arquivo não for reconhecido ou estiver truncado/corrompido
+    (também durante a iteração).
+    """
+    try:
+        text = _open_text(fileobj)
+        first = text.readline()
+    except CORRUPT_ERRORS as e:
+        raise ValueError(f"Arquivo de backup corrompido ou incompleto: {e}")
+    try:
+        header = json.loads(first)
+    except json.JSONDecodeError:
+        header = None
+
+    if isinstance(header, dict) and header.get("formato") == BACKUP_FORMAT:
+        if header.get("versao") != BACKUP_VERSION:
+            raise ValueError(f"Versão de backup não suportada: {header.get('versao')}")
+
+        def records():
+            n = 1
+            try:
+                for n, line in enumerate(text, 2):
+                    if not line.strip(): continue
+                    try:
+                        record = json.loads(line)
+                        yield record["chave"], record["valor"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        raise ValueError(f"Linha {n} do backup está corrompida.")
+            except CORRUPT_ERRORS as e:
+                raise ValueError(f"Backup corrompido ou incompleto depois da linha {n}: {e}")
+        return header.get("registros"), records()
+
+    # Backup legado: o arquivo inteiro é o dicionário do banco
+    try:
+        legacy = json.loads(first + text.read())
+    except CORRUPT_ERRORS as e:
+        raise ValueError(f"Arquivo de backup corrompido ou incompleto: {e}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Arquivo de backup inválido: {e}")
+    if not isinstance(legacy, dict):
+        raise ValueError("Arquivo de backup inválido: esperado um dicionário de usuários.")
+    return len(legacy), iter(legacy.items())
+
+
+def validate_record(key, value):
+    """Retorna uma mensagem de erro ou None se o registro puder ser restaurado."""
+    if not isinstance(key, str) or not key.strip():
+        return "chave vazia ou inválida"
+    if key == "global_alerts":
+        return None if isinstance(value, list) else "global_alerts deve ser uma lista"
+    if not isinstance(value, dict):
+        return "registro de usuário não é um objeto"
+    if not isinstance(value.get("password"), str) or not value["password"]:
+        return "usuário sem senha"
+    if not isinstance(value.get("logs", []), list):
+        return "campo 'logs' não é uma lista"
+    if not isinstance(value.get("agendas", {}), dict):
+        return "campo 'agendas' não é um objeto"
+    return None
+
+
+def merge_user(current, incoming):
+    """
+    Mescla um usuário do backup no registro atual sem sobrescrever nada:
+    entram apenas os dias de log, metas, matérias e simulados que faltam.
+    """
+    merged = dict(current)
+    dates = {str(l.get("data")) for l in current.get("logs", [])}
+    merged["logs"] = list(current.get("logs", [])) + [l for l in incoming.get("logs", []) if str(l.get("data")) not in dates]
+
+    agendas = dict(incoming.get("agendas", {}))
+    agendas.update(current.get("agendas", {}))
+    merged["agendas"] = agendas
+
+    templates = list(current.get("agenda_templates", []))
+    templates += [t for t in incoming.get("agenda_templates", []) if t not in templates]
+    if templates: merged["agenda_templates"] = templates
+
+    subjects = list(current.get("subjects_list", []))
+    subjects += [s for s in incoming.get("subjects_list", []) if s not in subjects]
+    if subjects: merged["subjects_list"] = subjects
+
+    progress = dict(incoming.get("simulados_progress", {}))
+    progress.update(current.get("simulados_progress", {}))
+    if progress: merged["simulados_progress"] = progress
+
+    for k, v in incoming.items():
+        merged.setdefault(k, v)
+    # Totais e marcos são refeitos do histórico mesclado no próximo acesso
+    merged.pop("progresso", None)
+    return merged
+
+
+def _merge_alerts(current, incoming):
+    seen = {(a.get("date"), a.get("text")) for a in current}
+    return list(current) + [a for a in incoming if (a.get("date"), a.get("text")) not in seen]
+
+
+def restore(db, fileobj, mode="mesclar", chunk_size=RESTORE_CHUNK_SIZE, progress=None):
+    """
+    Aplica um backup sobre db (em memória), em lotes de chunk_size registros.
+    mode='mesclar' preserva o que já existe; mode='substituir' troca o registro inteiro.
+    progress(n_processados, total) é chamado a cada lote. Retorna um relatório da operação.
+    Em caso de ValueError parte do backup pode já ter sido aplicada a db: não grave.
+    """
+    if mode not in RESTORE_MODES:
+        raise ValueError(f"Modo de restauração inválido: {mode}")
+
+    report = {"novos": 0, "mesclados": 0, "substituidos": 0, "erros": []}
+    processed = 0
+    chunk = []
+
+    def apply(batch):
+        for key, value in batch:
+            error = validate_record(key, value)
+            if error:
+                report["erros"].append(f"{key}: {error}")
+                continue
+            if key not in db:
+                db[key] = value
+                report["novos"] += 1
+            elif mode == "substituir":
+                db[key] = value
+                report["substituidos"] += 1
+            elif key == "global_alerts":
+                db[key] = _merge_alerts(db[key], value)
+                report["mesclados"] += 1
+            else:
+                db[key] = merge_user(db[key], value)
+                report["mesclados"] += 1
+
+    total, records = open_backup(fileobj)
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            apply(chunk)
+            processed += len(chunk)
+            chunk = []
+            if progress: progress(processed, total)
+    if chunk:
+        apply(chunk)
+        processed += len(chunk)
+        if progress: progress(processed, total)
+    report["processados"] = processed
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup e restauração do banco do Mentor SpartaJus.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_exp = sub.add_parser("exportar", help="Gera um backup compactado")
+    p_exp.add_argument("--db", default="sparta_users.json")
+    p_exp.add_argument("--saida", default=None)
+    p_exp.add_argument("--usuario", default=None, help="Exporta apenas este usuário")
+
+    p_res = sub.add_parser("restaurar", help="Aplica um backup sobre o banco")
+    p_res.add_argument("arquivo")
+    p_res.add_argument("--db", default="sparta_users.json")
+    p_res.add_argument("--modo", choices=RESTORE_MODES, default="mesclar")
+    args = parser.parse_args(argv)
+
+    db = {}
+    if os.path.exists(args.db):
+        with open(args.db, "r", encoding="utf-8") as f:
+            db = json.load(f)
+
+    if args.comando == "exportar":
+        keys = [args.usuario] if args.usuario else None
+        saida = args.saida or backup_filename(datetime.now(), args.usuario)
+        with open(saida, "wb") as f:
+            write_export(db, f, keys)
+        print(f"Backup gravado em {saida}")
+        return 0
+
+    with open(args.arquivo, "rb") as f:
+        report = restore(db, f, mode=args.modo)
+    temp_file = f"{args.db}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(db, f, indent=4, default=str)
+    os.replace(temp_file, args.db)
+    print(f"{report['processados']} registros: {report['novos']} novos, {report['mesclados']} mesclados, {report['substituidos']} substituídos.")
+    for erro in report["erros"]:
+        print(f"[ERRO] {erro}")
+    return 1 if report["erros"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Operações em lote do moderador: recrutas por CSV, banir/arquivar, matérias e mensagens.
+
+Cada operação altera só o banco já carregado (o dict); quem chama grava uma
+vez (data_manager.save) e sincroniza uma vez no fim do lote. Se algo falhar no
+meio, nada foi gravado. As senhas dos recrutas são geradas aqui e o hash roda
+em paralelo no pool de KDF de credentials; progress(n, total) é chamado a cada
+hash pronto, como em backup.restore.
+"""
+import csv
+import io
+import secrets
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+
+from . import credentials
+from .db_keys import ARCHIVED_KEY, RESERVED_KEYS
+from .users import new_user_record
+
+PASSWORD_LENGTH = 10
+PASSWORD_ALPHABET = "abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789"   # sem 0/O, 1/l/I
+MAX_USERNAME = 40
+
+# Nomes aceitos no cabeçalho do CSV para cada coluna
+USER_COLUMNS = ("usuario", "usuário", "user", "nome")
+PASSWORD_COLUMNS = ("senha", "password")
+SUBJECT_COLUMNS = ("materias", "matérias", "subjects")
+
+
+def generate_password(length: int = PASSWORD_LENGTH) -> str:
+    return "".join(secrets.choice(PASSWORD_ALPHABET) for _ in range(length))
+
+
+@dataclass(slots=True)
+class Recruit:
+    """Uma linha do CSV de recrutamento; 'gerada' marca senha criada aqui (precisa ser entregue)."""
+    usuario: str
+    senha: str
+    gerada: bool = False
+    materias: list[str] | None = None
+
+
+def _column(fieldnames, aliases) -> str | None:
+    for name in fieldnames or ():
+        if name and name.strip().lower() in aliases: return name
+    return None
+
+
+def parse_recruits(text: str) -> tuple[list[Recruit], list[str]]:
+    """
+    Lê o CSV (vírgula ou ponto e vírgula). Coluna de usuário obrigatória; senha
+    vazia é gerada; matérias separadas por '|'. Retorna (recrutas, erros por linha).
+    """
+    try: dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;")
+    except csv.Error: dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    user_col = _column(reader.fieldnames, USER_COLUMNS)
+    if user_col is None:
+        return [], [f"cabeçalho sem coluna de usuário (use uma de: {', '.join(USER_COLUMNS)})"]
+    pass_col = _column(reader.fieldnames, PASSWORD_COLUMNS)
+    subj_col = _column(reader.fieldnames, SUBJECT_COLUMNS)
+
+    recruits, errors, seen = [], [], set()
+    for line, row in enumerate(reader, start=2):
+        username = (row.get(user_col) or "").strip()
+        if not username:
+            errors.append(f"linha {line}: usuário vazio")
+            continue
+        if len(username) > MAX_USERNAME or username in RESERVED_KEYS:
+            errors.append(f"linha {line}: usuário inválido ({username[:MAX_USERNAME]})")
+            continue
+        if username in seen:
+            errors.append(f"linha {line}: {username} repetido no arquivo")
+            continue
+        seen.add(username)
+        password = (row.get(pass_col) or "").strip() if pass_col else ""
+        subjects = [s.strip() for s in (row.get(subj_col) or "").split("|") if s.strip()] if subj_col else []
+        recruits.append(Recruit(username, password or generate_password(), not password, subjects or None))
+    return recruits, errors
+
+
+def import_recruits(db: dict, recruits: list[Recruit], now, progress=None) -> dict:
+    """
+    Cria no db os recrutas que ainda não existem. Retorna
+    {'criados': [Recruit], 'existentes': [nome], 'erros': [texto]}.
+    """
+    report = {"criados": [], "existentes": [r.usuario for r in recruits if r.usuario in db], "erros": []}
+    new = [r for r in recruits if r.usuario not in db]
+    futures = {credentials.submit_hash(r.senha): r for r in new}
+    for done, future in enumerate(as_completed(futures), start=1):
+        r = futures[future]
+        try:
+            record = new_user_record(future.result(), now)
+        except Exception as e:
+            report["erros"].append(f"{r.usuario}: {e}")
+        else:
+            if r.materias: record["subjects_list"] = list(r.materias)
+            db[r.usuario] = record
+            report["criados"].append(r)
+        if progress: progress(done, len(new))
+    report["criados"].sort(key=lambda r: r.usuario)
+    return report
+
+
+def credentials_csv(recruits: list[Recruit]) -> str:
+    """CSV 'usuario,senha' das senhas geradas no lote, para entregar aos recrutas."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["usuario", "senha"])
+    writer.writerows([r.usuario, r.senha] for r in recruits if r.gerada)
+    return out.getvalue()
+
+
+def _targets(db: dict, usernames) -> list[str]:
+    return [u for u in dict.fromkeys(usernames) if u in db and u not in RESERVED_KEYS and isinstance(db[u], dict)]
+
+
+def ban_users(db: dict, usernames) -> list[str]:
+    """Remove os usuários do db; retorna os removidos."""
+    removed = _targets(db, usernames)
+    for u in removed:
+        del db[u]
+    return removed
+
+
+def archive_users(db: dict, usernames, now) -> list[str]:
+    """Marca os usuários como arquivados (login bloqueado, fora do ranking); retorna os que mudaram."""
+    changed = [u for u in _targets(db, usernames) if not db[u].get(ARCHIVED_KEY)]
+    for u in changed:
+        db[u][ARCHIVED_KEY] = str(now)
+    return changed
+
+
+def reactivate_users(db: dict, usernames) -> list[str]:
+    changed = [u for u in _targets(db, usernames) if db[u].get(ARCHIVED_KEY)]
+    for u in changed:
+        del db[u][ARCHIVED_KEY]
+    return changed
+
+
+def assign_subjects(db: dict, usernames, subjects, replace: bool = False) -> list[str]:
+    """Troca (replace=True) ou completa a lista de matérias dos usuários; retorna os que mudaram."""
+    subjects = list(dict.fromkeys(s.strip() for s in subjects if s and s.strip()))
+    changed = []
+    for u in _targets(db, usernames):
+        current = db[u].get("subjects_list", [])
+        updated = subjects if replace else current + [s for s in subjects if s not in current]
+        if updated != current:
+            db[u]["subjects_list"] = list(updated)
+            changed.append(u)
+    return changed
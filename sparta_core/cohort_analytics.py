@@ -0,0 +1,245 @@
+"""
+Análise da coorte para o painel do moderador.
+
+Usuários arquivados ou no arquivo frio ficam fora: o esboço frio não tem
+logs nem árvore e contaria como um aluno parado, sem ramos.
+
+Cada usuário é resumido uma única vez (dias ativos, questões por matéria,
+sequência final de estudo, ramos da árvore) e os agregados da coorte —
+usuários ativos por dia e questões por matéria — são mantidos somando e
+subtraindo a contribuição do usuário que mudou. Distribuição de fogo e
+usuários em risco saem dos resumos, sem reler os logs de ninguém.
+
+Uso (recalcular a partir do banco de usuários):
+    python -m sparta_core.cohort_analytics [--db sparta_users.json] [--saida analise_coorte.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from .db_keys import RESERVED_KEYS
+from .table_store import JsonTableStore
+from .tiering import is_cold
+from .users import is_archived
+
+ANALYTICS_FILE = "analise_coorte.json"
+ANALYTICS_VERSION = 2   # 2: arquivados e frios fora da tabela (a de versão 1 é recalculada)
+
+# Faixas da distribuição de fogo (dias consecutivos)
+STREAK_BUCKETS = ((0, 0, "0"), (1, 2, "1-2"), (3, 6, "3-6"), (7, 13, "7-13"), (14, 29, "14-29"), (30, None, "30+"))
+
+# Um usuário está "em risco" se perdeu um fogo de pelo menos RISK_MIN_STREAK dias
+# nos últimos RISK_WINDOW_DAYS, ou se a árvore perdeu ramos desde o último resumo.
+RISK_MIN_STREAK = 3
+RISK_WINDOW_DAYS = 30
+
+
+def _date_str(value):
+    if isinstance(value, datetime): return value.date().isoformat()
+    if isinstance(value, date): return value.isoformat()
+    if isinstance(value, str) and len(value) >= 10: return value[:10]
+    return None
+
+
+def record_fingerprint(data):
+    payload = json.dumps([data.get("logs", []), data.get("tree_branches")], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def summarize_user(data):
+    """Resumo compacto de um usuário (tudo que a análise da coorte precisa)."""
+    dias = set()
+    por_materia = {}
+    total_q = 0
+    for log in data.get("logs", []):
+        d = _date_str(log.get("data"))
+        if d and log.get("estudou", False):
+            dias.add(d)
+        total_q += int(log.get("questoes", 0) or 0)
+        for m, q in (log.get("questoes_detalhadas") or {}).items():
+            por_materia[m] = por_materia.get(m, 0) + int(q or 0)
+
+    dias = sorted(dias)
+    sequencia = 0
+    if dias:
+        # Sequência de dias consecutivos que termina no último dia estudado
+        check = date.fromisoformat(dias[-1])
+        for d in reversed(dias):
+            if date.fromisoformat(d) != check: break
+            sequencia += 1
+            check -= timedelta(days=1)
+
+    return {
+        "dias_ativos": dias,
+        "questoes_por_materia": por_materia,
+        "total_questoes": total_q,
+        "ultima_data": dias[-1] if dias else None,
+        "sequencia_final": sequencia,
+        "ramos": data.get("tree_branches", 0),
+    }
+
+
+def empty_table():
+    return {
+        "versao": ANALYTICS_VERSION, "atualizado_em": None,
+        "usuarios": {}, "ativos_por_dia": {}, "questoes_por_materia": {},
+    }
+
+
+def _apply(table, summary, sign):
+    """Soma (sign=1) ou retira (sign=-1) a contribuição de um resumo nos agregados."""
+    ativos = table["ativos_por_dia"]
+    for d in summary["dias_ativos"]:
+        ativos[d] = ativos.get(d, 0) + sign
+        if not ativos[d]: del ativos[d]
+    materias = table["questoes_por_materia"]
+    for m, q in summary["questoes_por_materia"].items():
+        materias[m] = materias.get(m, 0) + sign * q
+        if not materias[m]: del materias[m]
+
+
+def update_user(table, username, data):
+    """Atualiza um usuário (arquivado ou frio sai da tabela); retorna True se a tabela mudou."""
+    if is_archived(data) or is_cold(data):
+        return remove_user(table, username)
+    fingerprint = record_fingerprint(data)
+    current = table["usuarios"].get(username)
+    if current and current["assinatura"] == fingerprint:
+        return False
+
+    summary = summarize_user(data)
+    if current:
+        _apply(table, current, -1)
+        # Guarda o valor anterior para detectar árvore perdendo ramos
+        summary["ramos_anterior"] = current["ramos"] if current["ramos"] != summary["ramos"] else current.get("ramos_anterior", current["ramos"])
+    else:
+        summary["ramos_anterior"] = summary["ramos"]
+    summary["assinatura"] = fingerprint
+    _apply(table, summary, 1)
+    table["usuarios"][username] = summary
+    table["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return True
+
+
+def remove_user(table, username):
+    current = table["usuarios"].pop(username, None)
+    if not current: return False
+    _apply(table, current, -1)
+    table["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return True
+
+
+def refresh(table, db):
+    """Sincroniza com o banco inteiro; só usuários com assinatura nova são resumidos."""
+    changed = False
+    for username, data in db.items():
+        if username in RESERVED_KEYS or not isinstance(data, dict): continue
+        changed |= update_user(table, username, data)
+    for username in [u for u in table["usuarios"] if u not in db]:
+        changed |= remove_user(table, username)
+    return changed
+
+
+def current_streak(summary, today):
+    """Fogo atual a partir do resumo (a sequência só vale se o último estudo foi hoje ou ontem)."""
+    if not summary["ultima_data"]: return 0
+    gap = (today - date.fromisoformat(summary["ultima_data"])).days
+    return summary["sequencia_final"] if gap <= 1 else 0
+
+
+def cohort_report(table, today, days=30):
+    """Relatório da coorte pronto para exibir (custo proporcional ao nº de usuários, não de logs)."""
+    ativos = table["ativos_por_dia"]
+    janela = [today - timedelta(days=i) for i in range(days - 1, -1, -1)]
+    active_per_day = [(d, ativos.get(d.isoformat(), 0)) for d in janela]
+
+    distribution = {label: 0 for _, _, label in STREAK_BUCKETS}
+    at_risk = []
+    for username, summary in table["usuarios"].items():
+        streak = current_streak(summary, today)
+        for lo, hi, label in STREAK_BUCKETS:
+            if streak >= lo and (hi is None or streak <= hi):
+                distribution[label] += 1
+                break
+
+        motivos = []
+        if summary["ultima_data"] and streak == 0 and summary["sequencia_final"] >= RISK_MIN_STREAK:
+            gap = (today - date.fromisoformat(summary["ultima_data"])).days
+            if gap <= RISK_WINDOW_DAYS:
+                motivos.append(f"Perdeu fogo de {summary['sequencia_final']} dias (último estudo há {gap} dias)")
+        if summary["ramos"] < summary.get("ramos_anterior", summary["ramos"]):
+            motivos.append(f"Árvore caiu de {summary['ramos_anterior']} para {summary['ramos']} ramos")
+        if motivos:
+            at_risk.append({"usuario": username, "ultimo_estudo": summary["ultima_data"], "ramos": summary["ramos"], "motivo": "; ".join(motivos)})
+
+    at_risk.sort(key=lambda r: r["ultimo_estudo"] or "")
+    por_materia = sorted(table["questoes_por_materia"].items(), key=lambda x: x[1], reverse=True)
+    return {
+        "total_usuarios": len(table["usuarios"]),
+        "ativos_por_dia": active_per_day,
+        "questoes_por_materia": por_materia,
+        "distribuicao_fogo": distribution,
+        "em_risco": at_risk,
+        "atualizado_em": table["atualizado_em"],
+    }
+
+
+class CohortAnalyticsStore(JsonTableStore):
+    """Resumos por usuário e agregados da coorte, persistidos e compartilhados pelo processo."""
+    version = ANALYTICS_VERSION
+
+    def empty_table(self):
+        return empty_table()
+
+    def is_empty(self):
+        return not self.table()["usuarios"]
+
+    def update_user(self, username, data):
+        return self.mutate(update_user, username, data)
+
+    def update_users(self, db, usernames):
+        """update_user dos usuários do db numa gravação só (lotes do moderador)."""
+        def apply(table):
+            changed = False
+            for username in usernames:
+                if username in RESERVED_KEYS or not isinstance(db.get(username), dict): continue
+                changed = update_user(table, username, db[username]) or changed
+            return changed
+        return self.mutate(apply)
+
+    def remove_user(self, username):
+        return self.mutate(remove_user, username)
+
+    def refresh(self, db):
+        return self.mutate(refresh, db)
+
+    def report(self, today, days=30):
+        with self._lock:
+            return cohort_report(self._load_locked(), today, days)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula a análise da coorte.")
+    parser.add_argument("--db", default="sparta_users.json", help="Banco de usuários (JSON)")
+    parser.add_argument("--saida", default=ANALYTICS_FILE, help="Arquivo da tabela de análise")
+    parser.add_argument("--completo", action="store_true", help="Descarta a tabela atual e recalcula do zero")
+    args = parser.parse_args(argv)
+
+    with open(args.db, "r", encoding="utf-8") as f:
+        db = json.load(f)
+    if args.completo and os.path.exists(args.saida):
+        os.remove(args.saida)
+
+    store = CohortAnalyticsStore(args.saida)
+    store.refresh(db)
+    report = store.report(date.today())
+    print(f"{report['total_usuarios']} usuários, {len(report['em_risco'])} em risco.")
+    print("Distribuição de fogo:", report["distribuicao_fogo"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Forma compacta do histórico para quem mantém muitos usuários em memória.
+
+Cada log do Diário em JSON é um dict com oito chaves e um dict aninhado de
+matérias; aqui vira um CompactLog com __slots__: data como ordinal, matérias
+como ids pequenos (SubjectTable, a partir do subjects_list do usuário) e
+horários como strings internadas. O progresso de simulado troca o dict
+{"resposta", "acertou"} de cada questão por um código inteiro.
+
+A conversão é sem perdas: to_dict/to_logs/expand_progress devolvem o mesmo
+JSON que entrou. Registros fora do formato padrão (chaves extras ou
+ausentes, tipos antigos) são guardados como vieram em 'raw'/'extra'.
+"""
+import sys
+from dataclasses import dataclass
+from datetime import date
+
+from .models import Attempt
+from .routine import parse_clock
+from .simulado_progress import ANSWERS
+
+LOG_FIELDS = frozenset(("data", "acordou", "dormiu", "paginas", "series", "questoes", "questoes_detalhadas", "estudou"))
+LOG_FIELDS_MIN = LOG_FIELDS | {"acordou_min", "dormiu_min"}  # logs já migrados (routine.ensure_log_minutes)
+PROGRESS_FLAGS = ("em_andamento", "modo_repescagem", "log_salvo_no_diario")
+ATTEMPT_FIELDS = frozenset(("data", "modo", "acertos", "total"))
+
+
+def _is_int(value) -> bool:
+    return type(value) is int
+
+
+def _ordinal(value) -> int | None:
+    """Ordinal da data ISO, só se ela voltar exatamente igual (senão não é compactável)."""
+    if not isinstance(value, str): return None
+    try: day = date.fromisoformat(value)
+    except ValueError: return None
+    return day.toordinal() if day.isoformat() == value else None
+
+
+def _same_minutes(value, text: str) -> bool:
+    expected = parse_clock(text)
+    return value is None if expected is None else (_is_int(value) and value == expected)
+
+
+class SubjectTable:
+    """Nome de matéria <-> id inteiro; começa pelo subjects_list e cresce com matérias avulsas dos logs."""
+    __slots__ = ("names", "_ids")
+
+    def __init__(self, names=()):
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+        for name in names: self.id_of(name)
+
+    def id_of(self, name: str) -> int:
+        sid = self._ids.get(name)
+        if sid is None:
+            sid = self._ids[name] = len(self.names)
+            self.names.append(sys.intern(name))
+        return sid
+
+    def name_of(self, sid: int) -> str:
+        return self.names[sid]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@dataclass(slots=True)
+class CompactLog:
+    """
+    Um dia do Diário. 'detalhes' achata os pares (id da matéria, questões).
+    Os minutos migrados não ocupam espaço: com_minutos marca que o log os tinha
+    (iguais a parse_clock do texto) e to_dict os recalcula.
+    """
+    day: int
+    acordou: str
+    dormiu: str
+    paginas: int
+    series: int
+    questoes: int
+    detalhes: tuple[int, ...]
+    estudou: bool
+    com_minutos: bool = False
+    raw: dict | None = None
+
+    @property
+    def date(self) -> date | None:
+        return date.fromordinal(self.day) if self.day > 0 else None
+
+    def subjects(self, table: SubjectTable) -> dict[str, int]:
+        d = self.detalhes
+        return {table.names[d[i]]: d[i + 1] for i in range(0, len(d), 2)}
+
+    @classmethod
+    def from_dict(cls, d: dict, table: SubjectTable) -> "CompactLog":
+        day = _ordinal(d.get("data"))
+        detalhadas = d.get("questoes_detalhadas")
+        with_minutes = d.keys() == LOG_FIELDS_MIN
+        canonical = (
+            day is not None and (with_minutes or d.keys() == LOG_FIELDS)
+            and isinstance(d["acordou"], str) and isinstance(d["dormiu"], str)
+            and _is_int(d["paginas"]) and _is_int(d["series"]) and _is_int(d["questoes"])
+            and type(d["estudou"]) is bool and isinstance(detalhadas, dict)
+            and all(isinstance(m, str) and _is_int(q) for m, q in detalhadas.items())
+            and (not with_minutes or (_same_minutes(d["acordou_min"], d["acordou"])
+                                      and _same_minutes(d["dormiu_min"], d["dormiu"])))
+        )
+        if not canonical:
+            return cls(day or 0, "", "", 0, 0, 0, (), False, raw=dict(d))
+        detalhes = []
+        for m, q in detalhadas.items():
+            detalhes += (table.id_of(m), q)
+        return cls(day, sys.intern(d["acordou"]), sys.intern(d["dormiu"]), d["paginas"], d["series"],
+                   d["questoes"], tuple(detalhes), d["estudou"], with_minutes)
+
+    def to_dict(self, table: SubjectTable) -> dict:
+        if self.raw is not None: return dict(self.raw)
+        out = {"data": date.fromordinal(self.day).isoformat(), "acordou": self.acordou, "dormiu": self.dormiu}
+        if self.com_minutos:
+            out["acordou_min"] = parse_clock(self.acordou)
+            out["dormiu_min"] = parse_clock(self.dormiu)
+        out.update(paginas=self.paginas, series=self.series, questoes=self.questoes,
+                   questoes_detalhadas=self.subjects(table), estudou=self.estudou)
+        return out
+
+
+@dataclass(slots=True)
+class CompactHistory:
+    """Logs de um usuário com a tabela de matérias compartilhada entre eles."""
+    subjects: SubjectTable
+    logs: list[CompactLog]
+
+    @classmethod
+    def from_logs(cls, logs: list[dict], subjects_list=()) -> "CompactHistory":
+        table = SubjectTable(subjects_list)
+        return cls(table, [CompactLog.from_dict(l, table) for l in logs])
+
+    @classmethod
+    def from_user(cls, user_data: dict) -> "CompactHistory":
+        return cls.from_logs(user_data.get("logs", []), user_data.get("subjects_list", ()))
+
+    def to_logs(self) -> list[dict]:
+        return [l.to_dict(self.subjects) for l in self.logs]
+
+
+def _answer_code(value) -> int | None:
+    """(resposta, acertou) -> 0..3; None se a entrada não está no formato gravado por record_answer."""
+    if (isinstance(value, dict) and value.keys() == {"resposta", "acertou"}
+            and value["resposta"] in ANSWERS and type(value["acertou"]) is bool):
+        return ANSWERS.index(value["resposta"]) * 2 + value["acertou"]
+    return None
+
+
+@dataclass(slots=True)
+class CompactProgress:
+    """Progresso num simulado: respostas codificadas, marcas (None = ausente) e histórico tipado."""
+    answers: dict[str, int]
+    em_andamento: bool | None = None
+    modo_repescagem: bool | None = None
+    log_salvo_no_diario: bool | None = None
+    historico: list[Attempt] | None = None
+    extra: dict | None = None
+
+    def answer(self, q_id: str) -> tuple[str, bool] | None:
+        code = self.answers.get(q_id)
+        return None if code is None else (ANSWERS[code >> 1], bool(code & 1))
+
+    @classmethod
+    def from_dict(cls, progress: dict) -> "CompactProgress":
+        compact = cls({})
+        extra = {}
+        for key, value in progress.items():
+            if key in PROGRESS_FLAGS and type(value) is bool:
+                setattr(compact, key, value)
+            elif key == "historico" and isinstance(value, list) and all(
+                    isinstance(h, dict) and h.keys() == ATTEMPT_FIELDS and isinstance(h["data"], str)
+                    and isinstance(h["modo"], str) and _is_int(h["acertos"]) and _is_int(h["total"]) for h in value):
+                compact.historico = [Attempt(h["data"], sys.intern(h["modo"]), h["acertos"], h["total"]) for h in value]
+            elif key not in PROGRESS_FLAGS and key != "historico" and (code := _answer_code(value)) is not None:
+                compact.answers[sys.intern(key)] = code
+            else:
+                extra[key] = value
+        compact.extra = extra or None
+        return compact
+
+    def to_dict(self) -> dict:
+        out = {q_id: {"resposta": ANSWERS[code >> 1], "acertou": bool(code & 1)} for q_id, code in self.answers.items()}
+        for flag in PROGRESS_FLAGS:
+            value = getattr(self, flag)
+            if value is not None: out[flag] = value
+        if self.historico is not None: out["historico"] = [a.to_dict() for a in self.historico]
+        if self.extra: out.update(self.extra)
+        return out
+
+
+def compact_progress(user_data: dict) -> dict[str, CompactProgress]:
+    return {k: CompactProgress.from_dict(v) for k, v in user_data.get("simulados_progress", {}).items()}
+
+
+def expand_progress(progress: dict[str, CompactProgress]) -> dict[str, dict]:
+    return {k: v.to_dict() for k, v in progress.items()}
@@ -0,0 +1,188 @@
+"""
+Credenciais: hash de senha com KDF salgado, migração transparente e limitador de tentativas.
+
+Formatos armazenados (o prefixo identifica o esquema):
+    pbkdf2_sha256$<iteracoes>$<sal_b64>$<hash_b64>   (padrão)
+    scrypt$<n>$<r>$<p>$<sal_b64>$<hash_b64>
+    <64 hex>                                         (legado: SHA-256 sem sal)
+    qualquer outro texto                             (legado: texto plano)
+
+Hashes legados ou com parâmetros mais fracos que os atuais são aceitos e
+sinalizados para regravação no próximo login. Uma verificação ou um hash
+avulso roda na thread de quem chama (a resposta depende dele, e hashlib libera
+o GIL, então outras sessões seguem atendidas); o pool de KDF serve aos lotes,
+que calculam muitos hashes em paralelo (submit_hash).
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_SCHEME = "pbkdf2_sha256"
+PBKDF2_ITERATIONS = int(os.environ.get("SPARTA_PBKDF2_ITERATIONS", 310_000))
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+SALT_BYTES = 16
+
+VERIFY_CACHE_SIZE = 256
+KDF_WORKERS = 4   # threads do pool de hashes em lote
+
+# Limitador: no máximo MAX_FAILURES falhas por usuário dentro de FAILURE_WINDOW segundos
+MAX_FAILURES = 5
+FAILURE_WINDOW = 300
+# Nomes acompanhados pelo limitador (tentativas com nomes inventados não crescem a memória sem fim)
+MAX_TRACKED_KEYS = 10_000
+
+_HEX = frozenset("0123456789abcdefABCDEF")
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+def hash_password(password, scheme=DEFAULT_SCHEME):
+    """Gera o hash salgado da senha no formato com prefixo."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    if scheme == "scrypt":
+        dk = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(dk)}"
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(dk)}"
+
+
+def identify(stored):
+    """Esquema de um hash armazenado: 'pbkdf2_sha256', 'scrypt', 'sha256' ou 'plaintext'."""
+    if stored.startswith("pbkdf2_sha256$"): return "pbkdf2_sha256"
+    if stored.startswith("scrypt$"): return "scrypt"
+    if len(stored) == 64 and _HEX.issuperset(stored): return "sha256"
+    return "plaintext"
+
+
+def _verify_uncached(stored, provided):
+    scheme = identify(stored)
+    try:
+        if scheme == "pbkdf2_sha256":
+            _, iterations, salt, expected = stored.split("$")
+            dk = hashlib.pbkdf2_hmac("sha256", provided.encode(), _unb64(salt), int(iterations))
+            return hmac.compare_digest(dk, _unb64(expected)), int(iterations) < PBKDF2_ITERATIONS
+        if scheme == "scrypt":
+            _, n, r, p, salt, expected = stored.split("$")
+            dk = hashlib.scrypt(provided.encode(), salt=_unb64(salt), n=int(n), r=int(r), p=int(p))
+            return hmac.compare_digest(dk, _unb64(expected)), int(n) < SCRYPT_N
+    except (ValueError, TypeError):
+        return False, False
+    if scheme == "sha256":
+        legacy = hashlib.sha256(provided.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored.lower()), True
+    # Fallback para legado (texto plano)
+    return hmac.compare_digest(stored.encode(), provided.encode()), True
+
+
+class _VerifyCache:
+    """
+    LRU de verificações bem-sucedidas. A senha nunca fica em memória: a chave
+    é um HMAC com segredo aleatório do processo.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._key = secrets.token_bytes(32)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _token(self, stored, provided):
+        return hmac.new(self._key, f"{stored}\0{provided}".encode(), hashlib.sha256).digest()
+
+    def get(self, stored, provided):
+        token = self._token(stored, provided)
+        with self._lock:
+            result = self._data.get(token)
+            if result is not None:
+                self._data.move_to_end(token)
+            return result
+
+    def put(self, stored, provided, result):
+        token = self._token(stored, provided)
+        with self._lock:
+            self._data[token] = result
+            self._data.move_to_end(token)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+
+_cache = _VerifyCache(VERIFY_CACHE_SIZE)
+_executor = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="sparta-kdf")
+
+
+def verify_password(stored_password, provided_password):
+    """
+    Verifica a senha. Suporta legado (SHA-256 e texto plano) e migração automática.
+    Retorna (bool_is_valid, bool_needs_update).
+    """
+    cached = _cache.get(stored_password, provided_password)
+    if cached is not None:
+        return cached
+    result = _verify_uncached(stored_password, provided_password)
+    if result[0]:
+        _cache.put(stored_password, provided_password, result)
+    return result
+
+
+def submit_hash(password):
+    """Agenda o hash de uma nova senha no pool de KDF (lotes); retorna um Future com o hash."""
+    return _executor.submit(hash_password, password)
+
+
+class LoginRateLimiter:
+    """
+    Janela deslizante de falhas por usuário (em memória, por processo). Os nomes
+    ficam em ordem da última falha; os que já saíram da janela são descartados a
+    cada falha nova e, acima de max_keys, sai o de falha mais antiga.
+    """
+
+    def __init__(self, max_failures=MAX_FAILURES, window=FAILURE_WINDOW, clock=time.monotonic, max_keys=MAX_TRACKED_KEYS):
+        self.max_failures = max_failures
+        self.window = window
+        self.clock = clock
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key, now):
+        q = self._failures.get(key)
+        while q and now - q[0] > self.window:
+            q.popleft()
+        if q is not None and not q:
+            del self._failures[key]
+        return q
+
+    def retry_after(self, key):
+        """Segundos até liberar novas tentativas (0 = liberado)."""
+        with self._lock:
+            now = self.clock()
+            q = self._prune(key, now)
+            if not q or len(q) < self.max_failures: return 0
+            return max(0, int(self.window - (now - q[0])) + 1)
+
+    def register_failure(self, key):
+        with self._lock:
+            now = self.clock()
+            self._prune(key, now)
+            self._failures.setdefault(key, deque()).append(now)
+            self._failures.move_to_end(key)
+            while self._failures:
+                oldest, q = next(iter(self._failures.items()))
+                if now - q[-1] <= self.window and len(self._failures) <= self.max_keys: break
+                del self._failures[oldest]
+
+    def register_success(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
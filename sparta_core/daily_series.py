@@ -0,0 +1,243 @@
+"""
+Série diária densa de um usuário: uma coluna NumPy por métrica, indexada pelo dia.
+
+O índice de cada coluna é (ordinal da data - origin). Dias sem log valem 0
+(ou NaN nos horários). Assim o fogo, os filtros do Dashboard, o Comportamento
+e as médias móveis viram fatias de arrays, sem percorrer a lista de dicts.
+A série é montada uma vez por usuário (SeriesCache). study_logs.upsert_log e
+add_questions_to_day a atualizam no lugar, e uma lista de logs nova
+(histórico reescrito, outro registro) força a remontagem.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+
+from .compact import SubjectTable
+from .dates import get_today_br, parse_log_date
+from .routine import log_minutes
+from .session_store import DerivedCache
+
+MAX_CACHED_USERS = 256
+GROWTH_SLACK = 64   # dias extras alocados quando a série cresce
+COUNT_COLUMNS = ("questoes", "paginas", "series", "estudou", "registros")
+
+
+def _minutes(log: dict, field: str) -> float:
+    minutes = log_minutes(log, field)
+    return np.nan if minutes is None else minutes
+
+
+def _int(value) -> int:
+    try: return int(value or 0)
+    except (TypeError, ValueError): return 0
+
+
+class DailySeries:
+    """Colunas por dia de um usuário; 'por_materia' é a matriz matéria x dia."""
+    __slots__ = ("origin", "length", "subjects", "questoes", "paginas", "series", "estudou", "registros",
+                 "acordou_min", "dormiu_min", "por_materia", "_cumsum")
+
+    def __init__(self, origin: int, capacity: int, subjects: SubjectTable):
+        self.origin = origin
+        self.length = 0
+        self.subjects = subjects
+        for name in COUNT_COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int32))
+        self.acordou_min = np.full(capacity, np.nan, dtype=np.float32)
+        self.dormiu_min = np.full(capacity, np.nan, dtype=np.float32)
+        self.por_materia = np.zeros((max(len(subjects), 1), capacity), dtype=np.int32)
+        self._cumsum = {}
+
+    @classmethod
+    def build(cls, logs: list[dict], subjects_list=()) -> "DailySeries":
+        days = [d.toordinal() for d in (parse_log_date(l.get("data")) for l in logs) if d]
+        # Sem logs a janela é o dia de hoje no Brasil (servidor em UTC erraria perto da meia-noite)
+        first, last = (min(days), max(days)) if days else (get_today_br().toordinal(),) * 2
+        series = cls(first, last - first + 1 + GROWTH_SLACK, SubjectTable(subjects_list))
+        for log in logs:
+            series.add(log)
+        return series
+
+    # --- atualização no lugar ---
+    def _index(self, day: date) -> int:
+        """Índice do dia, realocando as colunas se ele cai fora do intervalo atual."""
+        idx = day.toordinal() - self.origin
+        capacity = self.questoes.shape[0]
+        if idx < 0:
+            self._grow(front=-idx + GROWTH_SLACK, back=0)
+            idx = day.toordinal() - self.origin
+        elif idx >= capacity:
+            self._grow(front=0, back=idx - capacity + 1 + GROWTH_SLACK)
+        self.length = max(self.length, idx + 1)
+        return idx
+
+    def _grow(self, front: int, back: int):
+        for name in COUNT_COLUMNS:
+            setattr(self, name, np.pad(getattr(self, name), (front, back)))
+        for name in ("acordou_min", "dormiu_min"):
+            setattr(self, name, np.pad(getattr(self, name), (front, back), constant_values=np.nan))
+        self.por_materia = np.pad(self.por_materia, ((0, 0), (front, back)))
+        self.origin -= front
+        self.length += front
+
+    def _subject_row(self, name: str) -> int:
+        sid = self.subjects.id_of(name)
+        if sid >= self.por_materia.shape[0]:
+            self.por_materia = np.pad(self.por_materia, ((0, sid + 1 - self.por_materia.shape[0]), (0, 0)))
+        return sid
+
+    def _apply(self, log: dict, sign: int):
+        day = parse_log_date(log.get("data"))
+        if not day: return
+        i = self._index(day)
+        self.questoes[i] += sign * _int(log.get("questoes"))
+        self.paginas[i] += sign * _int(log.get("paginas"))
+        self.series[i] += sign * _int(log.get("series"))
+        self.estudou[i] += sign * bool(log.get("estudou", False))
+        self.registros[i] += sign
+        for m, q in (log.get("questoes_detalhadas") or {}).items():
+            row = self._subject_row(m)  # pode realocar a matriz
+            self.por_materia[row, i] += sign * _int(q)
+        if sign > 0:
+            self.acordou_min[i] = _minutes(log, "acordou")
+            self.dormiu_min[i] = _minutes(log, "dormiu")
+        elif self.registros[i] == 0:
+            self.acordou_min[i] = self.dormiu_min[i] = np.nan
+        self._cumsum.clear()
+
+    def add(self, log: dict):
+        self._apply(log, 1)
+
+    def remove(self, log: dict):
+        self._apply(log, -1)
+
+    def replace(self, old: dict | None, new: dict):
+        if old is not None: self.remove(old)
+        self.add(new)
+
+    # --- consultas ---
+    def index_of(self, day: date) -> int:
+        return day.toordinal() - self.origin
+
+    def day_of(self, idx: int) -> date:
+        return date.fromordinal(self.origin + int(idx))
+
+    def date_bounds(self) -> tuple[date, date] | None:
+        """Primeiro e último dia com log (mesmo resultado de study_logs.date_bounds)."""
+        logged = np.flatnonzero(self.registros[:self.length])
+        if not logged.size: return None
+        return self.day_of(logged[0]), self.day_of(logged[-1])
+
+    def _clip(self, start: date, end: date) -> tuple[int, int]:
+        return max(self.index_of(start), 0), min(self.index_of(end) + 1, self.length)
+
+    def streak(self, today: date) -> int:
+        """Fogo: mesma regra de progression.calculate_streak, em O(dias)."""
+        studied = self.estudou[:self.length] > 0
+        hits = np.flatnonzero(studied)
+        if not hits.size: return 0
+        last = hits[-1]
+        if self.index_of(today) - last > 1: return 0
+        gaps = np.flatnonzero(~studied[:last + 1])
+        return int(last - (gaps[-1] + 1 if gaps.size else 0) + 1)
+
+    def questions_by_subject(self, start: date, end: date, subjects) -> tuple[dict[str, int], int]:
+        """Como study_logs.questions_by_subject, mas matérias com total 0 no período ficam de fora."""
+        lo, hi = self._clip(start, end)
+        details = {}
+        if hi <= lo: return details, 0
+        for name in dict.fromkeys(subjects):
+            sid = self.subjects._ids.get(name)
+            if sid is None or sid >= self.por_materia.shape[0]: continue
+            total = int(self.por_materia[sid, lo:hi].sum())
+            if total: details[name] = total
+        return details, sum(details.values())
+
+    def logged_days(self) -> tuple[np.ndarray, np.ndarray]:
+        """(datas, questões) dos dias com log, em ordem (gráfico de evolução)."""
+        idx = np.flatnonzero(self.registros[:self.length])
+        days = np.datetime64(date.fromordinal(self.origin), "D") + idx
+        return days, self.questoes[idx]
+
+    def cumsum(self, column: str) -> np.ndarray:
+        """Soma acumulada da coluna com um 0 na frente (somas de janela em O(1)); refeita só após mudanças."""
+        cached = self._cumsum.get(column)
+        if cached is None:
+            values = getattr(self, column)[:self.length]
+            cached = self._cumsum[column] = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+        return cached
+
+    def window_sum(self, column: str, start: date, end: date) -> int:
+        lo, hi = self._clip(start, end)
+        if hi <= lo: return 0
+        c = self.cumsum(column)
+        return int(c[hi] - c[lo])
+
+    def rolling_mean(self, column: str, window: int) -> np.ndarray:
+        """Média móvel de 'window' dias corridos (dias sem log contam como 0), alinhada aos dias da série."""
+        c = self.cumsum(column)
+        idx = np.arange(1, self.length + 1)
+        lo = np.maximum(idx - window, 0)
+        return (c[idx] - c[lo]) / np.minimum(idx, window)
+
+    def values_between(self, column: str, start: date, end: date) -> np.ndarray:
+        """Coluna no intervalo [start, end], com 0 (NaN nos horários) nos dias fora da série."""
+        n = max((end - start).days + 1, 0)
+        source = getattr(self, column)
+        out = np.full(n, np.nan) if source.dtype.kind == "f" else np.zeros(n, dtype=np.int64)
+        lo, hi = self._clip(start, end)
+        if hi > lo:
+            offset = self.origin + lo - start.toordinal()
+            out[offset:offset + hi - lo] = source[lo:hi]
+        return out
+
+    def rolling_means(self, column: str, windows, start: date, end: date) -> dict[int, np.ndarray]:
+        """
+        Médias móveis (dias corridos, sem log = 0) para cada dia de [start, end].
+        Antes do primeiro log a janela encolhe, para o começo do histórico não parecer fraco.
+        """
+        longest = max(windows)
+        values = self.values_between(column, start - timedelta(days=longest), end)
+        c = np.concatenate(([0], np.cumsum(values)))
+        k = np.arange(longest, len(values)) + 1   # posição (em c) de cada dia de [start, end]
+        bounds = self.date_bounds()
+        first = bounds[0].toordinal() - (start.toordinal() - longest) if bounds else 0
+        elapsed = np.maximum(k - max(first, 0), 1)
+        return {w: (c[k] - c[np.maximum(k - w, 0)]) / np.minimum(elapsed, w) for w in windows}
+
+    def heatmap(self, year: int, column: str = "questoes") -> np.ndarray:
+        """Calendário do ano: matriz 7 x 54 (dia da semana x semana), NaN nos dias fora do ano."""
+        start = date(year, 1, 1)
+        values = self.values_between(column, start, date(year, 12, 31))
+        pos = np.arange(values.size) + start.weekday()
+        grid = np.full((7, 54), np.nan)
+        grid[pos % 7, pos // 7] = values
+        return grid
+
+    def years(self) -> list[int]:
+        bounds = self.date_bounds()
+        return list(range(bounds[1].year, bounds[0].year - 1, -1)) if bounds else []
+
+    def month_slice(self, year: int, month: int) -> slice:
+        start = date(year, month, 1)
+        end = date(year + month // 12, month % 12 + 1, 1)
+        lo = max(self.index_of(start), 0)
+        hi = min(max(self.index_of(end), 0), self.length)
+        return slice(lo, max(lo, hi))
+
+    def months(self) -> list[tuple[int, int]]:
+        """(ano, mês) com logs, do mais recente para o mais antigo."""
+        idx = np.flatnonzero(self.registros[:self.length])
+        if not idx.size: return []
+        months = np.unique((np.datetime64(date.fromordinal(self.origin), "D") + idx).astype("datetime64[M]"))
+        return [(int(m) // 12 + 1970, int(m) % 12 + 1) for m in months.astype(np.int64)[::-1]]
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, n).nbytes for n in COUNT_COLUMNS + ("acordou_min", "dormiu_min", "por_materia"))
+
+
+class SeriesCache(DerivedCache):
+    """Uma DailySeries por usuário; remontada quando user_data['logs'] é trocada por outra lista."""
+
+    def __init__(self, max_users: int = MAX_CACHED_USERS):
+        super().__init__(("logs",), lambda user_data: DailySeries.build(user_data.get("logs", []), user_data.get("subjects_list", ())), max_users)
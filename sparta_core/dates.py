@@ -0,0 +1,41 @@
+"""Fuso de Brasília e normalização das datas gravadas nos logs."""
+from datetime import date, datetime, timedelta, timezone
+
+BRT = timezone(timedelta(hours=-3))
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def get_now_br() -> datetime:
+    """Retorna o timestamp atual em Brasília"""
+    return datetime.now(BRT)
+
+
+def get_today_br() -> date:
+    """Retorna a data de hoje em Brasília"""
+    return get_now_br().date()
+
+
+def parse_log_date(value) -> date | None:
+    """Data de um log, aceite ela gravada como texto 'YYYY-MM-DD', date ou datetime."""
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date): return value
+    if isinstance(value, str):
+        text = value[:10]
+        # Caminho rápido para o formato gravado ('YYYY-MM-DD'); o que ele recusa passa pelo strptime
+        if len(text) == 10 and text[4] == "-" and text[7] == "-" and text.isascii():
+            try: return date.fromisoformat(text)
+            except ValueError: pass
+        try: return datetime.strptime(text, DATE_FORMAT).date()
+        except ValueError: return None
+    return None
+
+
+def format_date(value: date | datetime | str) -> str:
+    if isinstance(value, (date, datetime)): return value.strftime(DATE_FORMAT)
+    return str(value)
+
+
+def format_date_br(value) -> str:
+    """Data de log para exibição (DD/MM/AAAA); texto que não é data volta como veio."""
+    day = parse_log_date(value)
+    return day.strftime("%d/%m/%Y") if day else str(value)
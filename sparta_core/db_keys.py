@@ -0,0 +1,5 @@
+"""Chaves do banco de usuários usadas por vários módulos (sem importações, para não criar ciclos)."""
+
+# Chaves do banco que não são usuários
+RESERVED_KEYS = ("global_alerts",)
+ARCHIVED_KEY = "arquivado_em"   # presente = conta arquivada pelo moderador (login bloqueado)
@@ -0,0 +1,184 @@
+"""
+Instrumentação dos caminhos quentes: spans de tempo agregados em histogramas.
+
+Cada operação (leitura do banco, ida ao Sheets, renderização de seção, gráfico)
+vira um histograma por processo, com contagem, soma, baldes cumulativos (para
+exportar no formato de texto do Prometheus) e uma janela das amostras mais
+recentes de onde saem p50/p95/p99.
+
+Com SPARTA_METRICS=0 a instrumentação fica desligada: span() devolve um
+contexto nulo compartilhado e timed() devolve a própria função, sem custo
+por chamada.
+
+Uso:
+    with instrumentation.span("db.load"):
+        ...
+
+    @instrumentation.timed("sheets.sync_up")
+    def sync_up(...): ...
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get("SPARTA_METRICS", "1") != "0"
+
+METRIC_NAME = "sparta_duracao_segundos"
+# Limites superiores dos baldes, em segundos
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Amostras recentes mantidas por histograma para os percentis
+WINDOW_SIZE = 1024
+PERCENTILES = (50, 95, 99)
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max", "window")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # último balde = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+        self.window.append(seconds)
+
+    def percentile(self, p):
+        """Percentil (ordem mais próxima) sobre a janela de amostras recentes."""
+        if not self.window: return 0.0
+        ordered = sorted(self.window)
+        rank = max(1, -(-p * len(ordered) // 100))
+        return ordered[int(rank) - 1]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """Histogramas do processo, indexados por (operação, rótulos)."""
+
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._hists.get(key)
+            if hist is None:
+                hist = self._hists[key] = Histogram()
+            hist.observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+            self.started_at = time.time()
+
+    def summary(self):
+        """Uma linha por operação, da mais cara (tempo total) para a mais barata."""
+        with self._lock:
+            rows = []
+            for (name, labels), h in self._hists.items():
+                row = {"operacao": name, "rotulos": dict(labels), "n": h.count, "total_s": h.total, "max_s": h.max}
+                for p in PERCENTILES:
+                    row[f"p{p}_s"] = h.percentile(p)
+                rows.append(row)
+        rows.sort(key=lambda r: r["total_s"], reverse=True)
+        return rows
+
+    def to_json(self):
+        return json.dumps({"desde": self.started_at, "operacoes": self.summary()}, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Formato de exposição em texto do Prometheus (um único histograma com rótulo 'op')."""
+        lines = [
+            f"# HELP {METRIC_NAME} Duração das operações instrumentadas do Mentor SpartaJus.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            items = sorted(self._hists.items())
+            for (name, labels), h in items:
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in (("op", name),) + labels)
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), h.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f"{METRIC_NAME}_sum{{{base}}} {h.total}")
+                lines.append(f"{METRIC_NAME}_count{{{base}}} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start", "elapsed")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        registry.observe(self.name, self.elapsed, **self.labels)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+    elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **labels):
+    """Context manager que mede o bloco e registra em 'name' (mesmo se o bloco levantar)."""
+    if not ENABLED: return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def timed(name, **labels):
+    """Decorador: mede cada chamada da função em 'name'."""
+    def decorator(fn):
+        if not ENABLED: return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds, **labels):
+    """Registra uma duração já medida."""
+    if ENABLED:
+        registry.observe(name, seconds, **labels)
@@ -0,0 +1,35 @@
+"""
+Migrações do banco local que não esperam o login de cada usuário.
+
+    python -m sparta_core.migrations horarios [--banco sparta_users.json]
+
+horarios: grava acordou_min/dormiu_min em todos os logs (routine.migrate_times).
+ensure_structure faz o mesmo por usuário no login; isto adianta o banco todo.
+"""
+import argparse
+import os
+import sys
+
+from .routine import migrate_times
+from .storage import SpartaDataManager
+
+MIGRATIONS = {"horarios": migrate_times}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrações do banco local do Mentor SpartaJus.")
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # raiz do app
+    parser.add_argument("migracao", choices=sorted(MIGRATIONS))
+    parser.add_argument("--banco", default=os.path.join(base_dir, "sparta_users.json"))
+    args = parser.parse_args(argv)
+
+    dm = SpartaDataManager(args.banco, None)
+    db = dm.load()
+    changed = MIGRATIONS[args.migracao](db)
+    if changed: dm.save(db, sync=False)
+    print(f"{args.migracao}: {changed} registro(s) migrado(s) em {args.banco}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Modelos de dados do Mentor SpartaJus.
+
+O banco continua sendo JSON (dicionários); estas classes são a forma tipada
+de montar e ler os registros nas bordas — from_dict tolera campos ausentes ou
+com tipos antigos e to_dict devolve exatamente o formato gravado.
+"""
+from dataclasses import dataclass, field
+
+from .dates import format_date
+from .routine import parse_clock
+
+DEFAULT_SUBJECTS = ("Constitucional", "Administrativo", "Penal", "Civil", "Processo Civil")
+
+
+def _int(value, default: int = 0) -> int:
+    try: return int(value)
+    except (TypeError, ValueError): return default
+
+
+@dataclass(slots=True)
+class LogEntry:
+    """Um dia do Diário."""
+    data: str
+    acordou: str = "06:00"
+    dormiu: str = "22:00"
+    paginas: int = 0
+    series: int = 0
+    questoes: int = 0
+    questoes_detalhadas: dict[str, int] = field(default_factory=dict)
+    estudou: bool = False
+    # Horários normalizados (minutos desde a meia-noite), sempre derivados do texto
+    acordou_min: int | None = field(init=False, default=None)
+    dormiu_min: int | None = field(init=False, default=None)
+
+    def __post_init__(self):
+        self.acordou_min = parse_clock(self.acordou)
+        self.dormiu_min = parse_clock(self.dormiu)
+
+    @classmethod
+    def create(cls, day, acordou: str, dormiu: str, paginas: int, series: int, questoes_detalhadas: dict[str, int]) -> "LogEntry":
+        """Novo registro: total de questões e 'estudou' derivados dos detalhes."""
+        total = sum(questoes_detalhadas.values())
+        return cls(format_date(day), acordou, dormiu, paginas, series, total, dict(questoes_detalhadas), paginas > 0 or total > 0)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "LogEntry":
+        return cls(
+            data=format_date(d.get("data", "")),
+            acordou=str(d.get("acordou", "06:00")),
+            dormiu=str(d.get("dormiu", "22:00")),
+            paginas=_int(d.get("paginas")),
+            series=_int(d.get("series")),
+            questoes=_int(d.get("questoes")),
+            questoes_detalhadas={str(m): _int(q) for m, q in (d.get("questoes_detalhadas") or {}).items()},
+            estudou=bool(d.get("estudou", False)),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "data": self.data, "acordou": self.acordou, "dormiu": self.dormiu,
+            "acordou_min": self.acordou_min, "dormiu_min": self.dormiu_min,
+            "paginas": self.paginas, "series": self.series, "questoes": self.questoes,
+            "questoes_detalhadas": dict(self.questoes_detalhadas), "estudou": self.estudou,
+        }
+
+
+@dataclass(slots=True)
+class Question:
+    id: str
+    enunciado: str
+    resposta_correta: str
+    justificativa: str = ""
+
+    @classmethod
+    def from_dict(cls, d: dict, position: int) -> "Question":
+        return cls(str(d.get("id", position)), d.get("enunciado", ""), d.get("resposta_correta", ""), d.get("justificativa", ""))
+
+
+@dataclass(slots=True)
+class Simulado:
+    key: str
+    titulo: str
+    materia: str
+    questoes: list[Question]
+
+    @classmethod
+    def from_dict(cls, key: str, d: dict) -> "Simulado":
+        questoes = [Question.from_dict(q, i) for i, q in enumerate(d.get("questoes", []), 1)]
+        return cls(key, d.get("titulo", key), d.get("materia", "Geral"), questoes)
+
+
+@dataclass(slots=True)
+class Attempt:
+    """Uma tentativa concluída de simulado (entrada do 'historico')."""
+    data: str
+    modo: str
+    acertos: int
+    total: int
+
+    @property
+    def percentual(self) -> float:
+        return self.acertos / max(self.total, 1) * 100
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Attempt":
+        return cls(d.get("data", ""), d.get("modo", ""), _int(d.get("acertos")), _int(d.get("total"), 1))
+
+    def to_dict(self) -> dict:
+        return {"data": self.data, "modo": self.modo, "acertos": self.acertos, "total": self.total}
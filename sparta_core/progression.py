@@ -0,0 +1,212 @@
+"""
+Patentes, estrelas de leitura, fogo (dias seguidos) e ranking.
+
+Patentes e estrelas saem de tabelas montadas na importação (PATENTS,
+STAR_TABLE): o nível é uma divisão inteira e um índice. Os totais de questões
+e páginas ficam em user_data["progresso"], atualizados por study_logs a cada
+dia gravado. É ali também que ficam os marcos: cada vez que um total cruza uma
+patente ou uma estrela nova, o cruzamento é registrado com a data do dia.
+Assim a tela e o ranking leem totais e "promovido em" sem somar o histórico.
+"""
+from datetime import date, timedelta
+
+from .dates import format_date, get_today_br, parse_log_date
+from .db_keys import ARCHIVED_KEY, RESERVED_KEYS
+
+PATENTS = (
+    "O Maltrapilho (fase iniciante)",
+    "O Comum (fase q banca te humilha)",
+    "O Cadastrado (fase mediana)",
+    "O Altivo (fase da perseverança)",
+    "O Espartano (fase da autonomia)",
+)
+QUESTIONS_PER_PATENT = 5000
+PAGES_PER_BRONZE = 1000
+MAX_BRONZE = 27   # 27 bronzes = 3 ouros, o teto
+
+PROGRESS_KEY = "progresso"
+COLD_LOGS_KEY = "logs_frios"   # resumo dos logs movidos para o arquivo frio (tiering)
+PATENT = "patente"
+STARS = "estrelas"
+
+
+def _star_table() -> tuple[tuple[int, int, int], ...]:
+    """STAR_TABLE[n] = (ouro, prata, bronze) para n bronzes acumulados: 3 bronzes viram 1 prata, 3 pratas 1 ouro."""
+    return tuple((n // 9, n % 9 // 3, n % 3) for n in range(MAX_BRONZE + 1))
+
+
+STAR_TABLE = _star_table()
+
+
+def patent_level(total_questions: int) -> int:
+    return min(max(int(total_questions / QUESTIONS_PER_PATENT), 0), len(PATENTS) - 1)
+
+
+def star_level(total_pages: int) -> int:
+    """Bronzes acumulados (um a cada PAGES_PER_BRONZE páginas), até MAX_BRONZE."""
+    return min(max(int(total_pages / PAGES_PER_BRONZE), 0), MAX_BRONZE)
+
+
+def get_patent(total_questions: int) -> str:
+    return PATENTS[patent_level(total_questions)]
+
+
+def get_stars(total_pages: int) -> tuple[int, int, int]:
+    """(ouro, prata, bronze): 3 bronzes viram 1 prata, 3 pratas viram 1 ouro (máx. 3 ouros)."""
+    return STAR_TABLE[star_level(total_pages)]
+
+
+def format_stars(stars: tuple[int, int, int]) -> str:
+    gold, silver, bronze = stars
+    return "🟡" * gold + "⚪" * silver + "🟤" * bronze
+
+
+def patent_progress(total_questions: int) -> tuple[float, int]:
+    """(% da patente atual já feito, questões que faltam para a próxima) — a barra do topo."""
+    done = total_questions % QUESTIONS_PER_PATENT
+    return done / QUESTIONS_PER_PATENT * 100, QUESTIONS_PER_PATENT - done
+
+
+# --- totais correntes e marcos ---
+def _milestone(kind: str, level: int, day) -> dict:
+    title = PATENTS[level] if kind == PATENT else f"{format_stars(STAR_TABLE[level])} ({level * PAGES_PER_BRONZE} páginas)"
+    return {"tipo": kind, "nivel": level, "titulo": title, "data": format_date(day)}
+
+
+def _advance(progress: dict, day) -> list[dict]:
+    """Registra os níveis que os totais atuais passaram pela primeira vez; retorna os marcos novos."""
+    events = []
+    for kind, level in ((PATENT, patent_level(progress["questoes"])), (STARS, star_level(progress["paginas"]))):
+        reached = progress[kind]
+        if level > reached:
+            events += [_milestone(kind, n, day) for n in range(reached + 1, level + 1)]
+            progress[kind] = level
+    progress["marcos"].extend(events)
+    return events
+
+
+def build_progress(logs: list[dict]) -> dict:
+    """Reconstrói totais e marcos repassando o histórico em ordem de data (registros antigos)."""
+    progress = {"questoes": 0, "paginas": 0, PATENT: 0, STARS: 0, "marcos": []}
+    dated = sorted(((d, l) for d, l in ((parse_log_date(l.get("data")), l) for l in logs) if d), key=lambda x: x[0])
+    for day, log in dated:
+        progress["questoes"] += log.get("questoes", 0)
+        progress["paginas"] += log.get("paginas", 0)
+        _advance(progress, day)
+    # Logs sem data válida contam nos totais, mas não têm dia para um marco
+    undated = [l for l in logs if not parse_log_date(l.get("data"))]
+    progress["questoes"] += sum(l.get("questoes", 0) for l in undated)
+    progress["paginas"] += sum(l.get("paginas", 0) for l in undated)
+    return progress
+
+
+def _cold_totals(user_data: dict) -> tuple[int, int]:
+    cold = user_data.get(COLD_LOGS_KEY)
+    return (cold.get("questoes", 0), cold.get("paginas", 0)) if isinstance(cold, dict) else (0, 0)
+
+
+def user_progress(user_data: dict) -> dict:
+    """user_data["progresso"], montado a partir do histórico (e do resumo dos logs frios) na primeira vez."""
+    progress = user_data.get(PROGRESS_KEY)
+    if not isinstance(progress, dict):
+        progress = build_progress(user_data.get("logs", []))
+        cold_q, cold_p = _cold_totals(user_data)
+        if cold_q or cold_p:
+            # Sem os logs frios não há datas: os totais entram por inteiro e os marcos novos ficam no dia de hoje
+            progress["questoes"] += cold_q
+            progress["paginas"] += cold_p
+            _advance(progress, get_today_br())
+        user_data[PROGRESS_KEY] = progress
+    return progress
+
+
+def user_totals(user_data: dict) -> tuple[int, int]:
+    """(total de questões, total de páginas) sem somar os logs."""
+    progress = user_progress(user_data)
+    return progress["questoes"], progress["paginas"]
+
+
+def record_progress(user_data: dict, questions: int, pages: int, day) -> list[dict]:
+    """Soma a variação de um dia gravado aos totais e registra os marcos cruzados nesse dia."""
+    progress = user_progress(user_data)
+    progress["questoes"] += questions
+    progress["paginas"] += pages
+    return _advance(progress, day)
+
+
+def refresh_progress(user_data: dict, day) -> list[dict]:
+    """Depois de reescrever o histórico: totais refeitos dos logs (quentes e frios), marcos já registrados preservados."""
+    progress = user_progress(user_data)
+    q, p = totals(user_data.get("logs", []))
+    cold_q, cold_p = _cold_totals(user_data)
+    progress["questoes"], progress["paginas"] = q + cold_q, p + cold_p
+    return _advance(progress, day)
+
+
+def milestones(user_data: dict, kind: str | None = None) -> list[dict]:
+    """Marcos do usuário, do mais recente para o mais antigo."""
+    events = user_progress(user_data)["marcos"]
+    return [e for e in reversed(events) if kind is None or e["tipo"] == kind]
+
+
+def promoted_on(user_data: dict) -> str | None:
+    """Data (ISO) em que o usuário chegou à patente que tem hoje; None na primeira patente."""
+    progress = user_data.get(PROGRESS_KEY)
+    if not isinstance(progress, dict): return None
+    level = patent_level(progress["questoes"])
+    for event in reversed(progress["marcos"]):
+        if event["tipo"] == PATENT and event["nivel"] == level: return event["data"]
+    return None
+
+
+def totals(logs: list[dict]) -> tuple[int, int]:
+    """(total de questões, total de páginas) de todos os logs."""
+    return sum(l.get("questoes", 0) for l in logs), sum(l.get("paginas", 0) for l in logs)
+
+
+def calculate_streak(logs: list[dict], today: date | None = None) -> int:
+    """Calcula os dias consecutivos de estudo (streak) com robustez de tipos."""
+    if not logs: return 0
+    study_dates = sorted({d for d in (parse_log_date(l.get("data")) for l in logs if l.get("estudou", False)) if d}, reverse=True)
+    if not study_dates: return 0
+
+    today = today or get_today_br()
+    if (today - study_dates[0]).days > 1: return 0
+
+    current_check = study_dates[0]
+    streak = 0
+    for d in study_dates:
+        if d == current_check:
+            streak += 1
+            current_check -= timedelta(days=1)
+        else: break
+    return streak
+
+
+def ranking_rows(db: dict) -> list[dict]:
+    """
+    Hall da fama: {'User', 'Q', 'Patente', 'Desde'} dos usuários ativos (não
+    arquivados), do maior para o menor total. Usa os totais correntes; soma os logs só de quem ainda não os tem.
+    """
+    rows = []
+    for username, data in db.items():
+        if username in RESERVED_KEYS or not isinstance(data, dict) or data.get(ARCHIVED_KEY): continue
+        progress = data.get(PROGRESS_KEY)
+        q = progress["questoes"] if isinstance(progress, dict) else sum(l.get("questoes", 0) for l in data.get("logs", []))
+        rows.append({"User": username, "Q": q, "Patente": get_patent(q), "Desde": promoted_on(data)})
+    rows.sort(key=lambda x: x["Q"], reverse=True)
+    return rows
+
+
+def recent_promotions(db: dict, since: date) -> list[dict]:
+    """Promoções de patente da coorte a partir de 'since', mais recentes primeiro (lidas dos marcos)."""
+    start = since.isoformat()
+    rows = []
+    for username, data in db.items():
+        if username in RESERVED_KEYS or not isinstance(data, dict): continue
+        progress = data.get(PROGRESS_KEY)
+        if not isinstance(progress, dict): continue
+        rows += [{"User": username, "Patente": e["titulo"], "Data": e["data"]}
+                 for e in progress["marcos"] if e["tipo"] == PATENT and e["data"] >= start]
+    rows.sort(key=lambda x: x["Data"], reverse=True)
+    return rows
@@ -0,0 +1,199 @@
+"""
+Estatísticas de dificuldade das questões para toda a coorte.
+
+A tabela pré-calculada (estatisticas_questoes.json) guarda, por usuário, uma
+assinatura do 'simulados_progress' e as respostas atuais; por questão, o número
+de tentativas, a acurácia e o índice de discriminação. A atualização é
+incremental: só os usuários cuja assinatura mudou são relidos e só os simulados
+tocados por eles são reagregados.
+
+Uso (recalcular a partir do banco de usuários):
+    python -m sparta_core.question_stats [--db sparta_users.json] [--saida estatisticas_questoes.json]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+from .db_keys import RESERVED_KEYS
+from .table_store import JsonTableStore
+
+STATS_FILE = "estatisticas_questoes.json"
+STATS_VERSION = 1
+
+# Grupos superior/inferior clássicos (27%) para o índice de discriminação
+DISCRIMINATION_GROUP = 0.27
+MIN_USERS_DISCRIMINATION = 5
+
+
+def progress_fingerprint(simulados_progress):
+    """Assinatura estável do progresso de simulados de um usuário."""
+    payload = json.dumps(simulados_progress or {}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def extract_answers(simulados_progress):
+    """Reduz o progresso a {simulado: {id_questao: 1 (acerto) | 0 (erro)}}."""
+    respostas = {}
+    for sim_key, progress in (simulados_progress or {}).items():
+        if not isinstance(progress, dict): continue
+        answered = {q_id: int(bool(v["acertou"])) for q_id, v in progress.items() if isinstance(v, dict) and "acertou" in v}
+        if answered:
+            respostas[sim_key] = answered
+    return respostas
+
+
+def empty_table():
+    return {"versao": STATS_VERSION, "atualizado_em": None, "usuarios": {}, "questoes": {}}
+
+
+def aggregate_simulado(user_answers):
+    """
+    Agrega as respostas de todos os usuários de um simulado.
+    user_answers: lista de {id_questao: 0|1} (uma entrada por usuário).
+    """
+    questoes = {}
+    for answers in user_answers:
+        for q_id, hit in answers.items():
+            entry = questoes.setdefault(q_id, {"tentativas": 0, "acertos": 0})
+            entry["tentativas"] += 1
+            entry["acertos"] += hit
+
+    for entry in questoes.values():
+        entry["acuracia"] = entry["acertos"] / entry["tentativas"]
+        entry["discriminacao"] = None
+
+    # Índice de discriminação: acurácia no grupo superior menos no inferior,
+    # ordenando os usuários pelo desempenho geral no próprio simulado.
+    if len(user_answers) >= MIN_USERS_DISCRIMINATION:
+        ranked = sorted(user_answers, key=lambda a: sum(a.values()) / len(a))
+        size = max(1, int(round(len(ranked) * DISCRIMINATION_GROUP)))
+        lower, upper = ranked[:size], ranked[-size:]
+        for q_id, entry in questoes.items():
+            up = [a[q_id] for a in upper if q_id in a]
+            low = [a[q_id] for a in lower if q_id in a]
+            if up and low:
+                entry["discriminacao"] = sum(up) / len(up) - sum(low) / len(low)
+    return questoes
+
+
+def _reaggregate(table, sim_keys):
+    for sim_key in sim_keys:
+        user_answers = [u["respostas"][sim_key] for u in table["usuarios"].values() if sim_key in u["respostas"]]
+        if user_answers:
+            table["questoes"][sim_key] = aggregate_simulado(user_answers)
+        else:
+            table["questoes"].pop(sim_key, None)
+
+
+def update_user(table, username, simulados_progress):
+    """
+    Atualiza a contribuição de um único usuário.
+    Retorna True se algo mudou (a tabela precisa ser gravada).
+    """
+    fingerprint = progress_fingerprint(simulados_progress)
+    current = table["usuarios"].get(username)
+    if current and current["assinatura"] == fingerprint:
+        return False
+
+    respostas = extract_answers(simulados_progress)
+    dirty = set(respostas)
+    if current:
+        # Simulados que mudaram ou deixaram de existir no progresso do usuário
+        dirty = {k for k in dirty | set(current["respostas"]) if current["respostas"].get(k) != respostas.get(k)}
+    table["usuarios"][username] = {"assinatura": fingerprint, "respostas": respostas}
+    _reaggregate(table, dirty)
+    table["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return True
+
+
+def remove_user(table, username):
+    current = table["usuarios"].pop(username, None)
+    if not current: return False
+    _reaggregate(table, set(current["respostas"]))
+    table["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return True
+
+
+def refresh(table, db):
+    """Sincroniza a tabela com o banco inteiro, relendo só usuários alterados."""
+    changed = False
+    for username, data in db.items():
+        if username in RESERVED_KEYS or not isinstance(data, dict): continue
+        changed |= update_user(table, username, data.get("simulados_progress", {}))
+    for username in [u for u in table["usuarios"] if u not in db]:
+        changed |= remove_user(table, username)
+    return changed
+
+
+def order_by_difficulty(questoes, sim_stats, hardest_first=True):
+    """
+    Ordena as questões de um simulado pela acurácia da coorte.
+    Questões ainda sem tentativas ficam no fim, na ordem original.
+    """
+    def key(item):
+        pos, q = item
+        entry = sim_stats.get(str(q.get("id", pos + 1)))
+        if not entry: return (1, 0, pos)
+        acc = entry["acuracia"]
+        return (0, acc if hardest_first else -acc, pos)
+    return [q for _, q in sorted(enumerate(questoes), key=key)]
+
+
+class QuestionStatsStore(JsonTableStore):
+    """Tabela de estatísticas persistida em arquivo próprio, compartilhada pelo processo."""
+    version = STATS_VERSION
+
+    def empty_table(self):
+        return empty_table()
+
+    def simulado_stats(self, sim_key):
+        return self.table()["questoes"].get(sim_key, {})
+
+    def is_empty(self):
+        return not self.table()["usuarios"]
+
+    def update_user(self, username, simulados_progress):
+        return self.mutate(update_user, username, simulados_progress)
+
+    def update_users(self, db, usernames):
+        """update_user dos usuários do db numa gravação só (lotes do moderador)."""
+        def apply(table):
+            changed = False
+            for username in usernames:
+                if username in RESERVED_KEYS or not isinstance(db.get(username), dict): continue
+                changed = update_user(table, username, db[username].get("simulados_progress", {})) or changed
+            return changed
+        return self.mutate(apply)
+
+    def remove_user(self, username):
+        return self.mutate(remove_user, username)
+
+    def refresh(self, db):
+        return self.mutate(refresh, db)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula as estatísticas de dificuldade das questões.")
+    parser.add_argument("--db", default="sparta_users.json", help="Banco de usuários (JSON)")
+    parser.add_argument("--saida", default=STATS_FILE, help="Arquivo da tabela de estatísticas")
+    parser.add_argument("--completo", action="store_true", help="Descarta a tabela atual e recalcula do zero")
+    args = parser.parse_args(argv)
+
+    with open(args.db, "r", encoding="utf-8") as f:
+        db = json.load(f)
+    if args.completo and os.path.exists(args.saida):
+        os.remove(args.saida)
+
+    store = QuestionStatsStore(args.saida)
+    store.refresh(db)
+    table = store.table()
+    total_q = sum(len(v) for v in table["questoes"].values())
+    print(f"{len(table['usuarios'])} usuários, {len(table['questoes'])} simulados, {total_q} questões com tentativas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
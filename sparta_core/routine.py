@@ -0,0 +1,97 @@
+"""
+Horários de acordar/dormir e os hábitos do mês (aba Comportamento).
+
+Os logs guardam o horário como o aluno digitou ('06:00', '6h30', '22 15') e,
+desde a migração, também em minutos desde a meia-noite ('acordou_min' /
+'dormiu_min', None se o texto não é um horário). As análises leem os
+minutos. parse_clock só entra em logs antigos, com cache por texto.
+A migração do banco inteiro fica em sparta_core.migrations.
+"""
+import re
+from datetime import time
+from functools import lru_cache
+
+import numpy as np
+
+EARLY_WAKE = time(6, 0)
+SLEEP_WINDOW = (time(18, 0), time(22, 0))
+TIME_FIELDS = (("acordou", "acordou_min"), ("dormiu", "dormiu_min"))
+
+# Os formatos do strptime original ("%H:%M", "%Hh%M", "%H:%M:%S", "%H %M") mais a hora cheia:
+# '06:00', '6:5', '6h30', '6H30', '06:00:00', '6 30', '22h', '6H'. Só o número ('22') não é horário.
+_CLOCK_RE = re.compile(r"([0-9]{1,2})(?::([0-9]{1,2})(?::([0-9]{1,2}))?|[hH]([0-9]{1,2})?|\s+([0-9]{1,2}))")
+
+
+@lru_cache(maxsize=4096)
+def parse_clock(text) -> int | None:
+    """Horário em texto livre -> minutos desde a meia-noite (None se não for um horário válido)."""
+    m = _CLOCK_RE.fullmatch(str(text).strip())
+    if not m: return None
+    hours, minutes = int(m.group(1)), int(m.group(2) or m.group(4) or m.group(5) or 0)
+    if hours > 23 or minutes > 59 or (m.group(3) and int(m.group(3)) > 59): return None
+    return hours * 60 + minutes
+
+
+def parse_clock_many(values) -> np.ndarray:
+    """parse_clock em lote (lista, Series ou array): cada texto distinto é lido uma vez; NaN onde não reconhece."""
+    values = list(values)
+    codes = {}
+    index = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.intp, count=len(values))
+    parsed = np.array([np.nan if (m := parse_clock(v)) is None else m for v in codes], dtype=float)
+    return parsed[index]
+
+
+def log_minutes(log: dict, field: str) -> int | None:
+    """Minutos do horário do log ('acordou' ou 'dormiu'): o valor migrado, ou o texto lido agora (log antigo)."""
+    key = field + "_min"
+    if key in log: return log[key]
+    return parse_clock(log.get(field, ""))
+
+
+def ensure_log_minutes(log: dict) -> bool:
+    """Grava acordou_min/dormiu_min coerentes com o texto. Retorna se o log mudou."""
+    changed = False
+    for field, key in TIME_FIELDS:
+        minutes = parse_clock(log.get(field, ""))
+        if key not in log or log[key] != minutes:
+            log[key] = minutes
+            changed = True
+    return changed
+
+
+def migrate_times(db: dict) -> int:
+    """Migra os logs de todos os usuários do banco (textos lidos em lote). Retorna quantos logs mudaram."""
+    logs = [log for data in db.values() if isinstance(data, dict) for log in data.get("logs", [])]
+    changed = set()
+    for field, key in TIME_FIELDS:
+        for log, m in zip(logs, parse_clock_many(log.get(field, "") for log in logs)):
+            minutes = None if np.isnan(m) else int(m)
+            if key not in log or log[key] != minutes:
+                log[key] = minutes
+                changed.add(id(log))
+    return len(changed)
+
+
+def _minutes_of(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def series_behavior_months(series) -> list[str]:
+    """Meses ('MM/YYYY') com registros na DailySeries do usuário, do mais recente para o mais antigo."""
+    return [f"{m:02d}/{y}" for y, m in series.months()]
+
+
+def series_month_behavior(series, month: str) -> dict[str, int]:
+    """Dias do mês ('MM/YYYY') que acordou antes das 6h, dormiu entre 18h e 22h, treinou e leu (vetorizado sobre a fatia do mês)."""
+    mon, year = (int(x) for x in month.split("/"))
+    s = series.month_slice(year, mon)
+    logged = series.registros[s] > 0
+    wake, sleep = series.acordou_min[s], series.dormiu_min[s]
+    early = _minutes_of(EARLY_WAKE)
+    lo, hi = (_minutes_of(t) for t in SLEEP_WINDOW)
+    return {
+        "acordou_cedo": int((logged & (wake < early)).sum()),
+        "dormiu_cedo": int((logged & (sleep >= lo) & (sleep < hi)).sum()),
+        "treino": int((logged & (series.series[s] > 0)).sum()),
+        "leitura": int((logged & (series.paginas[s] > 0)).sum()),
+    }
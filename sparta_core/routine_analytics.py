@@ -0,0 +1,124 @@
+"""
+Sono e rotina (aba Comportamento): duração do sono, regularidade dos
+horários, relação entre sono e rendimento do dia seguinte e carga semanal
+de treino.
+
+Tudo sai das colunas da DailySeries (minutos de acordar/dormir, questões,
+páginas, séries) com operações vetoriais sobre o período pedido.
+
+Convenção: o log do dia D traz a hora em que acordou em D e a hora em que
+foi dormir na noite de D. A noite que antecede D vai de dormiu[D-1] a
+acordou[D]. Um 'dormiu' antes do meio-dia é lido como depois da meia-noite
+(00:30 = 24:30).
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+DAY = 24 * 60
+NOON = 12 * 60
+MAX_SLEEP = 16 * 60      # durações acima disso (ou <= 0) são erro de digitação, não sono
+MIN_POINTS = 7           # dias mínimos para uma correlação
+
+
+@dataclass(slots=True)
+class RoutineReport:
+    dias: np.ndarray                  # datas do período (datetime64[D])
+    sono_h: np.ndarray                # horas de sono da noite anterior a cada dia (NaN sem dado)
+    sono_medio_h: float | None
+    sono_desvio_h: float | None
+    acordar_medio: float | None       # minutos desde a meia-noite
+    acordar_desvio_min: float | None  # regularidade: desvio-padrão do horário de acordar
+    dormir_medio: float | None        # minutos, pode passar de 1440 (depois da meia-noite)
+    dormir_desvio_min: float | None
+    corr_sono_questoes: float | None
+    corr_sono_paginas: float | None
+    semanas: np.ndarray               # segunda-feira de cada semana (datetime64[D])
+    carga_semanal: np.ndarray         # séries de musculação por semana
+    dias_treino: np.ndarray           # dias com treino por semana
+
+
+def _mean(values) -> float | None:
+    return float(np.nanmean(values)) if np.isfinite(values).any() else None
+
+
+def _std(values) -> float | None:
+    return float(np.nanstd(values)) if np.isfinite(values).sum() >= 2 else None
+
+
+def bedtimes(dormiu_min: np.ndarray) -> np.ndarray:
+    """Hora de dormir em minutos contínuos: antes do meio-dia conta como madrugada seguinte (+24h)."""
+    return np.where(dormiu_min < NOON, dormiu_min + DAY, dormiu_min)
+
+
+def sleep_minutes(acordou_min: np.ndarray, dormiu_prev: np.ndarray) -> np.ndarray:
+    """Duração da noite: de dormiu[D-1] (contínuo) até acordou[D] + 24h; NaN se implausível."""
+    duration = acordou_min + DAY - bedtimes(dormiu_prev)
+    return np.where((duration > 0) & (duration <= MAX_SLEEP), duration, np.nan)
+
+
+def correlation(x: np.ndarray, y: np.ndarray) -> float | None:
+    """Pearson só nos dias com os dois valores; None se há poucos pontos ou variância zero."""
+    ok = np.isfinite(x) & np.isfinite(y)
+    if ok.sum() < MIN_POINTS: return None
+    x, y = x[ok], y[ok]
+    if x.std() == 0 or y.std() == 0: return None
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def weekly_load(start: date, values: np.ndarray, trained: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(segundas, soma por semana, dias com treino por semana), semanas de segunda a domingo."""
+    week = (np.arange(values.size) + start.weekday()) // 7
+    n = int(week[-1]) + 1 if values.size else 0
+    monday = np.datetime64(start - timedelta(days=start.weekday()), "D") + 7 * np.arange(n)
+    return monday, np.bincount(week, weights=values, minlength=n), np.bincount(week, weights=trained, minlength=n)
+
+
+def routine_report(series, start: date, end: date) -> RoutineReport:
+    """Relatório do período [start, end] a partir da DailySeries do usuário."""
+    day_before = start - timedelta(days=1)
+    wake = series.values_between("acordou_min", start, end)
+    bed_all = series.values_between("dormiu_min", day_before, end)
+    logged = series.values_between("registros", start, end) > 0
+    questoes = series.values_between("questoes", start, end).astype(float)
+    paginas = series.values_between("paginas", start, end).astype(float)
+    treino = series.values_between("series", start, end).astype(float)
+
+    sleep = sleep_minutes(wake, bed_all[:-1])
+    bed = bedtimes(bed_all[1:])
+    # rendimento só conta em dias registrados (dia sem log não é dia de zero questões)
+    questoes_dia = np.where(logged, questoes, np.nan)
+    paginas_dia = np.where(logged, paginas, np.nan)
+    semanas, carga, dias_treino = weekly_load(start, treino, treino > 0)
+
+    sleep_std = _std(sleep)
+    return RoutineReport(
+        dias=np.datetime64(start, "D") + np.arange(wake.size),
+        sono_h=sleep / 60,
+        sono_medio_h=None if (m := _mean(sleep)) is None else m / 60,
+        sono_desvio_h=None if sleep_std is None else sleep_std / 60,
+        acordar_medio=_mean(wake),
+        acordar_desvio_min=_std(wake),
+        dormir_medio=_mean(bed),
+        dormir_desvio_min=_std(bed),
+        corr_sono_questoes=correlation(sleep, questoes_dia),
+        corr_sono_paginas=correlation(sleep, paginas_dia),
+        semanas=semanas,
+        carga_semanal=carga,
+        dias_treino=dias_treino,
+    )
+
+
+def format_clock(minutes: float | None) -> str:
+    """Minutos (podendo passar de 24h) -> 'HH:MM'."""
+    if minutes is None: return "—"
+    m = int(round(minutes)) % DAY
+    return f"{m // 60:02d}:{m % 60:02d}"
+
+
+def describe_correlation(r: float | None) -> str:
+    if r is None: return "dados insuficientes"
+    strength = "forte" if abs(r) >= 0.5 else "moderada" if abs(r) >= 0.3 else "fraca"
+    direction = "positiva" if r > 0 else "negativa"
+    return f"{strength} {direction} (r = {r:+.2f})"
@@ -0,0 +1,158 @@
+"""
+Cache de registros de usuário compartilhado entre sessões do Streamlit.
+
+Cada usuário logado tem um único registro em memória no processo, não importa
+quantas abas estejam abertas: as sessões guardam só o nome do usuário e um
+token, e pegam o registro daqui a cada rerun. O cache conta quantas sessões
+usam cada registro; sessões sem atividade por SESSION_TTL deixam de contar e
+registros sem sessões são descartados em ordem LRU além de MAX_IDLE_RECORDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL = 3600
+MAX_IDLE_RECORDS = 64
+SWEEP_INTERVAL = 30
+
+
+class _Entry:
+    __slots__ = ("record", "sessions", "last_used")
+
+    def __init__(self, record, now):
+        self.record = record
+        self.sessions = {}  # token da sessão -> último acesso
+        self.last_used = now
+
+
+class UserRecordCache:
+    def __init__(self, session_ttl=SESSION_TTL, max_idle_records=MAX_IDLE_RECORDS, clock=time.monotonic):
+        self.session_ttl = session_ttl
+        self.max_idle_records = max_idle_records
+        self.clock = clock
+        self._entries = OrderedDict()  # usuário -> _Entry (ordem = uso mais recente no fim)
+        self._session_user = {}        # token -> usuário
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+
+    def _touch_locked(self, username, token, now):
+        entry = self._entries[username]
+        entry.sessions[token] = now
+        entry.last_used = now
+        self._entries.move_to_end(username)
+        return entry.record
+
+    def _detach_locked(self, token):
+        username = self._session_user.pop(token, None)
+        entry = self._entries.get(username)
+        if entry:
+            entry.sessions.pop(token, None)
+
+    def _sweep_locked(self, now, force=False):
+        if not force and now - self._last_sweep < SWEEP_INTERVAL: return
+        self._last_sweep = now
+        # Sessões abandonadas (aba fechada sem sair) deixam de segurar o registro
+        for username, entry in self._entries.items():
+            for token, seen in list(entry.sessions.items()):
+                if now - seen > self.session_ttl:
+                    del entry.sessions[token]
+                    self._session_user.pop(token, None)
+        idle = [u for u, e in self._entries.items() if not e.sessions]  # do menos para o mais recente
+        excess = len(idle) - self.max_idle_records
+        for username in idle:
+            if excess > 0 or now - self._entries[username].last_used > self.session_ttl:
+                del self._entries[username]
+                excess -= 1
+
+    def acquire(self, username, token, loader):
+        """
+        Associa a sessão ao usuário (soltando o usuário anterior dessa sessão).
+        Se o registro ainda não está em memória, loader() o fornece.
+        """
+        with self._lock:
+            now = self.clock()
+            if self._session_user.get(token) != username:
+                self._detach_locked(token)
+            entry = self._entries.get(username)
+            if entry is None or entry.record is None:
+                record = loader()
+                if record is None: return None
+                if entry is None:
+                    self._entries[username] = _Entry(record, now)
+                else:
+                    entry.record = record
+            self._session_user[token] = username
+            record = self._touch_locked(username, token, now)
+            self._sweep_locked(now)
+            return record
+
+    def get(self, username, token, loader):
+        """Registro compartilhado do usuário para esta sessão (recarrega se foi descartado)."""
+        return self.acquire(username, token, loader)
+
+    def release(self, token):
+        """Logout: a sessão deixa de segurar o registro."""
+        with self._lock:
+            self._detach_locked(token)
+            self._sweep_locked(self.clock())
+
+    def put(self, username, record):
+        """Registro recém-gravado pela sessão do dono passa a ser o compartilhado (mesmo que tenha sido recarregado no meio)."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry:
+                entry.record = record
+
+    def invalidate(self, username=None):
+        """
+        Descarta o registro em memória (ou todos, sem argumento) após uma escrita
+        feita por fora da sessão do dono (moderação, restauração). As sessões
+        continuam associadas e recarregam o registro no próximo acesso.
+        """
+        with self._lock:
+            targets = list(self._entries) if username is None else [username]
+            for u in targets:
+                entry = self._entries.get(u)
+                if entry:
+                    entry.record = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "registros": len(self._entries),
+                "sessoes": len(self._session_user),
+                "ociosos": sum(1 for e in self._entries.values() if not e.sessions),
+            }
+
+
+class DerivedCache:
+    """
+    Estruturas derivadas de um campo do registro (séries, índices), uma por
+    usuário e compartilhadas entre sessões. Cada entrada vale enquanto os
+    campos 'fields' do registro forem os mesmos objetos; se algum foi trocado
+    (histórico reescrito, registro recarregado) build(user_data) remonta.
+    Quem altera esses campos no lugar atualiza a estrutura junto.
+    """
+
+    def __init__(self, fields, build, max_users=256):
+        self.fields = tuple(fields)
+        self.build = build
+        self.max_users = max_users
+        self._entries = OrderedDict()  # usuário -> (objetos dos campos, estrutura)
+        self._lock = threading.RLock()
+
+    def get(self, username, user_data):
+        sources = tuple(user_data.get(f) for f in self.fields)
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or any(a is not b for a, b in zip(entry[0], sources)):
+                entry = self._entries[username] = (sources, self.build(user_data))
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+            return entry[1]
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None: self._entries.clear()
+            else: self._entries.pop(username, None)
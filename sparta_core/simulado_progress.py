@@ -0,0 +1,71 @@
+"""
+Progresso de um usuário num simulado: respostas, conclusão e novas tentativas.
+
+Formato (user_data['simulados_progress'][chave]):
+    {"<id da questão>": {"resposta": "Certo", "acertou": True}, ...,
+     "em_andamento": bool, "modo_repescagem": bool,
+     "historico": [Attempt.to_dict(), ...], "log_salvo_no_diario": bool}
+"""
+from .models import Attempt
+
+ANSWERS = ("Certo", "Errado")
+
+
+def get_progress(user_data: dict, sim_key: str) -> dict:
+    return user_data.setdefault("simulados_progress", {}).setdefault(sim_key, {})
+
+
+def answer_of(progress: dict, q_id: str) -> dict | None:
+    value = progress.get(q_id)
+    return value if isinstance(value, dict) and "acertou" in value else None
+
+
+def count_answered(progress: dict) -> int:
+    return sum(1 for v in progress.values() if isinstance(v, dict) and "acertou" in v)
+
+
+def count_correct(progress: dict) -> int:
+    return sum(1 for v in progress.values() if isinstance(v, dict) and v.get("acertou"))
+
+
+def record_answer(progress: dict, q_id: str, resposta: str, gabarito: str) -> bool:
+    """Grava a resposta (uma única vez por tentativa); retorna se acertou."""
+    acertou = (resposta == gabarito)
+    progress[q_id] = {"resposta": resposta, "acertou": acertou}
+    return acertou
+
+
+def finish_if_complete(progress: dict, total_questions: int, when: str) -> Attempt | None:
+    """Fecha a tentativa quando todas as questões foram respondidas, registrando-a no histórico."""
+    if not total_questions or not progress.get("em_andamento", True): return None
+    if count_answered(progress) != total_questions: return None
+    attempt = Attempt(when, "Somente Erradas" if progress.get("modo_repescagem") else "Completo", count_correct(progress), total_questions)
+    progress.setdefault("historico", []).append(attempt.to_dict())
+    progress["em_andamento"] = False
+    return attempt
+
+
+def history(progress: dict) -> list[Attempt]:
+    return [Attempt.from_dict(h) for h in progress.get("historico", [])]
+
+
+def restart_full(user_data: dict, sim_key: str) -> dict:
+    """Nova tentativa completa: só histórico e a marca do Diário sobrevivem."""
+    old = get_progress(user_data, sim_key)
+    user_data["simulados_progress"][sim_key] = {
+        "historico": old.get("historico", []),
+        "em_andamento": True,
+        "modo_repescagem": False,
+        "log_salvo_no_diario": old.get("log_salvo_no_diario", False),
+    }
+    return user_data["simulados_progress"][sim_key]
+
+
+def restart_wrong_only(progress: dict) -> int:
+    """Repescagem: apaga só as respostas erradas. Retorna quantas voltam a ficar em aberto."""
+    wrong = [k for k, v in progress.items() if isinstance(v, dict) and v.get("acertou") is False]
+    for k in wrong:
+        del progress[k]
+    progress["em_andamento"] = True
+    progress["modo_repescagem"] = True
+    return len(wrong)
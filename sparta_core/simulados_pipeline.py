@@ -0,0 +1,295 @@
+"""
+Pipeline de importação do banco de questões (pasta 'simulados').
+
+Valida todos os arquivos simulados/*.json contra o esquema esperado, normaliza
+os ids das questões, deduplica enunciados idênticos entre bancos e grava o banco
+indexado (banco_simulados.json) que o app carrega na inicialização.
+
+Uso:
+    python -m sparta_core.simulados_pipeline [--pasta simulados] [--saida banco_simulados.json] [--workers N] [--checar]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+SIMULADOS_DIR = "simulados"
+BANK_FILE = "banco_simulados.json"
+BANK_VERSION = 1
+
+# Pastas com poucos arquivos são lidas em sequência: abrir o pool custa mais que o parse.
+PARALLEL_THRESHOLD = 8
+
+VALID_ANSWERS = {"certo": "Certo", "errado": "Errado", "c": "Certo", "e": "Errado"}
+REQUIRED_FIELDS = ("enunciado", "resposta_correta")
+
+
+def is_simulado_file(filename):
+    """Mesmo filtro usado pelo app: 'simulado*.json', sem diferenciar maiúsculas."""
+    name = filename.lower()
+    return name.startswith("simulado") and name.endswith(".json")
+
+
+def list_simulado_files(pasta):
+    """Lista (em ordem estável) os arquivos de simulado da pasta."""
+    if not os.path.isdir(pasta): return []
+    return sorted(f for f in os.listdir(pasta) if is_simulado_file(f))
+
+
+def source_fingerprint(pasta):
+    """Assinatura barata (nome, mtime, tamanho) dos arquivos de origem."""
+    fingerprint = []
+    for filename in list_simulado_files(pasta):
+        try:
+            st_info = os.stat(os.path.join(pasta, filename))
+        except OSError:
+            continue
+        fingerprint.append((filename, st_info.st_mtime_ns, st_info.st_size))
+    return tuple(fingerprint)
+
+
+def enunciado_hash(texto):
+    """Hash do enunciado normalizado (caixa e espaços) para deduplicação entre bancos."""
+    normalizado = re.sub(r"\s+", " ", str(texto)).strip().casefold()
+    return hashlib.sha1(normalizado.encode("utf-8")).hexdigest()
+
+
+def _issue(nivel, arquivo, mensagem, simulado=None, questao=None):
+    return {"nivel": nivel, "arquivo": arquivo, "simulado": simulado, "questao": questao, "mensagem": mensagem}
+
+
+def validate_simulado(key, sim, arquivo):
+    """
+    Valida e normaliza um simulado.
+    Retorna (simulado_normalizado ou None, lista_de_problemas).
+    """
+    issues = []
+    if not isinstance(sim, dict):
+        issues.append(_issue("erro", arquivo, "Simulado não é um objeto JSON.", key))
+        return None, issues
+
+    questoes = sim.get("questoes")
+    if not isinstance(questoes, list):
+        issues.append(_issue("erro", arquivo, "Campo 'questoes' ausente ou não é uma lista.", key))
+        return None, issues
+
+    normalizadas = []
+    used_ids = set()
+    for pos, q in enumerate(questoes, 1):
+        if not isinstance(q, dict):
+            issues.append(_issue("erro", arquivo, f"Questão na posição {pos} não é um objeto.", key))
+            continue
+
+        missing = [f for f in REQUIRED_FIELDS if not str(q.get(f) or "").strip()]
+        if missing:
+            issues.append(_issue("erro", arquivo, f"Questão na posição {pos} sem {', '.join(missing)}; descartada.", key, q.get("id")))
+            continue
+
+        resposta = VALID_ANSWERS.get(str(q["resposta_correta"]).strip().lower())
+        if not resposta:
+            issues.append(_issue("erro", arquivo, f"Resposta '{q['resposta_correta']}' inválida (use Certo/Errado); questão descartada.", key, q.get("id")))
+            continue
+
+        # Ids existentes são preservados (o progresso dos alunos é salvo por id)
+        q_id = str(q.get("id", "")).strip()
+        if not q_id:
+            q_id = str(pos)
+            issues.append(_issue("aviso", arquivo, f"Questão na posição {pos} sem id; atribuído '{q_id}'.", key, q_id))
+        if q_id in used_ids:
+            novo_id = str(pos) if str(pos) not in used_ids else f"{q_id}-{pos}"
+            issues.append(_issue("aviso", arquivo, f"Id '{q_id}' duplicado; renomeado para '{novo_id}'.", key, novo_id))
+            q_id = novo_id
+        used_ids.add(q_id)
+
+        normalizada = dict(q)
+        normalizada["id"] = q_id
+        normalizada["enunciado"] = str(q["enunciado"]).strip()
+        normalizada["resposta_correta"] = resposta
+        normalizada["justificativa"] = str(q.get("justificativa") or "").strip()
+        normalizadas.append(normalizada)
+
+    if not normalizadas:
+        issues.append(_issue("erro", arquivo, "Nenhuma questão válida; simulado ignorado.", key))
+        return None, issues
+
+    resultado = dict(sim)
+    resultado["titulo"] = str(sim.get("titulo") or key)
+    resultado["materia"] = str(sim.get("materia") or "Geral")
+    resultado["questoes"] = normalizadas
+    return resultado, issues
+
+
+def parse_file(filepath):
+    """
+    Lê e valida um arquivo de simulados (executado nos workers do pool).
+    Retorna (nome_arquivo, {chave: simulado}, problemas).
+    """
+    filename = os.path.basename(filepath)
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        return filename, {}, [_issue("erro", filename, f"Erro de sintaxe (JSON quebrado): {e}")]
+    except (OSError, UnicodeDecodeError) as e:
+        return filename, {}, [_issue("erro", filename, f"Erro ao ler arquivo: {e}")]
+
+    if not isinstance(data, dict):
+        return filename, {}, [_issue("erro", filename, "O arquivo não possui o formato correto de Dicionário.")]
+
+    simulados = {}
+    issues = []
+    for key, sim in data.items():
+        normalizado, sim_issues = validate_simulado(key, sim, filename)
+        issues.extend(sim_issues)
+        if normalizado is not None:
+            simulados[key] = normalizado
+    return filename, simulados, issues
+
+
+def _parse_all(paths, workers):
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(paths) >= PARALLEL_THRESHOLD else 1
+    if workers > 1 and len(paths) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(parse_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+        except (BrokenProcessPool, OSError, NotImplementedError):
+            pass  # Ambiente sem suporte a multiprocessing: cai para leitura sequencial
+    return [parse_file(p) for p in paths]
+
+
+def build_bank(pasta, workers=None):
+    """Processa a pasta inteira e monta o banco indexado (sem gravar)."""
+    files = list_simulado_files(pasta)
+    parsed = _parse_all([os.path.join(pasta, f) for f in files], workers)
+
+    simulados = {}
+    origem = {}
+    problemas = []
+    for filename, sims, issues in parsed:
+        problemas.extend(issues)
+        for key, sim in sims.items():
+            if key in simulados:
+                problemas.append(_issue("aviso", filename, f"Chave de simulado repetida (também em {origem[key]}); prevalece este arquivo.", key))
+            simulados[key] = sim
+            origem[key] = filename
+
+    # Deduplicação de enunciados entre bancos: cada texto é guardado uma única vez
+    # na tabela 'questoes' (chave = hash) e os simulados guardam só referências.
+    questoes = {}
+    ocorrencias = {}
+    materias = {}
+    for key, sim in simulados.items():
+        refs = []
+        for q in sim["questoes"]:
+            h = enunciado_hash(q["enunciado"])
+            ref = {"id": q["id"], "h": h}
+            if h not in questoes:
+                questoes[h] = {k: v for k, v in q.items() if k != "id"}
+            else:
+                dono = ocorrencias[h][0]
+                canonica = questoes[h]
+                if canonica["resposta_correta"] != q["resposta_correta"]:
+                    problemas.append(_issue("erro", origem[key], f"Enunciado repetido de {dono[0]}#{dono[1]} com gabarito divergente.", key, q["id"]))
+                else:
+                    problemas.append(_issue("aviso", origem[key], f"Enunciado repetido de {dono[0]}#{dono[1]}; armazenado uma única vez.", key, q["id"]))
+                # Campos que divergem da primeira ocorrência ficam na própria referência
+                ref.update({k: v for k, v in q.items() if k != "id" and canonica.get(k) != v})
+            ocorrencias.setdefault(h, []).append([key, q["id"]])
+            refs.append(ref)
+        sim["questoes"] = refs
+        materias.setdefault(sim["materia"], []).append(key)
+
+    return {
+        "versao": BANK_VERSION,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "fontes": [list(item) for item in source_fingerprint(pasta)],
+        "simulados": simulados,
+        "questoes": questoes,
+        "indice": {"enunciados": ocorrencias, "materias": materias},
+        "problemas": problemas,
+    }
+
+
+def expand_simulados(bank):
+    """Reconstrói o formato {chave: simulado} usado pela interface a partir do banco indexado."""
+    questoes = bank.get("questoes", {})
+    simulados = {}
+    for key, sim in bank.get("simulados", {}).items():
+        expandido = dict(sim)
+        expandido["questoes"] = [
+            {**questoes.get(ref["h"], {}), **{k: v for k, v in ref.items() if k != "h"}}
+            for ref in sim["questoes"]
+        ]
+        simulados[key] = expandido
+    return simulados
+
+
+def write_bank(bank, saida):
+    """Grava o banco atomicamente."""
+    temp_file = f"{saida}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(bank, f, ensure_ascii=False)
+    os.replace(temp_file, saida)
+
+
+def read_bank(saida):
+    if not os.path.exists(saida): return None
+    try:
+        with open(saida, "r", encoding="utf-8") as f:
+            bank = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return None
+    if not isinstance(bank, dict) or bank.get("versao") != BANK_VERSION: return None
+    return bank
+
+
+def load_bank(pasta, saida, workers=None):
+    """
+    Retorna o banco indexado, reaproveitando o arquivo gerado se as fontes não mudaram.
+    Se alguma fonte mudou (ou o banco não existe), reprocessa e regrava.
+    """
+    bank = read_bank(saida)
+    fingerprint = [list(item) for item in source_fingerprint(pasta)]
+    if bank is not None and bank.get("fontes") == fingerprint:
+        return bank
+
+    bank = build_bank(pasta, workers=workers)
+    try:
+        write_bank(bank, saida)
+    except OSError as e:
+        print(f"[Erro Banco Simulados]: {e}")
+    return bank
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida e indexa os simulados do Mentor SpartaJus.")
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # raiz do app
+    parser.add_argument("--pasta", default=os.path.join(base_dir, SIMULADOS_DIR), help="Pasta com os arquivos simulado*.json")
+    parser.add_argument("--saida", default=os.path.join(base_dir, BANK_FILE), help="Arquivo do banco indexado")
+    parser.add_argument("--workers", type=int, default=None, help="Processos para o parse (padrão: automático)")
+    parser.add_argument("--checar", action="store_true", help="Apenas valida, sem gravar o banco")
+    args = parser.parse_args(argv)
+
+    bank = build_bank(args.pasta, workers=args.workers)
+    erros = [p for p in bank["problemas"] if p["nivel"] == "erro"]
+    for p in bank["problemas"]:
+        local = "/".join(str(x) for x in (p["arquivo"], p["simulado"], p["questao"]) if x)
+        print(f"[{p['nivel'].upper()}] {local}: {p['mensagem']}")
+
+    total_q = sum(len(s["questoes"]) for s in bank["simulados"].values())
+    print(f"{len(bank['simulados'])} simulados, {total_q} questões ({len(bank['questoes'])} enunciados únicos), {len(erros)} erro(s), {len(bank['problemas']) - len(erros)} aviso(s).")
+
+    if not args.checar:
+        write_bank(bank, args.saida)
+        print(f"Banco gravado em {args.saida}")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+Snapshots versionados do banco de usuários, com recuperação por data/hora.
+
+Cada registro do banco (um usuário, ou 'global_alerts') vira um objeto
+endereçado pelo hash do seu conteúdo em snapshots/objetos/. Um snapshot é só
+um manifesto {chave: hash}; usuários que não mudaram apontam para o mesmo
+objeto do snapshot anterior, então cada snapshot grava apenas o que mudou.
+
+Uso:
+    python -m sparta_core.snapshots listar
+    python -m sparta_core.snapshots criar [--motivo texto]
+    python -m sparta_core.snapshots restaurar --ate 2026-10-01T12:00 [--usuario nome]
+    python -m sparta_core.snapshots limpar
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+SNAPSHOT_DIR = "snapshots"
+ID_FORMAT = "%Y%m%dT%H%M%S%f"
+
+# Snapshots automáticos (a cada save) respeitam um intervalo mínimo
+AUTO_INTERVAL = timedelta(minutes=10)
+
+# Retenção: os N mais recentes + o último de cada dia nos últimos D dias
+KEEP_LAST = 20
+KEEP_DAILY_DAYS = 30
+
+
+def snapshot_id_for(when):
+    """Id (ordenável) de um instante; datas sem fuso são tratadas como horário local."""
+    return when.astimezone(timezone.utc).strftime(ID_FORMAT)
+
+
+def record_hash(value):
+    payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.objects_dir = os.path.join(base_dir, "objetos")
+        self.manifests_dir = os.path.join(base_dir, "manifestos")
+        self._lock = threading.Lock()
+
+    # --- Armazenamento ---
+    def _object_path(self, h):
+        return os.path.join(self.objects_dir, h[:2], f"{h}.json.gz")
+
+    def _write_object(self, h, value):
+        path = self._object_path(h)
+        if os.path.exists(path): return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = f"{path}.tmp"
+        with gzip.open(temp_file, "wt", encoding="utf-8") as f:
+            json.dump(value, f, default=str, ensure_ascii=False)
+        os.replace(temp_file, path)
+        return True
+
+    def read_object(self, h):
+        with gzip.open(self._object_path(h), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+
+    def load_manifest(self, snapshot_id):
+        with open(self._manifest_path(snapshot_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def snapshot_ids(self):
+        """Ids em ordem cronológica (o id é o próprio instante do snapshot)."""
+        if not os.path.isdir(self.manifests_dir): return []
+        return sorted(f[:-5] for f in os.listdir(self.manifests_dir) if f.endswith(".json"))
+
+    def list_snapshots(self):
+        result = []
+        for snapshot_id in self.snapshot_ids():
+            try:
+                m = self.load_manifest(snapshot_id)
+            except (OSError, json.JSONDecodeError):
+                continue
+            result.append({"id": snapshot_id, "criado_em": m["criado_em"], "motivo": m.get("motivo", ""), "registros": len(m["registros"]), "novos_objetos": m.get("novos_objetos", 0)})
+        return result
+
+    # --- Criação ---
+    def take(self, db, now, reason="", force=False):
+        """
+        Grava um snapshot de db ('now' deve ter fuso horário). Só objetos novos
+        são escritos; se nada mudou desde o último snapshot nenhum manifesto é
+        criado (retorna None). Sem force, respeita AUTO_INTERVAL.
+        """
+        with self._lock:
+            ids = self.snapshot_ids()
+            last = self.load_manifest(ids[-1]) if ids else None
+            if not force and last and now - datetime.fromisoformat(last["criado_em"]) < AUTO_INTERVAL:
+                return None
+
+            registros = {}
+            novos = 0
+            for key, value in db.items():
+                h = record_hash(value)
+                registros[key] = h
+                if last and last["registros"].get(key) == h: continue
+                novos += self._write_object(h, value)
+
+            if last and last["registros"] == registros:
+                return None
+
+            snapshot_id = snapshot_id_for(now)
+            os.makedirs(self.manifests_dir, exist_ok=True)
+            temp_file = f"{self._manifest_path(snapshot_id)}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({"criado_em": now.isoformat(), "motivo": reason, "registros": registros, "novos_objetos": novos}, f, ensure_ascii=False)
+            os.replace(temp_file, self._manifest_path(snapshot_id))
+            self._apply_retention_locked(now)
+            return snapshot_id
+
+    # --- Retenção ---
+    def _apply_retention_locked(self, now):
+        ids = self.snapshot_ids()
+        keep = set(ids[-KEEP_LAST:])
+        daily = {}
+        horizon = snapshot_id_for(now - timedelta(days=KEEP_DAILY_DAYS))
+        for snapshot_id in ids:
+            if snapshot_id >= horizon:
+                daily[snapshot_id[:8]] = snapshot_id  # o último de cada dia prevalece
+        keep |= set(daily.values())
+
+        removed = [i for i in ids if i not in keep]
+        if not removed: return 0
+        for snapshot_id in removed:
+            os.remove(self._manifest_path(snapshot_id))
+
+        # Coleta de lixo: objetos que nenhum manifesto restante referencia
+        referenced = set()
+        for snapshot_id in keep:
+            referenced.update(self.load_manifest(snapshot_id)["registros"].values())
+        if not os.path.isdir(self.objects_dir): return len(removed)
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if name.endswith(".json.gz") and name[:-8] not in referenced:
+                    os.remove(os.path.join(prefix_dir, name))
+        return len(removed)
+
+    def apply_retention(self, now):
+        with self._lock:
+            return self._apply_retention_locked(now)
+
+    # --- Recuperação ---
+    def snapshot_at(self, when):
+        """Id do snapshot mais recente criado até 'when' (ou None)."""
+        target = snapshot_id_for(when)
+        candidates = [i for i in self.snapshot_ids() if i <= target]
+        return candidates[-1] if candidates else None
+
+    def restore_db(self, snapshot_id):
+        """Banco completo como estava no snapshot."""
+        manifest = self.load_manifest(snapshot_id)
+        return {key: self.read_object(h) for key, h in manifest["registros"].items()}
+
+    def restore_record(self, snapshot_id, key):
+        """Um único registro como estava no snapshot (None se não existia)."""
+        h = self.load_manifest(snapshot_id)["registros"].get(key)
+        return self.read_object(h) if h else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshots do banco do Mentor SpartaJus.")
+    parser.add_argument("--db", default="sparta_users.json")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar")
+    p_new = sub.add_parser("criar")
+    p_new.add_argument("--motivo", default="manual")
+    p_res = sub.add_parser("restaurar")
+    p_res.add_argument("--ate", required=True, help="Data/hora ISO (sem fuso = horário local)")
+    p_res.add_argument("--usuario", default=None)
+    sub.add_parser("limpar")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    now = datetime.now().astimezone()
+
+    def load_db():
+        if not os.path.exists(args.db): return {}
+        with open(args.db, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_db(db):
+        temp_file = f"{args.db}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(db, f, indent=4, default=str)
+        os.replace(temp_file, args.db)
+
+    if args.comando == "listar":
+        for s in store.list_snapshots():
+            print(f"{s['id']}  {s['criado_em']}  {s['registros']:>5} registros  {s['novos_objetos']:>4} novos  {s['motivo']}")
+        return 0
+    if args.comando == "criar":
+        snapshot_id = store.take(load_db(), now, args.motivo, force=True)
+        print(f"Snapshot criado: {snapshot_id}" if snapshot_id else "Nada mudou desde o último snapshot.")
+        return 0
+    if args.comando == "limpar":
+        print(f"{store.apply_retention(now)} snapshot(s) removido(s).")
+        return 0
+
+    when = datetime.fromisoformat(args.ate)
+    snapshot_id = store.snapshot_at(when)
+    if not snapshot_id:
+        print("Nenhum snapshot até essa data.")
+        return 1
+    db = load_db()
+    store.take(db, now, "antes de restaurar", force=True)
+    if args.usuario:
+        record = store.restore_record(snapshot_id, args.usuario)
+        if record is None:
+            print(f"{args.usuario} não existia no snapshot {snapshot_id}.")
+            return 1
+        db[args.usuario] = record
+    else:
+        db = store.restore_db(snapshot_id)
+    save_db(db)
+    print(f"Restaurado a partir do snapshot {snapshot_id}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
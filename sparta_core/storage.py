@@ -0,0 +1,410 @@
+"""
+Persistência do banco de usuários: arquivo JSON local + Google Sheets.
+
+Cada usuário é uma linha da planilha (coluna A: nome, coluna B: registro em
+JSON, coluna C: versão = hash do JSON). O módulo não depende do Streamlit: quem
+cria o gerenciador decide de onde vêm as credenciais (gspread_client_factory) e
+como mostrar erros.
+
+O sync de partida (start_sync_down) roda numa thread: lê só as colunas A e C
+(o manifesto), compara com as versões do JSON local e baixa apenas as linhas
+que mudaram. Cada linha que sobe ou desce tem a versão anotada em
+<banco>.sync.json, para saber se o local tem alterações ainda não enviadas.
+Enquanto o sync de partida não termina, fetch_user traz um usuário sob demanda.
+Falhas em threads de fundo só vão para o log (print); error_reporter é chamado
+apenas por save().
+
+O que não é linha de usuário (avisos, objetos do arquivo frio) fica em abas
+próprias da mesma planilha, por SheetTab.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from . import instrumentation
+from .dates import get_now_br
+
+# Tenta importar bibliotecas do Google Sheets.
+try:
+    import gspread
+    from google.oauth2.service_account import Credentials
+    SHEETS_AVAILABLE = True
+except ImportError:
+    SHEETS_AVAILABLE = False
+
+SHEETS_SCOPE = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+VERSION_LENGTH = 16
+# Intervalos por chamada batch_get ao baixar as linhas alteradas
+MAX_RANGES = 200
+# Quanto save() espera o sync de partida; depois disso grava só o local e sobe quando ele terminar
+SAVE_SYNC_WAIT = 5.0
+
+# Sync de partida por arquivo local: uma thread por processo, mesmo que o gerenciador seja recriado a cada rerun
+_startup_syncs = {}
+_deferred_syncs = {}   # sync_up adiado por save() enquanto o de partida não termina
+_startup_lock = threading.Lock()
+# Gravações no arquivo local (save e mesclas do sync) não se intercalam
+_file_lock = threading.RLock()
+
+
+def record_version(json_str):
+    """Versão de uma linha: hash curto do JSON gravado na coluna B."""
+    return hashlib.sha256(json_str.encode("utf-8")).hexdigest()[:VERSION_LENGTH]
+
+
+def local_version(value):
+    return record_version(json.dumps(value, default=str))
+
+
+def _row_ranges(rows):
+    """Linhas (a partir de 1) em intervalos contíguos 'A3:B7' para batch_get."""
+    ranges, start = [], None
+    for i, r in enumerate(rows):
+        if start is None: start = r
+        if i + 1 == len(rows) or rows[i + 1] != r + 1:
+            ranges.append(f"A{start}:B{r}")
+            start = None
+    return ranges
+
+
+def gspread_client_factory(get_service_account):
+    """client_factory que autentica com a conta de serviço de get_service_account() (None = offline)."""
+    def factory():
+        if not SHEETS_AVAILABLE: return None
+        info = get_service_account()
+        if not info: return None
+        creds = Credentials.from_service_account_info(info, scopes=SHEETS_SCOPE)
+        return gspread.authorize(creds)
+    return factory
+
+
+class SpartaDataManager:
+    """
+    Banco de usuários: JSON local (fonte da verdade no processo) espelhado numa
+    planilha. client_factory() devolve um cliente compatível com gspread, ou
+    None para trabalhar offline; error_reporter recebe falhas de gravação local.
+    """
+
+    def __init__(self, db_file, sheet_name, snapshot_store=None, client_factory=None, error_reporter=print):
+        self.db_file = db_file
+        self.sheet_name = sheet_name
+        self.snapshot_store = snapshot_store
+        self.client_factory = client_factory
+        self.error_reporter = error_reporter
+        self.synced_file = f"{db_file}.sync.json"   # {chave: versão} que a planilha tem, pelo último sync daqui
+        self._client = None
+        self.last_sync = None   # {'linhas', 'baixadas', 'enviadas'} do último sync_down
+    
+    @instrumentation.timed("sheets.connect")
+    def _connect_sheets(self):
+        """Cliente do Sheets, criado na primeira chamada e reaproveitado (None offline não fica guardado)."""
+        if not self.client_factory: return None
+        if self._client is not None: return self._client
+        try:
+            self._client = self.client_factory()
+            return self._client
+        except Exception as e:
+            print(f"[Erro Conexão Sheets]: {e}")
+            return None
+
+    @instrumentation.timed("sheets.sync_down")
+    def sync_down(self):
+        """
+        Reconcilia o JSON local com o Sheets linha a linha, pelas versões:
+        - só na planilha: baixa;
+        - local sem alterações desde o último sync e planilha mudou: baixa;
+        - local alterado e não sincronizado (sync que falhou): mantém o local e sobe;
+        - sem registro de sync (planilha antiga, sem coluna C): mantém o local, como antes.
+        Nada é apagado do local. Linha local gravada durante o download fica com a versão local.
+        """
+        client = self._connect_sheets()
+        if not client: return False
+        try:
+            sheet = client.open(self.sheet_name).sheet1
+            keys, versions = sheet.col_values(1), sheet.col_values(3)
+            local = self.load()
+            synced = self._synced()
+            before = {k: local_version(v) for k, v in local.items()}
+            fetch, pending, clean = [], [], {}
+            for row, key in enumerate(keys, 1):
+                if not key: continue
+                remote = versions[row - 1] if row <= len(versions) else ""
+                current = before.get(key)
+                if current is None: fetch.append(row)
+                elif current == remote: clean[key] = remote
+                elif key not in synced: continue
+                elif synced[key] != current: pending.append((row, key))
+                elif remote: fetch.append(row)
+            ranges = _row_ranges(fetch)
+            pulled = {}
+            for i in range(0, len(ranges), MAX_RANGES):
+                for block in sheet.batch_get(ranges[i:i + MAX_RANGES]):
+                    for row in block:
+                        if len(row) >= 2:
+                            try: pulled[row[0]] = json.loads(row[1])
+                            except json.JSONDecodeError: continue
+            applied = self._merge_local(pulled, before)
+            pushed = {}
+            for row, key in pending:
+                json_str = json.dumps(local[key], default=str)
+                sheet.update(f"B{row}", [[json_str, record_version(json_str)]])
+                pushed[key] = record_version(json_str)
+            self._mark_synced({**clean, **applied, **pushed})
+            self.last_sync = {"linhas": len(keys), "baixadas": len(applied), "enviadas": len(pushed)}
+            return True
+        except Exception as e:
+            print(f"[Erro Sync Down]: {e}")
+            return False
+
+    def _merge_local(self, pulled, expected):
+        """Aplica linhas baixadas onde o local ainda está na versão 'expected' (ausente = None); retorna {chave: versão} aplicadas."""
+        if not pulled: return {}
+        applied = {}
+        with _file_lock:
+            db = self.load()
+            for key, value in pulled.items():
+                current = local_version(db[key]) if key in db else None
+                if current == expected.get(key):
+                    db[key] = value
+                    applied[key] = local_version(value)
+            if applied: self._write_local(db)
+        return applied
+
+    # --- versões que a planilha tem de cada linha, segundo o último sync deste disco ---
+    def _synced(self):
+        try:
+            with open(self.synced_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _mark_synced(self, versions, replace=False):
+        if not versions and not replace: return
+        try:
+            with _file_lock:
+                current = {} if replace else self._synced()
+                current.update(versions)
+                temp_file = f"{self.synced_file}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(current, f)
+                os.replace(temp_file, self.synced_file)
+        except OSError as e:
+            print(f"[Erro Versões Sync]: {e}")
+
+    def _write_local(self, db_data):
+        # Escrita atômica para evitar corrupção
+        temp_file = f"{self.db_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(db_data, f, indent=4, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.db_file)
+
+    def start_sync_down(self):
+        """Dispara o sync de partida em segundo plano (uma vez por processo e arquivo local)."""
+        with _startup_lock:
+            if self.db_file in _startup_syncs: return
+            if not self.client_factory:
+                _startup_syncs[self.db_file] = None
+                return
+            thread = threading.Thread(target=self.sync_down, name=f"sync_down:{self.db_file}", daemon=True)
+            _startup_syncs[self.db_file] = thread
+        thread.start()
+
+    def sync_pending(self):
+        """True enquanto o sync de partida deste arquivo local ainda está rodando."""
+        thread = _startup_syncs.get(self.db_file)
+        return thread is not None and thread.is_alive()
+
+    def wait_sync(self, timeout=None):
+        thread = _startup_syncs.get(self.db_file)
+        if thread is not None and thread is not threading.current_thread(): thread.join(timeout)
+        return not self.sync_pending()
+
+    def _defer_sync_up(self):
+        """Sobe o banco local inteiro quando o sync de partida terminar (uma thread por arquivo local)."""
+        def run():
+            self.wait_sync()
+            self.sync_up(self.load())
+        with _startup_lock:
+            pending = _deferred_syncs.get(self.db_file)
+            if pending is not None and pending.is_alive(): return   # ela lê o arquivo local ao rodar: já leva este save
+            thread = _deferred_syncs[self.db_file] = threading.Thread(target=run, name=f"sync_up:{self.db_file}", daemon=True)
+        thread.start()
+
+    @instrumentation.timed("sheets.fetch_user")
+    def fetch_user(self, username):
+        """Busca a linha de um usuário ausente no local (login antes do sync terminar) e a mescla; None se não existe."""
+        client = self._connect_sheets()
+        if not client or not username: return None
+        try:
+            sheet = client.open(self.sheet_name).sheet1
+            cell = sheet.find(username, in_column=1)
+            if not cell: return None
+            block = sheet.batch_get([f"B{cell.row}"])[0]
+            if not block or not block[0]: return None
+            record = json.loads(block[0][0])
+            self._mark_synced(self._merge_local({username: record}, {}))
+            return self.load().get(username)
+        except Exception as e:
+            print(f"[Erro Fetch User]: {e}")
+            return None
+
+    @instrumentation.timed("sheets.sync_up")
+    def sync_up(self, db_data):
+        """Sobe dados locais para o Sheets."""
+        client = self._connect_sheets()
+        if not client: return False
+        try:
+            sheet = client.open(self.sheet_name).sheet1
+            rows_to_update = []
+            for key, value in db_data.items():
+                json_str = json.dumps(value, default=str)
+                rows_to_update.append([key, json_str, record_version(json_str)])
+            sheet.clear()
+            sheet.update('A1', rows_to_update)
+            self._mark_synced({row[0]: row[2] for row in rows_to_update}, replace=True)
+            return True
+        except Exception as e:
+            print(f"[Erro Sync Up]: {e}")
+            return False
+
+    @instrumentation.timed("sheets.sync_user")
+    def sync_user(self, username, record):
+        """Atualiza (ou acrescenta) só a linha de um usuário no Sheets."""
+        client = self._connect_sheets()
+        if not client: return False
+        try:
+            sheet = client.open(self.sheet_name).sheet1
+            json_str = json.dumps(record, default=str)
+            cell = sheet.find(username, in_column=1)
+            if cell:
+                sheet.update(f"B{cell.row}", [[json_str, record_version(json_str)]])
+            else:
+                sheet.append_row([username, json_str, record_version(json_str)])
+            self._mark_synced({username: record_version(json_str)})
+            return True
+        except Exception as e:
+            print(f"[Erro Sync User]: {e}")
+            return False
+
+    @instrumentation.timed("db.load")
+    def load(self):
+        """Carrega DB local com tratamento de erro."""
+        if not os.path.exists(self.db_file): return {}
+        try:
+            with open(self.db_file, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+                if not content: return {} 
+                return json.loads(content)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    @instrumentation.timed("db.save")
+    def save(self, db_data, sync=True):
+        """Salva DB localmente e tenta sync."""
+        try:
+            with _file_lock: self._write_local(db_data)
+        except Exception as e:
+            self.error_reporter(f"Erro crítico salvamento local: {e}")
+            return
+        
+        # Snapshot automático (limitado por intervalo; grava só usuários alterados)
+        if self.snapshot_store:
+            try: self.snapshot_store.take(db_data, get_now_br(), "automático")
+            except Exception as e: print(f"[Erro Snapshot]: {e}")
+        
+        if sync:
+            # Sync em background idealmente, mas aqui síncrono para garantir.
+            # Reescrever a planilha antes de o sync de partida terminar apagaria linhas ainda não baixadas;
+            # sync lento ou travado não prende o rerun: o local já está gravado e sobe depois
+            if not self.wait_sync(SAVE_SYNC_WAIT):
+                print(f"[Sync Adiado]: sync de partida ainda rodando após {SAVE_SYNC_WAIT:.0f} s; o banco sobe quando ele terminar")
+                self._defer_sync_up()
+                return
+            try: self.sync_up(db_data)
+            except: pass
+
+    @instrumentation.timed("db.save_user")
+    def save_user(self, username, record, sync=True):
+        """Grava um único usuário: mescla no arquivo local e sobe só a linha dele."""
+        with _file_lock:
+            db = self.load()
+            db[username] = record
+            self.save(db, sync=False)
+        if sync:
+            try: self.sync_user(username, record)
+            except: pass
+
+    def snapshot_now(self, reason):
+        """Snapshot imediato do estado gravado, antes de operações destrutivas."""
+        if not self.snapshot_store: return None
+        try: return self.snapshot_store.take(self.load(), get_now_br(), reason, force=True)
+        except Exception as e:
+            print(f"[Erro Snapshot]: {e}")
+            return None
+
+
+class SheetTab:
+    """
+    Aba auxiliar na mesma planilha do banco (avisos, arquivo frio), criada na
+    primeira vez que é usada. Offline os métodos devolvem None/False; falhas
+    da API sobem para quem chamou, que decide se tenta de novo.
+    """
+
+    def __init__(self, manager, title, cols=3):
+        self.manager = manager
+        self.title = title
+        self.cols = cols
+        self._sheet = None
+
+    def _worksheet(self):
+        client = self.manager._connect_sheets()
+        if not client: return None
+        if self._sheet is None:
+            spreadsheet = client.open(self.manager.sheet_name)
+            try:
+                self._sheet = spreadsheet.worksheet(self.title)
+            except Exception as e:
+                # gspread.WorksheetNotFound (ou o equivalente de um cliente compatível)
+                if type(e).__name__ != "WorksheetNotFound": raise
+                self._sheet = spreadsheet.add_worksheet(title=self.title, rows=1, cols=self.cols)
+        return self._sheet
+
+    def rows(self):
+        """Todas as linhas da aba; None offline."""
+        sheet = self._worksheet()
+        return None if sheet is None else sheet.get_all_values()
+
+    def append(self, rows):
+        """Acrescenta as linhas ao fim da aba numa chamada; False offline."""
+        sheet = self._worksheet()
+        if sheet is None: return False
+        sheet.append_rows(rows, value_input_option="RAW")
+        return True
+
+    def keys(self):
+        """Coluna A inteira; None offline."""
+        sheet = self._worksheet()
+        return None if sheet is None else sheet.col_values(1)
+
+    def key_rows(self, key):
+        """Linhas cuja coluna A é a chave (append_rows as grava juntas); None offline."""
+        sheet = self._worksheet()
+        if sheet is None: return None
+        found = [row for row, k in enumerate(sheet.col_values(1), 1) if k == key]
+        if not found: return []
+        block = sheet.batch_get([f"A{found[0]}:{chr(64 + self.cols)}{found[-1]}"])[0]
+        return [row for row in block if row and row[0] == key]
+
+    def put(self, key, values):
+        """Grava a linha da chave (coluna A), acrescentando se ainda não existe; False offline."""
+        sheet = self._worksheet()
+        if sheet is None: return False
+        cell = sheet.find(key, in_column=1)
+        if cell:
+            sheet.update(range_name=f"B{cell.row}", values=[list(values)], value_input_option="RAW")
+        else:
+            sheet.append_rows([[key, *values]], value_input_option="RAW")
+        return True
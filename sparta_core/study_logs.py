@@ -0,0 +1,120 @@
+"""Regras do Diário: gravação de dias, filtros do Dashboard e reescrita do histórico."""
+from datetime import date
+
+from .dates import format_date, parse_log_date
+from .models import LogEntry
+from .progression import record_progress, user_progress
+
+# Árvore: +1 ramo por dia novo de estudo, -2 por dia novo sem estudo
+BRANCH_GAIN = 1
+BRANCH_LOSS = 2
+
+
+def upsert_log(user_data: dict, entry: LogEntry, series=None) -> bool:
+    """
+    Grava o dia no Diário do usuário (substitui se a data já existe).
+    Só um dia novo mexe na árvore. Retorna True se o dia foi criado.
+    'series' (DailySeries do usuário), se passada, é atualizada junto.
+    Os totais correntes acompanham a diferença, e patentes/estrelas cruzadas
+    viram marcos com a data do dia (progression.record_progress).
+    """
+    user_progress(user_data)  # totais de antes da mudança (montados do histórico se faltarem)
+    new_log = entry.to_dict()
+    logs = user_data.setdefault("logs", [])
+    for idx, l in enumerate(logs):
+        if l.get("data") == new_log["data"]:
+            logs[idx] = new_log
+            if series is not None: series.replace(l, new_log)
+            record_progress(user_data, new_log["questoes"] - l.get("questoes", 0),
+                            new_log["paginas"] - l.get("paginas", 0), new_log["data"])
+            return False
+    logs.append(new_log)
+    if series is not None: series.add(new_log)
+    record_progress(user_data, new_log["questoes"], new_log["paginas"], new_log["data"])
+    branches = user_data.get("tree_branches", 1)
+    user_data["tree_branches"] = branches + BRANCH_GAIN if entry.estudou else max(0, branches - BRANCH_LOSS)
+    return True
+
+
+def add_questions_to_day(user_data: dict, day, materia: str, total: int, series=None) -> bool:
+    """Soma questões de uma matéria ao dia (cria o dia se preciso). Retorna True se o dia foi criado."""
+    d_str = format_date(day)
+    user_progress(user_data)
+    for l in user_data.setdefault("logs", []):
+        if l.get("data") == d_str:
+            if series is not None: series.remove(l)
+            l["questoes"] = l.get("questoes", 0) + total
+            l["estudou"] = True
+            dets = l.setdefault("questoes_detalhadas", {})
+            dets[materia] = dets.get(materia, 0) + total
+            if series is not None: series.add(l)
+            record_progress(user_data, total, 0, d_str)
+            return False
+    return upsert_log(user_data, LogEntry.create(d_str, "06:00", "22:00", 0, 0, {materia: total}), series)
+
+
+def date_bounds(logs: list[dict]) -> tuple[date, date] | None:
+    """Primeira e última data dos logs (None se nenhuma data é válida)."""
+    dates = [d for d in (parse_log_date(l.get("data")) for l in logs) if d]
+    if not dates: return None
+    return min(dates), max(dates)
+
+
+def questions_by_subject(logs: list[dict], start: date, end: date, subjects) -> tuple[dict[str, int], int]:
+    """Questões por matéria no período [start, end], só das matérias pedidas; retorna (detalhes, total)."""
+    subjects = set(subjects)
+    details = {}
+    total = 0
+    for l in logs:
+        log_date = parse_log_date(l.get("data"))
+        if not log_date or not (start <= log_date <= end): continue
+        for m, q in (l.get("questoes_detalhadas") or {}).items():
+            if m in subjects:
+                details[m] = details.get(m, 0) + q
+                total += q
+    return details, total
+
+
+def format_details(details) -> str:
+    """{'Penal': 5, 'Civil': 3} -> 'Penal: 5, Civil: 3' (coluna editável do histórico)."""
+    if isinstance(details, dict): return ", ".join(f"{k}: {v}" for k, v in details.items())
+    return ""
+
+
+def parse_details(text) -> dict[str, int]:
+    """Inverso de format_details; trechos mal formados são ignorados."""
+    details = {}
+    if not text: return details
+    for part in str(text).split(","):
+        if ":" not in part: continue
+        try:
+            m, q = part.split(":")
+            details[m.strip()] = int(q.strip())
+        except ValueError:
+            continue
+    return details
+
+
+def _int(value) -> int:
+    try: return int(value)
+    except (TypeError, ValueError): return 0
+
+
+def log_from_history_row(row: dict) -> LogEntry:
+    """
+    Uma linha do histórico editado volta a ser um log. Se a soma dos detalhes
+    for maior que 0 ela prevalece (consistência); senão vale o total digitado.
+    """
+    details = parse_details(row.get("detalhes_str"))
+    total = sum(details.values()) or _int(row.get("questoes", 0))
+    paginas = _int(row.get("paginas", 0))
+    return LogEntry(
+        data=format_date(row.get("data")),
+        acordou=str(row.get("acordou", "06:00")),
+        dormiu=str(row.get("dormiu", "22:00")),
+        paginas=paginas,
+        series=_int(row.get("series", 0)),
+        questoes=total,
+        questoes_detalhadas=details,
+        estudou=paginas > 0 or total > 0,
+    )
@@ -0,0 +1,62 @@
+"""
+Base para tabelas pré-calculadas persistidas em JSON (estatísticas, análises).
+
+A tabela fica em memória e só é relida do disco quando o arquivo muda
+(outro processo gravou); as gravações são atômicas e serializadas por lock.
+"""
+import json
+import os
+import threading
+
+
+class JsonTableStore:
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._table = None
+        self._mtime = None
+
+    def empty_table(self):
+        return {"versao": self.version}
+
+    def _file_mtime(self):
+        try: return os.stat(self.path).st_mtime_ns
+        except OSError: return None
+
+    def _load_locked(self):
+        mtime = self._file_mtime()
+        if self._table is not None and mtime == self._mtime:
+            return self._table
+        table = None
+        if mtime is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    table = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                table = None
+        if not isinstance(table, dict) or table.get("versao") != self.version:
+            table = self.empty_table()
+        self._table, self._mtime = table, mtime
+        return table
+
+    def _save_locked(self):
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(self._table, f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+        self._mtime = self._file_mtime()
+
+    def table(self):
+        with self._lock:
+            return self._load_locked()
+
+    def mutate(self, fn, *args):
+        """Aplica fn(tabela, *args) sob o lock e grava se fn retornar verdadeiro."""
+        with self._lock:
+            table = self._load_locked()
+            changed = fn(table, *args)
+            if changed:
+                self._save_locked()
+            return changed
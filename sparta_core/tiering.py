@@ -0,0 +1,352 @@
+"""
+Arquivamento em camadas: usuários inativos e logs antigos saem do banco quente.
+
+O arquivo frio (arquivo_frio/) guarda objetos JSON compactados com gzip e
+endereçados pelo hash do conteúdo, como os objetos de snapshots. Com um
+espelho (storage.SheetTab) cada objeto também sobe para a aba 'arquivo_frio'
+da planilha, em pedaços de texto base64, e volta de lá quando falta no disco
+(deploy novo). No banco quente fica só o resumo:
+- usuário sem atividade há inactive_days (ou arquivado pelo moderador): um
+  esboço com senha, datas e progresso (ranking e marcos seguem funcionando)
+  mais 'frio' = {"objeto": hash, "desde", "ultima_atividade", "logs"};
+- usuário ativo com logs além do horizonte: os logs recentes mais
+  'logs_frios' = {"objeto", "dias", "de", "ate", "questoes", "paginas"}.
+
+A volta é transparente: o login reidrata o usuário (rehydrate_user) e o
+Dashboard reidrata os logs quando o período pedido começa antes dos logs
+quentes (rehydrate_logs). Objeto que não está no disco nem na planilha levanta
+ColdObjectMissing e o esboço fica como está. Objetos nunca são apagados aqui,
+então snapshots antigos que apontam para um esboço continuam restauráveis.
+
+Uso:
+    python -m sparta_core.tiering aplicar [--db sparta_users.json] [--inativo-dias 365] [--horizonte-dias 730]
+    python -m sparta_core.tiering reidratar --usuario nome [--db sparta_users.json]
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from datetime import date, timedelta
+
+from .dates import get_today_br, parse_log_date
+from .db_keys import ARCHIVED_KEY, RESERVED_KEYS
+from .progression import COLD_LOGS_KEY, PROGRESS_KEY, totals, user_progress
+from .storage import SpartaDataManager
+from .users import is_archived
+
+COLD_DIR = "arquivo_frio"
+COLD_SHEET = "arquivo_frio"
+# Texto base64 por célula (o Sheets aceita até 50 mil caracteres)
+CHUNK_CHARS = 45_000
+INACTIVE_DAYS = 365
+LOG_HORIZON_DAYS = 730
+COMPRESS_LEVEL = 6
+
+COLD_KEY = "frio"
+# Campos que ficam no esboço do usuário frio; na reidratação valem os do esboço
+STUB_KEYS = ("password", "created_at", PROGRESS_KEY, ARCHIVED_KEY)
+
+
+class ColdObjectMissing(LookupError):
+    """Objeto do arquivo frio que não está no disco nem na planilha (ou a planilha não respondeu)."""
+
+
+class ColdStore:
+    """
+    Objetos imutáveis em gzip, um arquivo por hash (o mesmo de snapshots.record_hash;
+    gravar o mesmo conteúdo de novo não faz nada). remote: aba com as linhas
+    [hash, 'parte/total', base64]; put só retorna depois de o objeto estar nela.
+    """
+
+    def __init__(self, base_dir=COLD_DIR, remote=None):
+        self.base_dir = base_dir
+        self.remote = remote
+        self._lock = threading.Lock()
+        self._remote_keys = None   # hashes que a aba já tem, lidos uma vez
+
+    def _path(self, h):
+        return os.path.join(self.base_dir, h[:2], f"{h}.json.gz")
+
+    def _write_file(self, path, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = f"{path}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(data)
+        os.replace(temp_file, path)
+
+    # --- espelho na planilha ---
+    def _uploaded(self) -> set | None:
+        with self._lock:
+            if self._remote_keys is None:
+                keys = self.remote.keys()
+                if keys is None: return None   # offline: só o disco, como o banco
+                self._remote_keys = set(keys)
+            return self._remote_keys
+
+    def _upload(self, h):
+        """Sobe o objeto se a aba ainda não o tem; falhas da planilha sobem para quem chamou."""
+        uploaded = self._uploaded() if self.remote is not None else None
+        if uploaded is None or h in uploaded: return
+        with open(self._path(h), "rb") as f:
+            text = base64.b64encode(f.read()).decode("ascii")
+        chunks = [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)] or [""]
+        self.remote.append([[h, f"{i + 1}/{len(chunks)}", chunk] for i, chunk in enumerate(chunks)])
+        with self._lock:
+            uploaded.add(h)
+
+    def _download(self, h) -> bool:
+        rows = self.remote.key_rows(h)
+        if not rows: return False
+        parts = {}
+        for row in rows:
+            part, _, total = (row[1] if len(row) > 1 else "").partition("/")
+            if part.isdigit() and total.isdigit():
+                parts[int(part)] = (int(total), row[2] if len(row) > 2 else "")
+        total = next(iter(parts.values()))[0] if parts else 0
+        if not total or set(parts) != set(range(1, total + 1)): return False
+        data = base64.b64decode("".join(parts[i][1] for i in range(1, total + 1)))
+        if hashlib.sha256(gzip.decompress(data)).hexdigest() != h: return False
+        self._write_file(self._path(h), data)
+        return True
+
+    def upload_missing(self, hashes) -> int:
+        """Sobe os objetos do disco que a aba não tem (gravados offline ou antes do espelho); retorna quantos subiram."""
+        if self.remote is None: return 0
+        uploaded = self._uploaded()
+        if uploaded is None: return 0
+        missing = [h for h in dict.fromkeys(hashes) if h not in uploaded and os.path.exists(self._path(h))]
+        for h in missing:
+            self._upload(h)
+        return len(missing)
+
+    def put(self, value) -> str:
+        # Serializa uma vez só (encoder em C): o mesmo texto dá o hash e vai para o arquivo
+        payload = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+        h = hashlib.sha256(payload).hexdigest()
+        path = self._path(h)
+        if not os.path.exists(path):
+            self._write_file(path, gzip.compress(payload, compresslevel=COMPRESS_LEVEL))
+        self._upload(h)
+        return h
+
+    def get(self, h):
+        path = self._path(h)
+        try:
+            if not os.path.exists(path) and self.remote is not None:
+                self._download(h)
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            raise ColdObjectMissing(f"objeto {h[:12]} do arquivo frio indisponível ({e})") from e
+
+
+def is_cold(user_data: dict) -> bool:
+    return isinstance(user_data, dict) and COLD_KEY in user_data
+
+
+def cold_logs(user_data: dict) -> dict | None:
+    """Resumo dos logs que estão no arquivo frio (None se não há)."""
+    summary = user_data.get(COLD_LOGS_KEY)
+    return summary if isinstance(summary, dict) else None
+
+
+def cold_objects(db: dict) -> set[str]:
+    """Hashes dos objetos a que o banco aponta (usuários frios e logs frios)."""
+    hashes = set()
+    for username, record in db.items():
+        if username in RESERVED_KEYS or not isinstance(record, dict): continue
+        if is_cold(record): hashes.add(record[COLD_KEY]["objeto"])
+        if cold_logs(record): hashes.add(record[COLD_LOGS_KEY]["objeto"])
+    return hashes
+
+
+def last_activity(user_data: dict) -> date | None:
+    """Último dia com log (quente ou frio); sem logs, a data de criação da conta."""
+    if is_cold(user_data): return parse_log_date(user_data[COLD_KEY].get("ultima_atividade"))
+    days = [d for d in (parse_log_date(l.get("data")) for l in user_data.get("logs", [])) if d]
+    if days: return max(days)
+    summary = cold_logs(user_data)
+    if summary: return parse_log_date(summary.get("ate"))
+    return parse_log_date(user_data.get("created_at"))
+
+
+# --- usuário inteiro ---
+def freeze_user(db: dict, username: str, store: ColdStore, today: date) -> bool:
+    """Troca o registro por um esboço; o registro completo vai para o arquivo frio."""
+    record = db.get(username)
+    if not isinstance(record, dict) or is_cold(record): return False
+    user_progress(record)   # o esboço leva totais e marcos prontos
+    activity = last_activity(record)
+    stub = {k: record[k] for k in STUB_KEYS if k in record}
+    stub[COLD_KEY] = {
+        "objeto": store.put(record), "desde": today.isoformat(),
+        "ultima_atividade": activity.isoformat() if activity else None, "logs": len(record.get("logs", [])),
+    }
+    db[username] = stub
+    return True
+
+
+def rehydrate_user(db: dict, username: str, store: ColdStore) -> bool:
+    """
+    Devolve o registro completo ao banco quente. Campos do esboço prevalecem:
+    senha trocada, reativação ou matérias atribuídas enquanto estava frio.
+    """
+    stub = db.get(username)
+    if not is_cold(stub): return False
+    record = {k: v for k, v in store.get(stub[COLD_KEY]["objeto"]).items() if k not in STUB_KEYS}
+    record.update({k: v for k, v in stub.items() if k != COLD_KEY})
+    db[username] = record
+    return True
+
+
+# --- logs antigos ---
+def freeze_logs(user_data: dict, store: ColdStore, cutoff: date) -> int:
+    """
+    Move os logs anteriores a cutoff para o arquivo frio (somando aos que já
+    estavam lá). Sempre sobra ao menos um log quente. Retorna quantos foram movidos.
+    """
+    logs = user_data.get("logs", [])
+    old = [l for l in logs if (d := parse_log_date(l.get("data"))) and d < cutoff]
+    if not old or len(old) == len(logs): return 0
+    user_progress(user_data)   # totais calculados antes de os logs saírem
+    summary = cold_logs(user_data)
+    archived = (store.get(summary["objeto"]) if summary else []) + old
+    archived.sort(key=lambda l: parse_log_date(l.get("data")))
+    q, p = totals(archived)
+    user_data[COLD_LOGS_KEY] = {
+        "objeto": store.put(archived), "dias": len(archived),
+        "de": parse_log_date(archived[0].get("data")).isoformat(),
+        "ate": parse_log_date(archived[-1].get("data")).isoformat(),
+        "questoes": q, "paginas": p,
+    }
+    old_ids = {id(l) for l in old}
+    user_data["logs"] = [l for l in logs if id(l) not in old_ids]
+    return len(old)
+
+
+def covers(user_data: dict, day) -> bool:
+    """True se o dia cai no período que está no arquivo frio."""
+    summary = cold_logs(user_data)
+    day = parse_log_date(day)
+    return bool(summary and day and day <= date.fromisoformat(summary["ate"]))
+
+
+def rehydrate_logs(user_data: dict, store: ColdStore) -> int:
+    """
+    Traz os logs frios de volta (um dia que também esteja quente fica com a
+    versão quente) e refaz os totais com o histórico completo. Retorna quantos voltaram.
+    """
+    summary = cold_logs(user_data)
+    if not summary: return 0
+    hot = user_data.get("logs", [])
+    hot_days = {parse_log_date(l.get("data")) for l in hot}
+    restored = [l for l in store.get(summary["objeto"]) if parse_log_date(l.get("data")) not in hot_days]
+    user_data["logs"] = restored + hot
+    del user_data[COLD_LOGS_KEY]
+    progress = user_data[PROGRESS_KEY] = dict(user_progress(user_data))
+    progress["questoes"], progress["paginas"] = totals(user_data["logs"])
+    return len(restored)
+
+
+# --- política ---
+def apply_policy(db: dict, store: ColdStore, today: date, inactive_days: int = INACTIVE_DAYS,
+                 horizon_days: int = LOG_HORIZON_DAYS, protected=()) -> dict:
+    """
+    Congela usuários inativos (ou arquivados) e, dos ativos, os logs além do
+    horizonte. 'protected' (ex.: o moderador) nunca é congelado. Retorna um relatório;
+    usuário cujo objeto não pôde ser gravado (ou lido) fica como estava e vai para 'erros'.
+    """
+    report = {"usuarios": [], "logs": 0, "erros": [], "bytes_antes": len(json.dumps(db, default=str)), "bytes_depois": 0}
+    inactive_since = today - timedelta(days=inactive_days)
+    cutoff = today - timedelta(days=horizon_days)
+    for username in list(db):
+        record = db[username]
+        if username in RESERVED_KEYS or username in protected or not isinstance(record, dict) or is_cold(record): continue
+        activity = last_activity(record)
+        try:
+            if is_archived(record) or (activity and activity < inactive_since):
+                if freeze_user(db, username, store, today): report["usuarios"].append(username)
+            else:
+                report["logs"] += freeze_logs(record, store, cutoff)
+        except Exception as e:
+            report["erros"].append(f"{username}: {e}")
+    report["bytes_depois"] = len(json.dumps(db, default=str))
+    return report
+
+
+class ExpandedView(Mapping):
+    """
+    O banco visto com cada usuário frio reidratado, sob demanda (backups
+    completos). Objeto indisponível: o registro sai como está (esboço ou logs
+    frios resumidos) e o usuário entra em 'missing'.
+    """
+
+    def __init__(self, db: dict, store: ColdStore):
+        self.db = db
+        self.store = store
+        self.missing: list[str] = []
+
+    def __getitem__(self, key):
+        value = self.db[key]
+        if not isinstance(value, dict) or not (is_cold(value) or cold_logs(value)): return value
+        view = {key: dict(value)}
+        try:
+            rehydrate_user(view, key, self.store)
+            rehydrate_logs(view[key], self.store)
+        except ColdObjectMissing as e:
+            print(f"[Erro Arquivo Frio] {key}: {e}")
+            self.missing.append(key)
+        return view[key]
+
+    def __iter__(self):
+        return iter(self.db)
+
+    def __len__(self):
+        return len(self.db)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arquivamento em camadas do banco do Mentor SpartaJus.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_apl = sub.add_parser("aplicar", help="Congela usuários inativos e logs antigos")
+    p_apl.add_argument("--db", default="sparta_users.json")
+    p_apl.add_argument("--frio", default=COLD_DIR)
+    p_apl.add_argument("--inativo-dias", type=int, default=INACTIVE_DAYS)
+    p_apl.add_argument("--horizonte-dias", type=int, default=LOG_HORIZON_DAYS)
+    p_apl.add_argument("--proteger", nargs="*", default=[], help="Usuários que nunca são congelados")
+    p_rei = sub.add_parser("reidratar", help="Traz um usuário (e seus logs) de volta ao banco quente")
+    p_rei.add_argument("--usuario", required=True)
+    p_rei.add_argument("--db", default="sparta_users.json")
+    p_rei.add_argument("--frio", default=COLD_DIR)
+    args = parser.parse_args(argv)
+
+    manager = SpartaDataManager(args.db, None)
+    db = manager.load()
+    store = ColdStore(args.frio)
+    if args.comando == "aplicar":
+        report = apply_policy(db, store, get_today_br(), args.inativo_dias, args.horizonte_dias, set(args.proteger))
+        print(f"{len(report['usuarios'])} usuário(s) congelado(s), {report['logs']} log(s) antigos movidos; "
+              f"banco quente {report['bytes_antes'] / 1e6:.2f} MB -> {report['bytes_depois'] / 1e6:.2f} MB")
+        for erro in report["erros"]:
+            print(f"Ignorado — {erro}")
+    else:
+        if args.usuario not in db:
+            print(f"{args.usuario} não está no banco.")
+            return 1
+        try:
+            rehydrate_user(db, args.usuario, store)
+            print(f"{args.usuario}: {rehydrate_logs(db[args.usuario], store)} log(s) reidratados.")
+        except ColdObjectMissing as e:
+            print(f"{args.usuario}: {e}")
+            return 1
+    manager.save(db, sync=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+SVG da Árvore da Constância.
+
+As posições das folhas (e dos frutos) são sorteadas uma vez, na importação,
+numa tabela fixa. A folha i nasce quando a árvore chega a i+1 ramos e fica
+sempre no mesmo lugar, então o SVG de N+1 ramos é o de N mais uma folha.
+LEAF_PREFIX[n] guarda as n primeiras folhas já concatenadas. As folhas ficam
+num <g> posicionado no topo do tronco e herdam a cor da estação, então o mesmo
+texto serve para qualquer altura de tronco e estação: montar a árvore é uma
+consulta à tabela mais um f-string.
+"""
+import random
+from datetime import date
+from functools import lru_cache
+
+WITHERED_SVG = """<svg width="300" height="300" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><rect x="40" y="80" width="20" height="20" fill="#5D4037" /><text x="50" y="70" font-size="5" text-anchor="middle" fill="#555">A árvore secou...</text></svg>"""
+MAX_LEAVES = 150
+MAX_FRUITS = 30
+MAX_SPREAD = 45   # a copa não passa das bordas do viewBox
+QUESTIONS_PER_FRUIT = 1000
+
+# Estágios de crescimento: (ramos mínimos, nome, largura do tronco)
+STAGES = (
+    (0, "Broto", 6),
+    (10, "Muda", 8),
+    (30, "Árvore Jovem", 10),
+    (60, "Árvore Adulta", 12),
+    (MAX_LEAVES, "Árvore Anciã", 14),
+)
+
+# Estações do hemisfério sul: (cor das folhas, opacidade, cor das flores ou None)
+SEASONS = {
+    "verao": ("#228B22", 0.8, None),
+    "outono": ("#C8691C", 0.75, None),
+    "inverno": ("#6B8E23", 0.55, None),
+    "primavera": ("#2E8B57", 0.8, "#F4A6C1"),
+}
+SEASON_NAMES = {"verao": "Verão", "outono": "Outono", "inverno": "Inverno", "primavera": "Primavera"}
+
+
+def _leaf_positions():
+    """(cx, cy relativo ao topo do tronco, r) de cada folha, na ordem em que nascem."""
+    # Mesma semente do desenho original, mas não os mesmos sorteios: lá o
+    # espalhamento de todas as folhas dependia do total de ramos (a copa inteira
+    # mudava a cada ramo); aqui cada folha usa o espalhamento do momento em que
+    # nasce e não sai mais do lugar.
+    rng = random.Random(42)
+    positions = []
+    for i in range(MAX_LEAVES):
+        spread = min(int((i + 1) / 2), MAX_SPREAD - 20)
+        positions.append((50 + rng.randint(-20 - spread, 20 + spread), rng.randint(-20 - spread, 10), rng.randint(3, 6)))
+    return positions
+
+
+def _build_tables():
+    positions = _leaf_positions()
+    leaves = [f'<circle cx="{x}" cy="{y}" r="{r}" />' for x, y, r in positions]
+    flowers = [f'<circle cx="{x}" cy="{y - r + 1}" r="1" />' for x, y, r in positions]
+    rng = random.Random(7)
+    fruits = []
+    for i in range(MAX_FRUITS):
+        x, y, _ = positions[rng.randrange(min(MAX_LEAVES, 20 + 4 * i))]  # frutos aparecem dentro da copa
+        fruits.append(f'<circle cx="{x}" cy="{y + 1}" r="1.8" />')
+    return _prefixes(leaves), _prefixes(flowers), _prefixes(fruits)
+
+
+def _prefixes(fragments):
+    """prefix[n] = n primeiros fragmentos juntos; cada um reaproveita o anterior."""
+    out = [""]
+    for frag in fragments:
+        out.append(out[-1] + frag)
+    return tuple(out)
+
+
+LEAF_PREFIX, FLOWER_PREFIX, FRUIT_PREFIX = _build_tables()
+
+
+def season_of(day: date) -> str:
+    """Estação (hemisfério sul) do dia."""
+    return ("verao", "verao", "outono", "outono", "outono", "inverno",
+            "inverno", "inverno", "primavera", "primavera", "primavera", "verao")[day.month - 1]
+
+
+def stage_of(branches: int) -> tuple[str, int]:
+    """(nome do estágio, largura do tronco) para o número de ramos."""
+    name, width = STAGES[0][1], STAGES[0][2]
+    for threshold, n, w in STAGES:
+        if branches >= threshold: name, width = n, w
+    return name, width
+
+
+def fruits_for(total_questions: int) -> int:
+    """Um fruto a cada QUESTIONS_PER_FRUIT questões resolvidas (até MAX_FRUITS)."""
+    return min(max(total_questions, 0) // QUESTIONS_PER_FRUIT, MAX_FRUITS)
+
+
+@lru_cache(maxsize=1024)
+def generate_tree_svg(branches: int, season: str = "verao", fruits: int = 0) -> str:
+    """
+    SVG da árvore montado das tabelas pré-calculadas. As folhas não repetem as
+    posições do gerador antigo (ver _leaf_positions): árvores existentes mudaram
+    de desenho uma vez, e daqui em diante só ganham folhas.
+    """
+    if branches <= 0:
+        return WITHERED_SVG
+    leaf_color, opacity, flower_color = SEASONS.get(season, SEASONS["verao"])
+    trunk_h = min(30 + (branches * 0.5), 60)
+    trunk_y = 100 - trunk_h
+    _, width = stage_of(branches)
+    count = min(branches, MAX_LEAVES)
+    flowers = f'<g fill="{flower_color}">{FLOWER_PREFIX[count // 3]}</g>' if flower_color else ""
+    fruit_svg = f'<g fill="#B22222">{FRUIT_PREFIX[min(fruits, MAX_FRUITS)]}</g>' if fruits > 0 else ""
+    return (f'<svg width="350" height="350" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg">'
+            f'<rect x="{50 - width / 2:g}" y="{trunk_y:g}" width="{width}" height="{trunk_h:g}" fill="#5D4037" />'
+            f'<g transform="translate(0 {trunk_y:g})"><g fill="{leaf_color}" opacity="{opacity}">{LEAF_PREFIX[count]}</g>'
+            f'{flowers}{fruit_svg}</g></svg>')
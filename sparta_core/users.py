@@ -0,0 +1,35 @@
+"""Registros de usuário: criação e estrutura mínima."""
+from datetime import datetime
+
+from .db_keys import ARCHIVED_KEY
+from .models import DEFAULT_SUBJECTS
+from .progression import user_progress
+from .routine import ensure_log_minutes
+
+
+def new_user_record(password_hash: str, created_at: datetime) -> dict:
+    return {
+        "password": password_hash,
+        "logs": [],
+        "agendas": {},
+        "subjects_list": list(DEFAULT_SUBJECTS),
+        "tree_branches": 1,
+        "created_at": str(created_at),
+    }
+
+
+def is_archived(user_data: dict) -> bool:
+    return bool(user_data.get(ARCHIVED_KEY))
+
+
+def ensure_structure(user_data: dict) -> dict:
+    """Completa registros antigos com os campos que as telas esperam (inclui a migração dos horários e os totais/marcos)."""
+    user_data.setdefault("subjects_list", list(DEFAULT_SUBJECTS))
+    user_data.setdefault("logs", [])
+    user_data.setdefault("agendas", {})
+    user_data.setdefault("tree_branches", 1)
+    for log in user_data["logs"]:
+        if "questoes_detalhadas" not in log: log["questoes_detalhadas"] = {}
+        if "acordou_min" not in log or "dormiu_min" not in log: ensure_log_minutes(log)
+    user_progress(user_data)
+    return user_data
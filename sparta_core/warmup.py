@@ -0,0 +1,77 @@
+"""
+Preparação única do processo: etapas que rodavam a cada rerun passam a rodar
+uma vez, numa thread, enquanto a primeira página já é desenhada.
+
+Cada etapa é (nome, função) e roda na ordem dada; a falha de uma etapa fica
+registrada e não impede as seguintes (offline, por exemplo, o Sheets falha e
+as contas padrão ainda são criadas). status() devolve o estado de cada etapa
+para a tela de login e o painel do moderador.
+
+Uso:
+    warm = Warmup([("sheets", conectar), ("usuarios", criar_padrao)]).start()
+    warm.ready      # True quando todas terminaram (com ou sem erro)
+    warm.wait(5)    # espera até 5 s
+"""
+import threading
+import time
+
+from . import instrumentation
+
+PENDING = "pendente"
+RUNNING = "rodando"
+DONE = "ok"
+FAILED = "erro"
+
+
+class Warmup:
+    """Etapas de preparação rodadas uma vez, em ordem, numa thread própria."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self._lock = threading.Lock()
+        self._status = {name: {"estado": PENDING, "segundos": 0.0, "erro": None} for name, _ in self.steps}
+        self._done = threading.Event()
+        self._thread = None
+
+    def start(self) -> "Warmup":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sparta-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._status[name].update(fields)
+
+    def _run(self):
+        for name, fn in self.steps:
+            self._set(name, estado=RUNNING)
+            start = time.perf_counter()
+            try:
+                with instrumentation.span("warmup", etapa=name):
+                    fn()
+            except Exception as e:
+                print(f"[Erro Preparação {name}]: {e}")
+                self._set(name, estado=FAILED, erro=str(e), segundos=time.perf_counter() - start)
+            else:
+                self._set(name, estado=DONE, segundos=time.perf_counter() - start)
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> list[dict]:
+        """[{'etapa', 'estado', 'segundos', 'erro'}] na ordem das etapas."""
+        with self._lock:
+            return [{"etapa": name, **self._status[name]} for name, _ in self.steps]
+
+    def current(self) -> str | None:
+        """Nome da etapa em curso (ou a próxima a rodar); None quando tudo terminou."""
+        for item in self.status():
+            if item["estado"] in (PENDING, RUNNING): return item["etapa"]
+        return None
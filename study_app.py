@@ -1,168 +1,62 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from datetime import datetime, date, timedelta, timezone
-import re
-import random
-import json
+from matplotlib.colors import LinearSegmentedColormap
+from datetime import datetime, timedelta
 import os
 import time
 import base64
-import shutil
-import hashlib
-import calendar
+import uuid
 import colorsys # Importação necessária para gerar cores
-from contextlib import contextmanager
-
-# Tenta importar bibliotecas do Google Sheets.
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    SHEETS_AVAILABLE = True
-except ImportError:
-    SHEETS_AVAILABLE = False
-
-# --- CONFIGURAÇÃO DA PÁGINA ---
-st.set_page_config(
-    page_title="Mentor SpartaJus",
-    page_icon="🏛️",
-    layout="wide",
-    initial_sidebar_state="expanded"
+
+from sparta_core import (
+    agenda, alerts, backup, bulk_admin, cohort_analytics, credentials, daily_series, instrumentation, progression,
+    question_stats, routine, routine_analytics, session_store, simulado_progress, simulados_pipeline,
+    snapshots, storage, study_logs, tiering, tree, warmup,
 )
+from sparta_core.dates import BRT, format_date_br, get_now_br, get_today_br, parse_log_date
+from sparta_core.models import LogEntry
+from sparta_core.progression import format_stars, get_patent, get_stars, ranking_rows
+from sparta_core.users import ensure_structure, is_archived, new_user_record
 
 # --- CONSTANTES GLOBAIS ---
 DB_FILE = "sparta_users.json"
 LOGO_FILE = "logo_spartajus.jpg" 
 ADMIN_USER = "fux_concurseiro" 
 SHEET_NAME = "SpartaJus_DB" 
+SNAPSHOT_DIR = "snapshots"
 ENCRYPTED_KEY_LOCAL = "QUl6YVN5RFI1VTdHeHNCZVVVTFE5M1N3UG9VNl9CaGl3VHZzMU9n"
 
-# --- FUSO HORÁRIO BRASÍLIA ---
-BRT = timezone(timedelta(hours=-3))
-
-def get_now_br():
-    """Retorna o timestamp atual em Brasília"""
-    return datetime.now(BRT)
-
-def get_today_br():
-    """Retorna a data de hoje em Brasília"""
-    return get_now_br().date()
-
 # --- SEGURANÇA E HASHING ---
-def hash_password(password):
-    """Gera um hash SHA-256 da senha."""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def verify_password(stored_password, provided_password):
-    """
-    Verifica a senha. Suporta legado (texto plano) e migração automática.
-    Retorna (bool_is_valid, bool_needs_update).
-    """
-    # Verifica se é hash (len 64 hex)
-    if len(stored_password) == 64 and all(c in '0123456789abcdefABCDEF' for c in stored_password):
-        return stored_password == hash_password(provided_password), False
-    
-    # Fallback para legado (texto plano)
-    if stored_password == provided_password:
-        return True, True # Válido, mas precisa atualizar para hash
-    return False, False
-
-# --- GERENCIAMENTO DE DADOS (CLASSE ROBUSTA) ---
-class SpartaDataManager:
-    def __init__(self, db_file, sheet_name):
-        self.db_file = db_file
-        self.sheet_name = sheet_name
-    
-    def _connect_sheets(self):
-        if not SHEETS_AVAILABLE: return None
-        if "gcp_service_account" not in st.secrets: return None
-        try:
-            creds_dict = st.secrets["gcp_service_account"]
-            scope = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
-            creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
-            client = gspread.authorize(creds)
-            return client
-        except Exception as e:
-            print(f"[Erro Conexão Sheets]: {e}")
-            return None
-
-    def sync_down(self):
-        """Baixa do Sheets e atualiza local atomicamente."""
-        client = self._connect_sheets()
-        if not client: return False
-        try:
-            sheet = client.open(self.sheet_name).sheet1
-            records = sheet.get_all_values()
-            cloud_db = {}
-            for row in records:
-                if len(row) >= 2:
-                    key = row[0]
-                    try:
-                        value = json.loads(row[1])
-                        cloud_db[key] = value
-                    except json.JSONDecodeError:
-                        continue
-            
-            if cloud_db:
-                # Escrita atômica para evitar corrupção
-                temp_file = f"{self.db_file}.tmp"
-                with open(temp_file, "w", encoding="utf-8") as f:
-                    json.dump(cloud_db, f, indent=4, default=str)
-                os.replace(temp_file, self.db_file)
-                return True
-        except Exception as e:
-            print(f"[Erro Sync Down]: {e}")
-            return False
-
-    def sync_up(self, db_data):
-        """Sobe dados locais para o Sheets."""
-        client = self._connect_sheets()
-        if not client: return False
-        try:
-            sheet = client.open(self.sheet_name).sheet1
-            rows_to_update = []
-            for key, value in db_data.items():
-                json_str = json.dumps(value, default=str)
-                rows_to_update.append([key, json_str])
-            sheet.clear()
-            sheet.update('A1', rows_to_update)
-            return True
-        except Exception as e:
-            print(f"[Erro Sync Up]: {e}")
-            return False
-
-    def load(self):
-        """Carrega DB local com tratamento de erro."""
-        if not os.path.exists(self.db_file): return {}
-        try:
-            with open(self.db_file, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content: return {} 
-                return json.loads(content)
-        except (json.JSONDecodeError, OSError):
-            return {}
-
-    def save(self, db_data, sync=True):
-        """Salva DB localmente e tenta sync."""
-        temp_file = f"{self.db_file}.tmp"
-        try:
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(db_data, f, indent=4, default=str)
-                f.flush()
-                os.fsync(f.fileno()) 
-            os.replace(temp_file, self.db_file)
-        except Exception as e:
-            st.error(f"Erro crítico salvamento local: {e}")
-            return
-        
-        if sync:
-            # Sync em background idealmente, mas aqui síncrono para garantir
-            try: self.sync_up(db_data)
-            except: pass
+# KDF salgado, migração de hashes legados e limitador de tentativas ficam em credentials.py
+@st.cache_resource(show_spinner=False)
+def get_login_limiter():
+    """Limitador de tentativas compartilhado por todas as sessões do processo."""
+    return credentials.LoginRateLimiter()
+
+# --- GERENCIAMENTO DE DADOS ---
+# JSON local + Google Sheets ficam em sparta_core.storage; aqui só entram as credenciais do st.secrets
+def _gcp_service_account():
+    return st.secrets["gcp_service_account"] if "gcp_service_account" in st.secrets else None
+
+def report_storage_error(msg):
+    """Falhas de gravação: na tela quando vêm de um rerun; de threads de fundo (preparação, sync), só no log."""
+    if get_script_run_ctx(suppress_warning=True) is None: print(f"[Erro Armazenamento]: {msg}")
+    else: st.error(msg)
+
+@st.cache_resource(show_spinner=False)
+def get_data_manager():
+    """Gerenciador único do processo: a conexão com o Sheets é aberta uma vez e reaproveitada."""
+    return storage.SpartaDataManager(
+        DB_FILE, SHEET_NAME, snapshots.SnapshotStore(SNAPSHOT_DIR),
+        client_factory=storage.gspread_client_factory(_gcp_service_account),
+        error_reporter=report_storage_error,
+    )
 
 # Instância Global do Gerenciador
-data_manager = SpartaDataManager(DB_FILE, SHEET_NAME)
+data_manager = get_data_manager()
 
 # --- FUNÇÕES DE LÓGICA DE NEGÓCIO ---
 
@@ -174,16 +68,15 @@ def get_api_key():
     except Exception:
         return ""
 
+def sync_sheets():
+    # Sync de partida: só as linhas alteradas desde o último JSON local
+    data_manager.start_sync_down()
+    data_manager.wait_sync()
+
 def ensure_users_exist():
-    # Carrega sem sync inicial para velocidade, o sync ocorre no login ou load_db
+    # Roda depois do sync, para não sobrescrever contas que já estão na nuvem
     db = data_manager.load()
-    if not db and "db_synced" not in st.session_state:
-        success = data_manager.sync_down()
-        if success: 
-            st.session_state["db_synced"] = True
-            db = data_manager.load()
 
-    data_changed = False
     # Senhas padrão (serão convertidas para hash no primeiro login se necessário)
     vip_users = { 
         "fux_concurseiro": "Senha128", 
@@ -192,26 +85,35 @@ def ensure_users_exist():
     }
     
     for user, default_pass in vip_users.items():
-        if user not in db:
-            # Criando já com hash para novos registros
-            db[user] = {
-                "password": hash_password(default_pass),
-                "logs": [],
-                "agendas": {},
-                "subjects_list": ["Constitucional", "Administrativo", "Penal", "Civil", "Processo Civil"],
-                "tree_branches": 1,
-                "created_at": str(get_now_br()),
-                "mod_message": ""
-            }
-            data_changed = True
-            
-    if data_changed: data_manager.save(db)
-
-# Chama inicialização
-ensure_users_exist()
+        if not lookup_user(db, user):
+            # Criando já com hash para novos registros (grava só a linha deste usuário)
+            db[user] = new_user_record(credentials.hash_password(default_pass), get_now_br())
+            data_manager.save_user(user, db[user])
+
+def warm_caches():
+    # Índice do banco de questões e tabelas da coorte prontos antes da primeira visita às abas
+    sources = question_bank_sources()
+    if sources: _load_question_bank(*sources)
+    get_question_stats()
+    get_cohort_analytics()
+    get_alert_store()
+
+def upload_cold_objects():
+    # Objetos do arquivo frio gravados só no disco (offline, pela linha de comando ou antes da aba) sobem para a planilha
+    get_cold_store().upload_missing(tiering.cold_objects(data_manager.load()))
+
+@st.cache_resource(show_spinner=False)
+def get_warmup():
+    """Preparação única do processo (reruns não repetem): Sheets, contas padrão, caches e arquivo frio."""
+    return warmup.Warmup([
+        ("sheets", sync_sheets),
+        ("usuarios", ensure_users_exist),
+        ("caches", warm_caches),
+        ("arquivo_frio", upload_cold_objects),
+    ]).start()
 
 # --- ESTILOS CSS (REBRANDING ESPARTANO) ---
-st.markdown("""
+APP_CSS = """
     <style>
     /* Ocultar elementos padrão do Streamlit */
     #MainMenu {visibility: hidden;}
@@ -406,7 +308,7 @@ st.markdown("""
         border-bottom-color: #9E0000 !important;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
 
 # --- FUNÇÕES AUXILIARES OTIMIZADAS ---
 def generate_distinct_colors(n):
@@ -424,160 +326,78 @@ def generate_distinct_colors(n):
         colors.append('#{:02x}{:02x}{:02x}'.format(int(r*255), int(g*255), int(b*255)))
     return colors
 
-def parse_time_str_to_min(t_str):
-    t_str = str(t_str).lower().replace(' ', '')
-    try:
-        if 'h' in t_str:
-            parts = t_str.split('h')
-            hours = int(parts[0]) if parts[0].isdigit() else 0
-            rest = parts[1]
-            mins_str = rest.split('m')[0]
-            mins = int(mins_str) if mins_str.isdigit() else (int(rest) if rest.isdigit() else 0)
-            return hours * 60 + mins
-        elif 'm' in t_str: return int(t_str.split('m')[0])
-        elif ':' in t_str:
-            h, m = t_str.split(':')
-            return int(h)*60 + int(m)
-        elif t_str.isdigit(): return int(t_str)
-    except Exception: pass
-    return 0
-
-def parse_time_str_to_obj(t_str):
-    try:
-        t_str = str(t_str).strip()
-        for fmt in ("%H:%M", "%Hh%M", "%H:%M:%S", "%H %M"):
-            try: return datetime.strptime(t_str, fmt).time()
-            except ValueError: continue
-    except Exception: pass
-    return None
-
-@st.cache_data(show_spinner=False)
-def generate_tree_svg(branches):
-    scale = min(max(branches, 1), 50) / 10.0
-    if branches <= 0:
-        return """<svg width="300" height="300" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><rect x="40" y="80" width="20" height="20" fill="#5D4037" /><text x="50" y="70" font-size="5" text-anchor="middle" fill="#555">A árvore secou...</text></svg>"""
-    leaves_svg = ""
-    # Usando seed local para consistência visual sem afetar random global
-    rng = random.Random(42) 
-    trunk_h = min(30 + (branches * 0.5), 60)
-    # Revertendo: Base do tronco volta para 100 (sem texto embaixo dentro do SVG)
-    trunk_y = 100 - trunk_h
-    count = min(max(1, branches), 150)
-    for i in range(count):
-        cx = 50 + rng.randint(-20 - int(branches/2), 20 + int(branches/2))
-        cy = trunk_y + rng.randint(-20 - int(branches/2), 10)
-        r = rng.randint(3, 6)
-        leaves_svg += f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="#228B22" opacity="0.8" />'
-    
-    # Revertendo: Removemos o texto de dentro do SVG
-    return f"""<svg width="350" height="350" viewBox="0 0 100 100" xmlns="http://www.w3.org/2000/svg"><rect x="45" y="{trunk_y}" width="10" height="{trunk_h}" fill="#5D4037" />{leaves_svg}</svg>"""
-
-def get_patent(total_questions):
-    patentes = ["O Maltrapilho (fase iniciante)", "O Comum (fase q banca te humilha)", "O Cadastrado (fase mediana)", "O Altivo (fase da perseverança)", "O Espartano (fase da autonomia)"]
-    idx = min(int(total_questions / 5000), 4)
-    return patentes[idx]
-
-def get_stars(total_pages):
-    if total_pages == 0: return 0, 0, 0
-    raw_bronze = int(total_pages / 1000)
-    gold = raw_bronze // 9
-    if gold >= 3: return 3, 0, 0
-    rem = raw_bronze % 9
-    return gold, rem // 3, rem % 3
-
-def calculate_streak(logs):
-    """Calcula os dias consecutivos de estudo (streak) com robustez de tipos."""
-    if not logs: return 0
-    
-    # 1. Sanitizar e normalizar todas as datas para string "YYYY-MM-DD"
-    valid_logs = []
-    for l in logs:
-        if not l.get('estudou', False):
-            continue
-            
-        d = l.get('data')
-        
-        # Trata string
-        if isinstance(d, str):
-            valid_logs.append(d)
-        # Trata objetos date ou datetime
-        elif isinstance(d, (date, datetime)):
-            valid_logs.append(d.strftime("%Y-%m-%d"))
-            
-    # 2. Ordenar lista de strings (agora seguro)
-    study_dates = sorted(list(set(valid_logs)), reverse=True)
-    
-    if not study_dates: return 0
-    
-    today = get_today_br()
-    try:
-        last = datetime.strptime(study_dates[0], "%Y-%m-%d").date()
-    except ValueError:
-        return 0
+@st.cache_resource(show_spinner=False)
+def _load_question_bank(simulados_dir, bank_file, fingerprint):
+    """Banco indexado em memória; a assinatura das fontes entra na chave do cache."""
+    bank = simulados_pipeline.load_bank(simulados_dir, bank_file)
+    return simulados_pipeline.expand_simulados(bank), bank.get("problemas", [])
 
-    if (today - last).days > 1: return 0
-    
-    current_check = last
-    streak = 0
-    for d_str in study_dates:
-        try:
-            d_obj = datetime.strptime(d_str, "%Y-%m-%d").date()
-        except ValueError: continue
-        
-        if d_obj == current_check:
-            streak += 1
-            current_check -= timedelta(days=1)
-        elif d_obj < current_check: break
-    return streak
+def question_bank_sources():
+    """(pasta dos simulados, arquivo do banco, assinatura) para _load_question_bank; None sem simulados."""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    simulados_dir = os.path.join(base_dir, simulados_pipeline.SIMULADOS_DIR)
+    if not os.path.exists(simulados_dir): return None
+    fingerprint = simulados_pipeline.source_fingerprint(simulados_dir)
+    if not fingerprint: return None
+    return simulados_dir, os.path.join(base_dir, simulados_pipeline.BANK_FILE), fingerprint
 
+@instrumentation.timed("simulados.load")
 def load_simulados():
-    """Lê todos os arquivos de simulados externos da subpasta 'simulados'."""
-    simulados_db = {}
-    
+    """Lê o banco de simulados validado e indexado a partir da subpasta 'simulados'."""
     # Define o diretório raiz onde o script app_spartajus.py está localizado
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
     # Aponta especificamente para a subpasta "simulados"
-    simulados_dir = os.path.join(base_dir, "simulados")
+    simulados_dir = os.path.join(base_dir, simulados_pipeline.SIMULADOS_DIR)
     
     if not os.path.exists(simulados_dir):
         st.sidebar.warning(f"⚠️ A subpasta 'simulados' não foi encontrada em: {base_dir}")
-        return simulados_db
+        return {}
         
     try:
-        arquivos_encontrados = os.listdir(simulados_dir)
-        
-        # Filtra arquivos ignorando letras maiúsculas/minúsculas
-        arquivos_simulados = [
-            f for f in arquivos_encontrados 
-            if f.lower().startswith("simulado") and f.lower().endswith(".json")
-        ]
-        
-        if not arquivos_simulados:
+        fingerprint = simulados_pipeline.source_fingerprint(simulados_dir)
+        if not fingerprint:
             st.sidebar.info(f"ℹ️ Nenhum arquivo 'simulado...json' encontrado na pasta:\n{simulados_dir}")
-            return simulados_db
-
-        for filename in arquivos_simulados:
-            filepath = os.path.join(simulados_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        simulados_db.update(data)
-                    else:
-                        st.sidebar.error(f"⚠️ O arquivo {filename} não possui o formato correto de Dicionário.")
-            except json.JSONDecodeError as e:
-                st.sidebar.error(f"⚠️ Erro de sintaxe (JSON quebrado) no arquivo {filename}: {e}")
-            except Exception as e:
-                st.sidebar.error(f"Erro ao carregar {filename}: {e}")
-                
+            return {}
+
+        bank_file = os.path.join(base_dir, simulados_pipeline.BANK_FILE)
+        simulados_db, problemas = _load_question_bank(simulados_dir, bank_file, fingerprint)
+        # Questões inválidas já foram descartadas pelo pipeline; aqui só avisamos
+        for p in problemas:
+            if p["nivel"] == "erro":
+                local = " / ".join(str(x) for x in (p["arquivo"], p["simulado"], p["questao"]) if x)
+                st.sidebar.error(f"⚠️ {local}: {p['mensagem']}")
     except Exception as e:
         st.sidebar.error(f"Erro ao acessar a pasta simulados: {e}")
+        return {}
         
     return simulados_db
 
 
+def render_chart(fig, nome):
+    """Desenha a figura medindo o custo (o savefig do st.pyplot é a parte cara) e libera a memória."""
+    with instrumentation.span("grafico", nome=nome):
+        st.pyplot(fig)
+    plt.close(fig)
+
+
 # --- AUTH SYSTEM ---
+def lookup_user(db, username):
+    """Usuário que ainda não chegou ao JSON local (sync de partida em curso, ou criado em outra instância) é buscado no Sheets."""
+    if username and username not in db:
+        record = data_manager.fetch_user(username)
+        if record is not None: db[username] = record
+    return username in db
+
+def save_credentials(username, record):
+    """
+    Grava um registro alterado fora das sessões do dono (senha nova, hash migrado,
+    reidratação) e descarta a cópia compartilhada em memória: sem isso a próxima
+    gravação de uma aba aberta devolveria o hash antigo.
+    """
+    data_manager.save_user(username, record)
+    get_user_cache().invalidate(username)
+
 def login_page():
     c1, c2, c3 = st.columns([1, 2, 1]) 
     if os.path.exists(LOGO_FILE): 
@@ -587,30 +407,53 @@ def login_page():
     st.title("🏛️ Mentor SpartaJus")
     st.markdown("<h3 style='text-align:center; color:#9E0000;'>Login</h3>", unsafe_allow_html=True)
     
+    preparo = get_warmup()
+    if not preparo.ready:
+        st.caption(f"⏳ Preparando o quartel ({preparo.current()})... o login já funciona.")
+    
     tab1, tab2, tab3 = st.tabs(["🔑 Entrar", "📝 Registrar", "🔄 Alterar Senha"])
     
     with tab1:
         u = st.text_input("Usuário", key="l_u").strip()
         p = st.text_input("Senha", type="password", key="l_p")
         if st.button("Entrar", type="primary"):
+            limiter = get_login_limiter()
+            wait = limiter.retry_after(u)
+            if wait:
+                st.error(f"Muitas tentativas. Tente novamente em {wait} segundos.")
+                return
             db = data_manager.load()
-            if u in db:
+            if lookup_user(db, u):
                 stored_pass = db[u]['password']
-                is_valid, needs_update = verify_password(stored_pass, p)
+                # O KDF roda nesta thread (hashlib libera o GIL: as outras sessões seguem atendidas)
+                with st.spinner("Verificando credenciais..."):
+                    is_valid, needs_update = credentials.verify_password(stored_pass, p)
                 
-                if is_valid:
-                    # Atualiza hash se for senha antiga
-                    if needs_update:
-                        db[u]['password'] = hash_password(p)
-                        data_manager.save(db)
-                    
-                    st.session_state['user'] = u
-                    st.session_state['user_data'] = db[u]
-                    if 'admin_user' in st.session_state: del st.session_state['admin_user']
-                    st.rerun()
+                if is_valid and is_archived(db[u]):
+                    st.error("Conta arquivada. Fale com o moderador.")
+                elif is_valid:
+                    limiter.register_success(u)
+                    # Usuário no arquivo frio volta inteiro para o banco quente
+                    try:
+                        rehydrated = tiering.rehydrate_user(db, u, get_cold_store())
+                    except tiering.ColdObjectMissing as e:
+                        print(f"[Erro Arquivo Frio]: {e}")
+                        st.error("Sua conta está no arquivo frio e não pôde ser carregada agora. Tente de novo em instantes ou fale com o moderador.")
+                    else:
+                        # Atualiza hash se for senha antiga (grava só este usuário)
+                        if needs_update:
+                            db[u]['password'] = credentials.hash_password(p)
+                        if needs_update or rehydrated:
+                            save_credentials(u, db[u])
+
+                        open_user_session(u, db[u])
+                        if 'admin_user' in st.session_state: del st.session_state['admin_user']
+                        st.rerun()
                 else:
+                    limiter.register_failure(u)
                     st.error("Senha incorreta.")
             else:
+                limiter.register_failure(u)
                 st.error("Usuário não encontrado.")
     
     with tab2:
@@ -618,17 +461,10 @@ def login_page():
         np = st.text_input("Nova Senha", type="password", key="r_p")
         if st.button("Registrar"):
             db = data_manager.load()
-            if nu in db: st.error("Já existe este guerreiro.")
+            if lookup_user(db, nu): st.error("Já existe este guerreiro.")
             elif nu and np:
-                db[nu] = {
-                    "password": hash_password(np), # Já salva com hash
-                    "logs": [], "agendas": {}, 
-                    "subjects_list": ["Constitucional", "Administrativo", "Penal", "Civil", "Processo Civil"], 
-                    "tree_branches": 1, 
-                    "created_at": str(get_now_br()), 
-                    "mod_message": ""
-                }
-                data_manager.save(db)
+                db[nu] = new_user_record(credentials.hash_password(np), get_now_br()) # Já salva com hash
+                data_manager.save_user(nu, db[nu])
                 st.success("Conta criada! Vá para o Login.")
             else: st.warning("Preencha todos os campos.")
             
@@ -637,47 +473,154 @@ def login_page():
         op = st.text_input("Senha Atual", type="password", key="c_op")
         nop = st.text_input("Nova Senha", type="password", key="c_np")
         if st.button("Alterar"):
+            limiter = get_login_limiter()
+            wait = limiter.retry_after(cu)
+            if wait:
+                st.error(f"Muitas tentativas. Tente novamente em {wait} segundos.")
+                return
             db = data_manager.load()
-            if cu in db:
-                is_valid, _ = verify_password(db[cu]['password'], op)
+            if lookup_user(db, cu):
+                is_valid, _ = credentials.verify_password(db[cu]['password'], op)
                 if is_valid:
-                    db[cu]['password'] = hash_password(nop)
-                    data_manager.save(db)
+                    limiter.register_success(cu)
+                    db[cu]['password'] = credentials.hash_password(nop)
+                    save_credentials(cu, db[cu])
                     st.success("Senha atualizada com segurança!")
-                else: st.error("Senha atual incorreta.")
+                else:
+                    limiter.register_failure(cu)
+                    st.error("Senha atual incorreta.")
             else: st.error("Usuário não encontrado.")
 
-def save_current_user_data():
-    if 'user' in st.session_state:
-        db = data_manager.load()
-        # Merge simples: Atualiza apenas o usuário atual, mantém outros
-        db[st.session_state['user']] = st.session_state['user_data']
+# --- SESSÕES (REGISTRO COMPARTILHADO POR USUÁRIO) ---
+@st.cache_resource(show_spinner=False)
+def get_user_cache():
+    """Registros de usuário compartilhados por todas as abas/sessões do processo."""
+    return session_store.UserRecordCache()
+
+def session_token():
+    if 'session_token' not in st.session_state:
+        st.session_state['session_token'] = uuid.uuid4().hex
+    return st.session_state['session_token']
+
+def open_user_session(username, record=None):
+    """Associa esta sessão ao usuário; se o registro já está em memória (outra aba), ele é reaproveitado."""
+    st.session_state['user'] = username
+    get_user_cache().acquire(username, session_token(), lambda: record if record is not None else data_manager.load().get(username))
+
+def close_user_session():
+    get_user_cache().release(session_token())
+    st.session_state.pop('user', None)
+
+def current_user_data():
+    """Registro compartilhado do usuário desta sessão (None se ele não existe mais)."""
+    username = st.session_state['user']
+    return get_user_cache().get(username, session_token(), lambda: data_manager.load().get(username))
+
+@st.cache_resource(show_spinner=False)
+def get_question_stats():
+    """Tabela de dificuldade da coorte (uma por processo); montada do zero só na primeira vez."""
+    store = question_stats.QuestionStatsStore(question_stats.STATS_FILE)
+    if store.is_empty():
+        store.refresh(data_manager.load())
+    return store
+
+@st.cache_resource(show_spinner=False)
+def get_cohort_analytics():
+    """Resumos da coorte (um por processo); montados do zero só na primeira vez."""
+    store = cohort_analytics.CohortAnalyticsStore(cohort_analytics.ANALYTICS_FILE)
+    if store.is_empty():
+        store.refresh(data_manager.load())
+    return store
+
+@st.cache_resource(show_spinner=False)
+def get_alert_store():
+    """Avisos e mensagens (um por processo), espelhados em abas da planilha; traz 'global_alerts'/'mod_message' do banco antigo."""
+    store = alerts.AlertStore(
+        alerts.ALERTS_FILE, alerts.CURSORS_FILE,
+        remote=storage.SheetTab(data_manager, alerts.ALERTS_SHEET, cols=1),
+        cursors_remote=storage.SheetTab(data_manager, alerts.CURSORS_SHEET, cols=2),
+    )
+    # Deploy novo começa sem os arquivos locais: baixa da planilha antes de qualquer leitura
+    try: store.restore()
+    except Exception as e: print(f"[Erro Avisos Sheets]: {e}")
+    db = data_manager.load()
+    if alerts.import_legacy(store, db):
         data_manager.save(db)
+        get_user_cache().invalidate()
+    return store
+
+@st.cache_resource(show_spinner=False)
+def get_cold_store():
+    """Arquivo frio (usuários inativos e logs antigos), compartilhado pelo processo."""
+    return tiering.ColdStore(tiering.COLD_DIR, storage.SheetTab(data_manager, tiering.COLD_SHEET, cols=3))
+
+@st.cache_resource(show_spinner=False)
+def get_series_cache():
+    """Séries diárias (NumPy) de cada usuário, compartilhadas entre sessões."""
+    return daily_series.SeriesCache()
+
+def user_series(user, user_data):
+    return get_series_cache().get(user, user_data)
+
+@st.cache_resource(show_spinner=False)
+def get_agenda_cache():
+    """Índices da agenda (metas por mês + recorrentes) de cada usuário."""
+    return agenda.AgendaIndexCache()
+
+def user_agenda(user, user_data):
+    return get_agenda_cache().get(user, user_data)
+
+def save_current_user_data(user_data):
+    """Grava o registro que este rerun editou (o mesmo objeto que main_app obteve no início)."""
+    if 'user' in st.session_state and user_data is not None:
+        # Merge simples: Atualiza apenas o usuário atual, mantém outros (e só a linha dele no Sheets)
+        data_manager.save_user(st.session_state['user'], user_data)
+        # Uma invalidação (moderação em outra sessão) no meio do rerun recarregaria o registro sem estas edições
+        get_user_cache().put(st.session_state['user'], user_data)
+        # Atualização incremental: só reagrega se o progresso de simulados mudou
+        get_question_stats().update_user(st.session_state['user'], user_data.get('simulados_progress', {}))
+        get_cohort_analytics().update_user(st.session_state['user'], user_data)
+
+def render_milestones(user_data):
+    """Linha do tempo das patentes e estrelas conquistadas (lidas dos marcos, sem somar o histórico)."""
+    marcos = progression.milestones(user_data)
+    if not marcos: return
+    with st.expander(f"🏅 Marcos da Jornada ({len(marcos)})"):
+        for m in marcos:
+            icone = "🛡️ Promovido a" if m["tipo"] == progression.PATENT else "⭐ Conquistou"
+            st.markdown(f"**{format_date_br(m['data'])}** — {icone} {m['titulo']}")
 
 # --- APP PRINCIPAL ---
 def main_app():
     user = st.session_state['user']
-    user_data = st.session_state['user_data']
+    user_data = current_user_data()
+    if user_data is None:
+        # Usuário removido enquanto a sessão estava aberta
+        close_user_session()
+        st.rerun()
     is_real_admin = (user == ADMIN_USER)
     is_admin_mode = ('admin_user' in st.session_state and st.session_state['admin_user'] == ADMIN_USER)
+    if (is_archived(user_data) and not is_admin_mode) or tiering.is_cold(user_data):
+        # Conta arquivada pelo moderador (ou levada ao arquivo frio) enquanto a sessão estava aberta
+        close_user_session()
+        st.rerun()
 
     # Garante estrutura de dados mínima
-    if 'subjects_list' not in user_data: user_data['subjects_list'] = ["Constitucional", "Administrativo", "Penal", "Civil", "Processo Civil"]
-    if 'logs' in user_data:
-        for log in user_data['logs']:
-            if 'questoes_detalhadas' not in log: log['questoes_detalhadas'] = {}
+    ensure_structure(user_data)
 
     st.session_state.api_key = get_api_key()
-    total_q = sum([l.get('questoes', 0) for l in user_data['logs']])
-    total_p = sum([l.get('paginas', 0) for l in user_data['logs']])
-    streak = calculate_streak(user_data['logs'])
+    total_q, total_p = progression.user_totals(user_data)
+    streak = user_series(user, user_data).streak(get_today_br())
     
     with st.sidebar:
         if os.path.exists(LOGO_FILE): st.image(LOGO_FILE)
         st.write(f"### Olá, {user}")
+        novos_alertas, novas_mensagens = get_alert_store().unread(user)
+        if novos_alertas or novas_mensagens:
+            st.info(f"📢 {novos_alertas} alerta(s) e 📨 {novas_mensagens} mensagem(ns) não lidos em Avisos")
         
         # STATUS DO GOOGLE SHEETS
-        if SHEETS_AVAILABLE and data_manager._connect_sheets():
+        if storage.SHEETS_AVAILABLE and data_manager._connect_sheets():
             st.caption("🟢 Conectado à Nuvem (Google Sheets)")
         else:
             st.caption("🟠 Modo Offline (Local JSON)")
@@ -693,7 +636,7 @@ def main_app():
         </div>""", unsafe_allow_html=True)
         
         if st.button("Sair"):
-            del st.session_state['user']
+            close_user_session()
             st.rerun()
             
         st.divider()
@@ -708,30 +651,40 @@ def main_app():
                     all_users = [k for k in db.keys() if k != "global_alerts"]
                     target_user = st.selectbox("Selecione o Espartano:", all_users)
                     if st.button("👁️ Acessar Dashboard"):
-                        st.session_state['admin_user'] = ADMIN_USER
-                        st.session_state['user'] = target_user
-                        st.session_state['user_data'] = db[target_user]
-                        st.rerun()
+                        try:
+                            rehydrated = tiering.rehydrate_user(db, target_user, get_cold_store())
+                        except tiering.ColdObjectMissing as e:
+                            st.error(f"{target_user} está no arquivo frio e o registro completo não pôde ser carregado: {e}")
+                        else:
+                            if rehydrated:
+                                save_credentials(target_user, db[target_user])
+                            st.session_state['admin_user'] = ADMIN_USER
+                            open_user_session(target_user, db[target_user])
+                            st.rerun()
                 elif is_admin_mode:
                     st.warning(f"Visualizando: {user}")
                     if st.button("⬅️ Voltar ao Admin"):
-                        st.session_state['user'] = ADMIN_USER
-                        st.session_state['user_data'] = data_manager.load()[ADMIN_USER]
+                        open_user_session(ADMIN_USER)
                         st.rerun()
 
-        # BACKUP NO FINAL
+        # BACKUP NO FINAL (cada aluno baixa apenas os próprios dados). O arquivo é gerado no clique,
+        # com o banco daquele momento, e não fica guardado na sessão
         st.divider()
-        if os.path.exists(DB_FILE):
-            with open(DB_FILE, "r", encoding="utf-8") as f:
-                st.download_button("Baixar Backup (JSON)", f, f"backup_{get_now_br().strftime('%Y%m%d_%H%M')}.json", "application/json")
+        escopo_backup = "Meus dados"
+        if is_real_admin:
+            escopo_backup = st.radio("Backup:", ["Meus dados", "Banco completo"], horizontal=True, key="escopo_backup")
+        keys = None if escopo_backup == "Banco completo" else [user]
+        st.download_button(
+            "📦 Baixar Backup (.jsonl.gz)",
+            lambda: backup.export_bytes(tiering.ExpandedView(data_manager.load(), get_cold_store()), keys),
+            backup.backup_filename(get_now_br(), None if keys is None else user), "application/gzip",
+        )
 
     # --- BODY PRINCIPAL ---
     st.title("🏛️ Mentor SpartaJus")
     
     # Barra de Progresso Melhorada
-    prog = total_q % 5000
-    perc = (prog / 5000) * 100
-    rem_q = 5000 - prog
+    perc, rem_q = progression.patent_progress(total_q)
     
     st.markdown(f"""
     <div style="background-color: #E3DFD3; padding: 10px; border-radius: 12px; margin-bottom: 25px; border: 1px solid #DAA520; box-shadow: 0 4px 6px rgba(0,0,0,0.05);">
@@ -752,945 +705,1252 @@ def main_app():
     
     c1, c2 = st.columns([2, 1])
     with c1: 
-        st.markdown(f"<div class='rank-card'><h2>{user.upper()}</h2><h3>🛡️ {get_patent(total_q)}</h3><p>Total: {total_q} | 🔥 Fogo: {streak} dias</p></div>", unsafe_allow_html=True)
+        promovido = progression.promoted_on(user_data)
+        desde = f" | Promovido em {format_date_br(promovido)}" if promovido else ""
+        st.markdown(f"<div class='rank-card'><h2>{user.upper()}</h2><h3>🛡️ {get_patent(total_q)}</h3><p>Total: {total_q} | 🔥 Fogo: {streak} dias{desde}</p></div>", unsafe_allow_html=True)
     with c2:
-        g, s, b = get_stars(total_p)
-        stars = "".join(["🟡"]*g + ["⚪"]*s + ["🟤"]*b) or "Sem estrelas"
+        stars = format_stars(get_stars(total_p)) or "Sem estrelas"
         st.markdown(f"<div class='metric-card'><h4>⭐ Leitura</h4><div style='font-size:1.5em;'>{stars}</div><p>Páginas: {total_p}</p></div>", unsafe_allow_html=True)
+    render_milestones(user_data)
+
+    # --- NAVEGAÇÃO: só a seção escolhida é executada a cada rerun ---
+    keep_section_state()
+    sections = list(SECTIONS) + ([ADMIN_SECTION] if user == ADMIN_USER else [])
+    if st.session_state.get('secao') not in sections: st.session_state['secao'] = sections[0]
+    secao = st.radio("Seção", sections, horizontal=True, key="secao", label_visibility="collapsed")
+    st.divider()
+
+    t0 = time.perf_counter()
+    SECTION_RENDERERS[secao](user, user_data)
+    elapsed = time.perf_counter() - t0
+    record_section_time(secao, elapsed)
+    instrumentation.observe("secao.render", elapsed, secao=secao)
+
+    if is_real_admin:
+        render_section_timings(secao)
+
+
+# --- TAB 1: DIÁRIO ---
+def render_diario(user, user_data):
+    """Aba Diário: árvore da constância e registro de batalha."""
+    c_tree, c_form = st.columns([1, 1])
+    with c_tree:
+        st.subheader("Árvore da Constância")
+        branches = user_data["tree_branches"]
+        season = tree.season_of(get_today_br())
+        fruits = tree.fruits_for(progression.user_totals(user_data)[0])
+        st.markdown(f'<div class="tree-container">{tree.generate_tree_svg(branches, season, fruits)}</div>', unsafe_allow_html=True)
+        # Novo local do texto: Fora do SVG, destacado e centralizado
+        st.markdown(f"<h2 style='text-align: center; color: #9E0000; margin-top: 10px;'>🌱 Ramos Vivos: {branches}</h2>", unsafe_allow_html=True)
+        if branches > 0:
+            st.caption(f"{tree.stage_of(branches)[0]} • {tree.SEASON_NAMES[season]} • 🍎 {fruits} fruto(s) (1 a cada {tree.QUESTIONS_PER_FRUIT:,} questões)".replace(",", "."))
+
+        mensagem = get_alert_store().feed(user).latest()
+        if mensagem:
+            st.markdown(f"<div class='private-message'><strong>📨 MENSAGEM DO MENTOR:</strong><br>{mensagem['texto']}</div>", unsafe_allow_html=True)
+
+    with c_form:
+        st.subheader("📝 Registro de Batalha")
+        with st.form("log_form"):
+            d_log = st.date_input("Data", value=get_today_br(), format="DD/MM/YYYY")
+            c_t1, c_t2 = st.columns(2)
+            wt = c_t1.text_input("Acordou (HH:MM)", value="06:00")
+            sl = c_t2.text_input("Dormiu (HH:MM)", value="22:00")
+            pg = st.number_input("Páginas Lidas", min_value=0)
+            ws = st.number_input("Séries Musculação", min_value=0)
+
+            st.markdown("---")
+            st.markdown("##### ⚔️ Questões por Matéria")
+            quest_df = pd.DataFrame({"Matéria": [""], "Qtd": [0]})
+            quest_editor = st.data_editor(
+                quest_df, 
+                num_rows="dynamic", 
+                column_config={
+                    "Matéria": st.column_config.SelectboxColumn(
+                        "Matéria", 
+                        options=[""] + user_data['subjects_list'], # Adicionado opção vazia
+                        required=False
+                    ), 
+                    "Qtd": st.column_config.NumberColumn("Qtd", min_value=0, step=1)
+                }, 
+                use_container_width=True
+            )
 
-    # --- ATUALIZAÇÃO: ADICIONADA ABA DE MATÉRIAS ---
-    tabs = st.tabs(["📊 Diário", "📈 Dashboard", "🏆 Ranking", "📢 Avisos", "📅 Agenda", "🦁 Comportamento", "📚 Matérias", "📝 Simulados"] + (["🛡️ Admin"] if user==ADMIN_USER else []))
-
-    # --- TAB 1: DIÁRIO ---
-    with tabs[0]:
-        c_tree, c_form = st.columns([1, 1])
-        with c_tree:
-            st.subheader("Árvore da Constância")
-            st.markdown(f'<div class="tree-container">{generate_tree_svg(user_data["tree_branches"])}</div>', unsafe_allow_html=True)
-            # Novo local do texto: Fora do SVG, destacado e centralizado
-            st.markdown(f"<h2 style='text-align: center; color: #9E0000; margin-top: 10px;'>🌱 Ramos Vivos: {user_data['tree_branches']}</h2>", unsafe_allow_html=True)
-            
-            if user_data.get('mod_message'):
-                st.markdown(f"<div class='private-message'><strong>📨 MENSAGEM DO MENTOR:</strong><br>{user_data['mod_message']}</div>", unsafe_allow_html=True)
-        
-        with c_form:
-            st.subheader("📝 Registro de Batalha")
-            with st.form("log_form"):
-                d_log = st.date_input("Data", value=get_today_br(), format="DD/MM/YYYY")
-                c_t1, c_t2 = st.columns(2)
-                wt = c_t1.text_input("Acordou (HH:MM)", value="06:00")
-                sl = c_t2.text_input("Dormiu (HH:MM)", value="22:00")
-                pg = st.number_input("Páginas Lidas", min_value=0)
-                ws = st.number_input("Séries Musculação", min_value=0)
-                
-                st.markdown("---")
-                st.markdown("##### ⚔️ Questões por Matéria")
-                quest_df = pd.DataFrame({"Matéria": [""], "Qtd": [0]})
-                quest_editor = st.data_editor(
-                    quest_df, 
-                    num_rows="dynamic", 
-                    column_config={
-                        "Matéria": st.column_config.SelectboxColumn(
-                            "Matéria", 
-                            options=[""] + user_data['subjects_list'], # Adicionado opção vazia
-                            required=False
-                        ), 
-                        "Qtd": st.column_config.NumberColumn("Qtd", min_value=0, step=1)
-                    }, 
-                    use_container_width=True
-                )
-                
-                if st.form_submit_button("💾 Salvar"):
-                    q_details = {}
-                    total_q_day = 0
-                    if quest_editor is not None and not quest_editor.empty:
-                        for _, r in quest_editor.iterrows():
-                            mat = r.get("Matéria")
-                            try: qtd = int(r.get("Qtd", 0))
-                            except: qtd = 0
-                            
-                            if mat and qtd > 0:
-                                q_details[mat] = q_details.get(mat, 0) + qtd
-                                total_q_day += qtd
-                    
-                    is_study = (pg > 0) or (total_q_day > 0)
-                    d_str = d_log.strftime("%Y-%m-%d")
-                    
-                    new_log = {
-                        "data": d_str, 
-                        "acordou": wt, 
-                        "dormiu": sl, 
-                        "paginas": pg, 
-                        "series": ws, 
-                        "questoes": total_q_day, 
-                        "questoes_detalhadas": q_details, 
-                        "estudou": is_study
-                    }
-                    
-                    # Atualiza ou insere log
-                    exists = False
-                    for idx, l in enumerate(user_data['logs']):
-                        if l['data'] == new_log['data']:
-                            user_data['logs'][idx] = new_log
-                            exists = True
-                            break
-                    if not exists:
-                        user_data['logs'].append(new_log)
-                        if is_study: user_data['tree_branches'] += 1
-                        else: user_data['tree_branches'] = max(0, user_data['tree_branches'] - 2) # Evita negativo
-                    
-                    save_current_user_data()
-                    st.success("Salvo com glória!")
-                    time.sleep(1)
-                    st.rerun()
-
-    # --- TAB 2: DASHBOARD ---
-    with tabs[1]:
-        st.header("📈 Análise Tática")
-        if user_data['logs']:
-            # -----------------------------------
-            # FILTROS DE INTELIGÊNCIA
-            # -----------------------------------
-            st.markdown("##### 🔍 Filtros Personalizados")
-            
-            # Recuperar datas para limites do Date Input (CORREÇÃO DE TIPO MISTO)
-            all_dates = []
-            for l in user_data['logs']:
-                d_raw = l.get('data')
-                if isinstance(d_raw, str):
-                    try: all_dates.append(datetime.strptime(d_raw, "%Y-%m-%d").date())
-                    except ValueError: pass
-                elif isinstance(d_raw, datetime):
-                    all_dates.append(d_raw.date())
-                elif isinstance(d_raw, date):
-                    all_dates.append(d_raw)
-            
-            min_date = min(all_dates) if all_dates else get_today_br()
-            max_date = max(all_dates) if all_dates else get_today_br()
-            
-            # Layout dos Filtros
-            c_f1, c_f2 = st.columns([1, 1])
-            
-            with c_f1:
-                # Seletor de Período (Padrão: Todo o histórico)
-                date_range = st.date_input(
-                    "Período de Análise:",
-                    value=(min_date, max_date),
-                    min_value=min_date,
-                    max_value=max_date,
-                    format="DD/MM/YYYY"
-                )
-            
-            with c_f2:
-                # Seletor de Matérias (Padrão: Todas)
-                all_subjects = user_data['subjects_list']
-                selected_subjects = st.multiselect(
-                    "Matérias de Interesse:",
-                    options=all_subjects,
-                    default=all_subjects,
-                    placeholder="Selecione as matérias..."
-                )
+            if st.form_submit_button("💾 Salvar"):
+                q_details = {}
+                if quest_editor is not None and not quest_editor.empty:
+                    for _, r in quest_editor.iterrows():
+                        mat = r.get("Matéria")
+                        try: qtd = int(r.get("Qtd", 0))
+                        except: qtd = 0
 
-            st.divider()
+                        if mat and qtd > 0:
+                            q_details[mat] = q_details.get(mat, 0) + qtd
 
-            # -----------------------------------
-            # PROCESSAMENTO DOS DADOS FILTRADOS
-            # -----------------------------------
-            filtered_q_details = {}
-            filtered_total = 0
-            
-            # Validação do Range de Data (evita erro se usuário selecionar só data inicial)
-            start_d, end_d = min_date, max_date
-            if isinstance(date_range, tuple):
-                if len(date_range) == 2:
-                    start_d, end_d = date_range
-                elif len(date_range) == 1:
-                    start_d = end_d = date_range[0]
-
-            for l in user_data['logs']:
-                # Tratamento robusto para extrair a data (CORREÇÃO NO LOOP DE FILTRO)
-                d_raw = l.get('data')
-                log_date = None
-                
-                if isinstance(d_raw, str):
-                    try: log_date = datetime.strptime(d_raw, "%Y-%m-%d").date()
-                    except ValueError: continue
-                elif isinstance(d_raw, datetime):
-                    log_date = d_raw.date()
-                elif isinstance(d_raw, date):
-                    log_date = d_raw
-                
-                if not log_date: continue
-                
-                # Aplica Filtro de Data
-                if start_d <= log_date <= end_d:
-                    dets = l.get('questoes_detalhadas', {})
-                    for m, q in dets.items():
-                        # Aplica Filtro de Matéria
-                        if m in selected_subjects:
-                            filtered_q_details[m] = filtered_q_details.get(m, 0) + q
-                            filtered_total += q
-            
-            # -----------------------------------
-            # PLOTAGEM DO GRÁFICO
-            # -----------------------------------
-            st.subheader("Distribuição de Questões (Personalizado)")
-            if filtered_q_details:
-                labels = list(filtered_q_details.keys())
-                sizes = list(filtered_q_details.values())
-                
-                fig, ax = plt.subplots(figsize=(6, 3))
-                fig.patch.set_facecolor('#F5F4EF')
-                ax.set_facecolor('#F5F4EF')
-                
-                # GERAÇÃO DINÂMICA DE CORES (Baseado apenas nas matérias filtradas)
-                colors = generate_distinct_colors(len(labels))
-                
-                wedges, _ = ax.pie(sizes, labels=None, startangle=90, colors=colors)
-                legend_labels = [f"{(s/filtered_total)*100:.1f}% - {l}" for l, s in zip(labels, sizes)]
-                
-                ax.legend(wedges, legend_labels, title="Matérias", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1), frameon=False, labelcolor='#5D4037')
-                ax.axis('equal')
-                
-                c1, c2, c3 = st.columns([1, 2, 1])
-                with c2: st.pyplot(fig)
-                plt.close(fig) 
-            else: 
-                st.warning("⚠️ Nenhum registro encontrado para os filtros selecionados.")
-            
-            # -----------------------------------
-            # GRÁFICO DE EVOLUÇÃO (MANTIDO GERAL)
-            # -----------------------------------
-            st.divider()
-            st.subheader("📈 Evolução de Questões (Histórico Completo)")
-            df_l = pd.DataFrame(user_data['logs'])
-            if 'data' in df_l.columns and not df_l.empty:
-                df_l['data_obj'] = pd.to_datetime(df_l['data']).dt.date
-                df_l = df_l.sort_values(by='data_obj')
-                
-                fig_l, ax_l = plt.subplots(figsize=(5, 1.5))
-                fig_l.patch.set_facecolor('#F5F4EF')
-                ax_l.set_facecolor('#F5F4EF')
-                grp = df_l.groupby('data_obj')['questoes'].sum().reset_index()
-                ax_l.plot(grp['data_obj'], grp['questoes'], marker='o', color='#9E0000', linewidth=2, markerfacecolor='#DAA520')
-                ax_l.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-                ax_l.tick_params(colors='#5D4037', rotation=45, labelsize=8)
-                for spine in ax_l.spines.values(): spine.set_edgecolor('#DAA520')
-                ax_l.grid(color='#5D4037', linestyle=':', alpha=0.2)
-                
-                cl1, cl2, cl3 = st.columns([1, 4, 1])
-                with cl2: st.pyplot(fig_l)
-                plt.close(fig_l) 
-            
-            st.divider()
-            st.subheader("📜 Histórico Editável")
-            # Preparação dos dados para edição
-            df_hist = pd.DataFrame(user_data['logs'])
-            
-            # Garante que colunas essenciais existam no DataFrame
-            for col in ['acordou', 'dormiu']:
-                if col not in df_hist.columns: df_hist[col] = "00:00"
-            if 'questoes_detalhadas' not in df_hist.columns: df_hist['questoes_detalhadas'] = [{} for _ in range(len(df_hist))]
-            
-            def format_details(d):
-                if isinstance(d, dict): return ", ".join([f"{k}: {v}" for k, v in d.items()])
-                return ""
-                
-            df_hist['detalhes_str'] = df_hist['questoes_detalhadas'].apply(format_details)
-            if 'data' in df_hist.columns: df_hist['data'] = pd.to_datetime(df_hist['data']).dt.date
-            
-            # Ajuste: Removido 'estudou' da visualização, mantendo horários
-            cols_to_show = ['data', 'acordou', 'dormiu', 'paginas', 'series', 'questoes', 'detalhes_str']
-            # Intersecção para garantir que colunas existam
-            cols_final = [c for c in cols_to_show if c in df_hist.columns]
-            
-            # --- CORREÇÃO APLICADA AQUI ---
-            # Removido 'disabled=True' da coluna questoes e adicionado min_value
-            edited = st.data_editor(
-                df_hist[cols_final],
-                use_container_width=True, num_rows="dynamic", key="hist_ed",
-                column_config={
-                    "data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
-                    "detalhes_str": st.column_config.TextColumn("Detalhes (Mat: Qtd)", help="Ex: Const: 10, Penal: 5"),
-                    "questoes": st.column_config.NumberColumn("Total Q", min_value=0, step=1), # Agora editável
-                    "acordou": st.column_config.TextColumn("Acordou (HH:MM)"),
-                    "dormiu": st.column_config.TextColumn("Dormiu (HH:MM)")
-                }
-            )
-            
-            if st.button("Salvar Correções"):
-                nl = []
-                for _, r in edited.iterrows():
-                    d_str_val = r['detalhes_str']
-                    new_dets = {}
-                    tq_calc = 0
-                    
-                    # Tenta extrair a quantidade manual que o usuário digitou na coluna
-                    try: manual_q = int(r.get('questoes', 0))
-                    except: manual_q = 0
-
-                    if d_str_val:
-                        parts = str(d_str_val).split(',')
-                        for p in parts:
-                            if ':' in p:
-                                try:
-                                    m, q = p.split(':')
-                                    qtd = int(q.strip())
-                                    new_dets[m.strip()] = qtd
-                                    tq_calc += qtd
-                                except: pass
-                    
-                    # --- LÓGICA DE PREVENÇÃO DE ERROS ---
-                    # Se a soma dos detalhes for maior que 0, usamos ela (consistência).
-                    # Se não houver detalhes (tq_calc == 0), respeitamos o valor manual inserido na coluna "Total Q".
-                    final_q = tq_calc if tq_calc > 0 else manual_q
-
-                    data_val = r['data']
-                    if isinstance(data_val, (date, datetime)): data_val = data_val.strftime("%Y-%m-%d")
-                    
-                    # Lógica Automática: Se tem página ou questão, estudou = True
-                    is_study = (int(r['paginas']) > 0 or final_q > 0)
-
-                    nl.append({
-                        "data": data_val, 
-                        "acordou": str(r.get('acordou', '06:00')), 
-                        "dormiu": str(r.get('dormiu', '22:00')), 
-                        "paginas": int(r['paginas']), 
-                        "series": int(r['series']), 
-                        "questoes": final_q, 
-                        "questoes_detalhadas": new_dets, 
-                        "estudou": is_study
-                    })
-                
-                user_data['logs'] = nl
-                save_current_user_data()
-                st.success("Histórico reescrito!")
+                # Dia dentro do período no arquivo frio: o histórico volta antes de gravar
+                if tiering.covers(user_data, d_log):
+                    try:
+                        tiering.rehydrate_logs(user_data, get_cold_store())
+                    except tiering.ColdObjectMissing as e:
+                        print(f"[Erro Arquivo Frio]: {e}")
+                        st.error("O histórico arquivado desse dia não pôde ser carregado agora; nada foi gravado. Tente de novo em instantes.")
+                        return
+                # Atualiza ou insere log (dia novo mexe na árvore)
+                study_logs.upsert_log(user_data, LogEntry.create(d_log, wt, sl, int(pg), int(ws), q_details), user_series(user, user_data))
+                save_current_user_data(user_data)
+                st.success("Salvo com glória!")
                 time.sleep(1)
                 st.rerun()
-        else: st.info("Sem registros ainda.")
 
-    # --- TAB 3: RANKING ---
-    with tabs[2]:
-        st.header("🏆 Hall da Fama Real")
-        db = data_manager.load()
-        ur = []
-        for u, d in db.items():
-            if u == "global_alerts": continue
-            q = sum([l.get('questoes', 0) for l in d.get('logs', [])])
-            ur.append({"User": u, "Q": q, "Patente": get_patent(q)})
-        
-        ur.sort(key=lambda x: x['Q'], reverse=True)
-        
-        # 1. PRIMEIRO LUGAR (CENTRALIZADO)
-        if len(ur) > 0:
-            p1 = ur[0]
-            # Usa rank-1 (luxuoso)
-            extra_jewel = "<div style='font-size:0.8em; margin-top:5px;'>💎 ♦️ 💎</div>"
-            html_1 = f"""
-            <div class='throne-container'>
-                <div class='throne-card rank-1'>
-                    <div class='laurel-text'>
-                        <span class='laurel-icon'>🌿</span>
-                        <span>👑 {p1['User']}</span>
-                        <span class='laurel-icon'>🌿</span>
-                    </div>
-                    {extra_jewel}
-                    <hr style='border-top: 1px solid rgba(0,0,0,0.1); margin: 10px 0;'>
-                    <p style='margin:0; font-weight:bold; font-size:1.1em;'>{p1['Q']} Questões</p>
-                    <small style='font-style:italic;'>{p1['Patente']}</small>
-                </div>
-            </div>
-            """.replace("\n", " ")
-            st.markdown(html_1, unsafe_allow_html=True)
-        
-        # 2. SEGUNDO E TERCEIRO (LADO A LADO)
-        if len(ur) > 1:
-            c_rank2, c_rank3 = st.columns(2)
-            
-            # Rank 2
-            p2 = ur[1]
-            html_2 = f"""
-            <div class='throne-card rank-2'>
-                <h3>🥈 {p2['User']}</h3>
-                <p style='margin:0; font-weight:bold;'>{p2['Q']} Questões</p>
-                <small>{p2['Patente']}</small>
-            </div>
-            """.replace("\n", " ")
-            with c_rank2:
-                st.markdown(html_2, unsafe_allow_html=True)
-            
-            # Rank 3 (se existir)
-            if len(ur) > 2:
-                p3 = ur[2]
-                html_3 = f"""
-                <div class='throne-card rank-3'>
-                    <h3>🥉 {p3['User']}</h3>
-                    <p style='margin:0; font-weight:bold;'>{p3['Q']} Questões</p>
-                    <small>{p3['Patente']}</small>
-                </div>
-                """.replace("\n", " ")
-                with c_rank3:
-                    st.markdown(html_3, unsafe_allow_html=True)
+# --- TAB 2: DASHBOARD ---
+def render_dashboard(user, user_data):
+    """Aba Dashboard: filtros, gráficos e histórico editável."""
+    st.header("📈 Análise Tática")
+    series = user_series(user, user_data)
+    if user_data['logs']:
+        # -----------------------------------
+        # FILTROS DE INTELIGÊNCIA
+        # -----------------------------------
+        st.markdown("##### 🔍 Filtros Personalizados")
+
+        # Limites do Date Input (datas gravadas como texto, date ou datetime)
+        min_date, max_date = series.date_bounds() or (get_today_br(), get_today_br())
+        # Logs no arquivo frio: o período pode começar antes deles; escolher isso os traz de volta
+        frios = tiering.cold_logs(user_data)
+
+        # Layout dos Filtros
+        c_f1, c_f2 = st.columns([1, 1])
+
+        with c_f1:
+            # Seletor de Período (Padrão: Todo o histórico)
+            date_range = st.date_input(
+                "Período de Análise:",
+                value=(min_date, max_date),
+                min_value=parse_log_date(frios['de']) if frios else min_date,
+                max_value=max_date,
+                format="DD/MM/YYYY"
+            )
+            if frios:
+                st.caption(f"🧊 {frios['dias']} dias até {format_date_br(frios['ate'])} estão arquivados; um início anterior a {format_date_br(min_date)} os traz de volta.")
+                if len(date_range) == 2 and date_range[0] < min_date:
+                    try:
+                        with st.spinner("Buscando o histórico arquivado..."):
+                            tiering.rehydrate_logs(user_data, get_cold_store())
+                            save_current_user_data(user_data)
+                    except tiering.ColdObjectMissing as e:
+                        print(f"[Erro Arquivo Frio]: {e}")
+                        st.error("O histórico arquivado não pôde ser carregado agora; o período mostra só os dias recentes.")
+                    else:
+                        st.rerun()
 
-        st.divider()
-        st.subheader("📜 Lista Geral de Guerreiros")
-        
-        if ur:
-            # Criação da Tabela Nominal
-            df_rank = pd.DataFrame(ur)
-            df_rank.index += 1 # Começar ranking do 1
-            df_rank.reset_index(inplace=True)
-            df_rank.columns = ['Posição', 'Guerreiro', 'Questões', 'Patente']
-            
-            st.dataframe(
-                df_rank,
-                hide_index=True,
-                use_container_width=True,
-                column_config={
-                    "Posição": st.column_config.NumberColumn("Rank", format="#%d", width="small"),
-                    "Guerreiro": st.column_config.TextColumn("Guerreiro", width="medium"),
-                    "Questões": st.column_config.ProgressColumn(
-                        "Poder de Fogo", 
-                        format="%d", 
-                        min_value=0, 
-                        max_value=max(df_rank['Questões']) if not df_rank.empty else 100
-                    ),
-                    "Patente": st.column_config.TextColumn("Patente", width="large"),
-                }
+        with c_f2:
+            # Seletor de Matérias (Padrão: Todas)
+            all_subjects = user_data['subjects_list']
+            selected_subjects = st.multiselect(
+                "Matérias de Interesse:",
+                options=all_subjects,
+                default=all_subjects,
+                placeholder="Selecione as matérias..."
             )
-        else:
-            st.info("O exército ainda está sendo recrutado.")
 
-    # --- TAB 4: AVISOS ---
-    with tabs[3]:
-        st.header("📢 Central de Comandos")
-        
-        # --- ÁREA DO USUÁRIO (LEITURA) ---
-        # 1. Alertas Pessoais
-        if user_data.get('mod_message'):
-            st.markdown(f"""
-            <div class='private-message'>
-                <h3>📨 Mensagem Pessoal do Mentor</h3>
-                {user_data['mod_message']}
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            if user != ADMIN_USER:
-                st.info("Nenhuma mensagem pessoal do mentor.")
+        st.divider()
 
+        # -----------------------------------
+        # PROCESSAMENTO DOS DADOS FILTRADOS
+        # -----------------------------------
+        # Validação do Range de Data (evita erro se usuário selecionar só data inicial)
+        start_d, end_d = min_date, max_date
+        if isinstance(date_range, tuple):
+            if len(date_range) == 2:
+                start_d, end_d = date_range
+            elif len(date_range) == 1:
+                start_d = end_d = date_range[0]
+
+        filtered_q_details, filtered_total = series.questions_by_subject(start_d, end_d, selected_subjects)
+
+        # -----------------------------------
+        # PLOTAGEM DO GRÁFICO
+        # -----------------------------------
+        st.subheader("Distribuição de Questões (Personalizado)")
+        if filtered_q_details:
+            labels = list(filtered_q_details.keys())
+            sizes = list(filtered_q_details.values())
+
+            fig, ax = plt.subplots(figsize=(6, 3))
+            fig.patch.set_facecolor('#F5F4EF')
+            ax.set_facecolor('#F5F4EF')
+
+            # GERAÇÃO DINÂMICA DE CORES (Baseado apenas nas matérias filtradas)
+            colors = generate_distinct_colors(len(labels))
+
+            wedges, _ = ax.pie(sizes, labels=None, startangle=90, colors=colors)
+            legend_labels = [f"{(s/filtered_total)*100:.1f}% - {l}" for l, s in zip(labels, sizes)]
+
+            ax.legend(wedges, legend_labels, title="Matérias", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1), frameon=False, labelcolor='#5D4037')
+            ax.axis('equal')
+
+            c1, c2, c3 = st.columns([1, 2, 1])
+            with c2: render_chart(fig, "distribuicao_materias")
+        else: 
+            st.warning("⚠️ Nenhum registro encontrado para os filtros selecionados.")
+
+        # -----------------------------------
+        # GRÁFICO DE EVOLUÇÃO (MANTIDO GERAL)
+        # -----------------------------------
         st.divider()
+        st.subheader("📈 Evolução de Questões (Histórico Completo)")
+        evo_days, evo_q = series.logged_days()
+        if evo_days.size:
+            fig_l, ax_l = plt.subplots(figsize=(5, 1.5))
+            fig_l.patch.set_facecolor('#F5F4EF')
+            ax_l.set_facecolor('#F5F4EF')
+            ax_l.plot(evo_days, evo_q, marker='o', color='#9E0000', linewidth=2, markerfacecolor='#DAA520')
+            ax_l.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+            ax_l.tick_params(colors='#5D4037', rotation=45, labelsize=8)
+            for spine in ax_l.spines.values(): spine.set_edgecolor('#DAA520')
+            ax_l.grid(color='#5D4037', linestyle=':', alpha=0.2)
+
+            cl1, cl2, cl3 = st.columns([1, 4, 1])
+            with cl2: render_chart(fig_l, "evolucao_questoes")
+
+        render_heatmap(series)
+        render_rolling_averages(series)
 
-        # 2. Alertas Gerais
-        st.subheader("📢 Alertas Gerais")
-        db = data_manager.load() # Reload to get fresh alerts
-        alerts = db.get("global_alerts", [])
-        
-        if not alerts:
-            st.caption("Sem alertas globais no momento.")
-        
-        for i, a in enumerate(alerts):
-            st.markdown(f"<div class='mod-message'><strong>{a['date']}</strong><br>{a['text']}</div>", unsafe_allow_html=True)
-            # Se for admin, mostra botão de apagar aqui mesmo
-            if user == ADMIN_USER:
-                if st.button(f"🗑️ Apagar Alerta #{i+1}", key=f"del_alert_{i}"):
-                    del db["global_alerts"][i]
-                    data_manager.save(db)
-                    st.rerun()
+        st.divider()
+        st.subheader("📜 Histórico Editável")
+        # Preparação dos dados para edição
+        df_hist = pd.DataFrame(user_data['logs'])
+
+        # Garante que colunas essenciais existam no DataFrame
+        for col in ['acordou', 'dormiu']:
+            if col not in df_hist.columns: df_hist[col] = "00:00"
+        if 'questoes_detalhadas' not in df_hist.columns: df_hist['questoes_detalhadas'] = [{} for _ in range(len(df_hist))]
+
+        df_hist['detalhes_str'] = df_hist['questoes_detalhadas'].apply(study_logs.format_details)
+        if 'data' in df_hist.columns: df_hist['data'] = pd.to_datetime(df_hist['data']).dt.date
+
+        # Ajuste: Removido 'estudou' da visualização, mantendo horários
+        cols_to_show = ['data', 'acordou', 'dormiu', 'paginas', 'series', 'questoes', 'detalhes_str']
+        # Intersecção para garantir que colunas existam
+        cols_final = [c for c in cols_to_show if c in df_hist.columns]
+
+        # --- CORREÇÃO APLICADA AQUI ---
+        # Removido 'disabled=True' da coluna questoes e adicionado min_value
+        edited = st.data_editor(
+            df_hist[cols_final],
+            use_container_width=True, num_rows="dynamic", key="hist_ed",
+            column_config={
+                "data": st.column_config.DateColumn("Data", format="DD/MM/YYYY"),
+                "detalhes_str": st.column_config.TextColumn("Detalhes (Mat: Qtd)", help="Ex: Const: 10, Penal: 5"),
+                "questoes": st.column_config.NumberColumn("Total Q", min_value=0, step=1), # Agora editável
+                "acordou": st.column_config.TextColumn("Acordou (HH:MM)"),
+                "dormiu": st.column_config.TextColumn("Dormiu (HH:MM)")
+            }
+        )
+
+        if st.button("Salvar Correções"):
+            # Soma dos detalhes prevalece sobre o total digitado; 'estudou' é recalculado
+            nl = [study_logs.log_from_history_row(r).to_dict() for _, r in edited.iterrows()]
+
+            data_manager.snapshot_now(f"antes de reescrever histórico de {user}")
+            user_data['logs'] = nl
+            progression.refresh_progress(user_data, get_today_br())
+            save_current_user_data(user_data)
+            st.success("Histórico reescrito!")
+            time.sleep(1)
+            st.rerun()
+    else: st.info("Sem registros ainda.")
+
+HEATMAP_CMAP = LinearSegmentedColormap.from_list("sparta", ["#E3DFD3", "#DAA520", "#9E0000"])
+ROLLING_WINDOWS = (7, 30, 90)
+
+def render_heatmap(series):
+    """Mapa de constância estilo calendário: questões por dia de um ano."""
+    st.divider()
+    st.subheader("🗓️ Mapa de Constância")
+    years = series.years()
+    if not years: return
+    ano = st.selectbox("Ano:", years, key="heatmap_ano")
+    grid = series.heatmap(ano)
+    fig, ax = plt.subplots(figsize=(10, 1.8))
+    fig.patch.set_facecolor('#F5F4EF')
+    ax.set_facecolor('#F5F4EF')
+    ax.imshow(grid, cmap=HEATMAP_CMAP, aspect="equal", vmin=0, vmax=max(float(pd.Series(grid.ravel()).quantile(0.95)), 1))
+    ax.set_yticks(range(7), ["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"], fontsize=6, color='#5D4037')
+    ax.set_xticks([])
+    for spine in ax.spines.values(): spine.set_visible(False)
+    render_chart(fig, "mapa_constancia")
+    dias = int((grid > 0).sum())
+    st.caption(f"{dias} dias com questões em {ano} • cor mais forte = mais questões (escala até o percentil 95).")
+
+def render_rolling_averages(series):
+    """Médias móveis de 7/30/90 dias (questões ou páginas) do último ano."""
+    st.divider()
+    st.subheader("📊 Médias Móveis")
+    metrica = st.radio("Métrica:", ["Questões", "Páginas"], horizontal=True, key="media_metrica")
+    column = "questoes" if metrica == "Questões" else "paginas"
+    end = get_today_br()
+    start = end - timedelta(days=364)
+    medias = series.rolling_means(column, ROLLING_WINDOWS, start, end)
+
+    cols = st.columns(len(ROLLING_WINDOWS))
+    for col, w in zip(cols, ROLLING_WINDOWS):
+        col.metric(f"Média {w} dias", f"{medias[w][-1]:.1f}/dia")
+
+    fig, ax = plt.subplots(figsize=(6, 2))
+    fig.patch.set_facecolor('#F5F4EF')
+    ax.set_facecolor('#F5F4EF')
+    days = pd.date_range(start, end)
+    for w, color in zip(ROLLING_WINDOWS, ('#DAA520', '#9E0000', '#5D4037')):
+        ax.plot(days, medias[w], color=color, linewidth=1.5, label=f"{w} dias")
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%y'))
+    ax.tick_params(colors='#5D4037', labelsize=7)
+    ax.legend(frameon=False, fontsize=7, labelcolor='#5D4037')
+    for spine in ax.spines.values(): spine.set_edgecolor('#DAA520')
+    ax.grid(color='#5D4037', linestyle=':', alpha=0.2)
+    render_chart(fig, "medias_moveis")
+
+# --- TAB 3: RANKING ---
+PROMOTIONS_WINDOW_DAYS = 30
+
+def render_ranking(user, user_data):
+    """Aba Ranking: hall da fama de todos os guerreiros."""
+    st.header("🏆 Hall da Fama Real")
+    db = data_manager.load()
+    ur = ranking_rows(db)
+
+    # 1. PRIMEIRO LUGAR (CENTRALIZADO)
+    if len(ur) > 0:
+        p1 = ur[0]
+        # Usa rank-1 (luxuoso)
+        extra_jewel = "<div style='font-size:0.8em; margin-top:5px;'>💎 ♦️ 💎</div>"
+        html_1 = f"""
+        <div class='throne-container'>
+            <div class='throne-card rank-1'>
+                <div class='laurel-text'>
+                    <span class='laurel-icon'>🌿</span>
+                    <span>👑 {p1['User']}</span>
+                    <span class='laurel-icon'>🌿</span>
+                </div>
+                {extra_jewel}
+                <hr style='border-top: 1px solid rgba(0,0,0,0.1); margin: 10px 0;'>
+                <p style='margin:0; font-weight:bold; font-size:1.1em;'>{p1['Q']} Questões</p>
+                <small style='font-style:italic;'>{p1['Patente']}</small>
+            </div>
+        </div>
+        """.replace("\n", " ")
+        st.markdown(html_1, unsafe_allow_html=True)
+
+    # 2. SEGUNDO E TERCEIRO (LADO A LADO)
+    if len(ur) > 1:
+        c_rank2, c_rank3 = st.columns(2)
+
+        # Rank 2
+        p2 = ur[1]
+        html_2 = f"""
+        <div class='throne-card rank-2'>
+            <h3>🥈 {p2['User']}</h3>
+            <p style='margin:0; font-weight:bold;'>{p2['Q']} Questões</p>
+            <small>{p2['Patente']}</small>
+        </div>
+        """.replace("\n", " ")
+        with c_rank2:
+            st.markdown(html_2, unsafe_allow_html=True)
+
+        # Rank 3 (se existir)
+        if len(ur) > 2:
+            p3 = ur[2]
+            html_3 = f"""
+            <div class='throne-card rank-3'>
+                <h3>🥉 {p3['User']}</h3>
+                <p style='margin:0; font-weight:bold;'>{p3['Q']} Questões</p>
+                <small>{p3['Patente']}</small>
+            </div>
+            """.replace("\n", " ")
+            with c_rank3:
+                st.markdown(html_3, unsafe_allow_html=True)
+
+    st.divider()
+    st.subheader("📜 Lista Geral de Guerreiros")
+
+    if ur:
+        # Criação da Tabela Nominal
+        df_rank = pd.DataFrame(ur)
+        df_rank['Desde'] = df_rank['Desde'].map(lambda d: format_date_br(d) if d else "—")
+        df_rank.index += 1 # Começar ranking do 1
+        df_rank.reset_index(inplace=True)
+        df_rank.columns = ['Posição', 'Guerreiro', 'Questões', 'Patente', 'Desde']
+
+        st.dataframe(
+            df_rank,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Posição": st.column_config.NumberColumn("Rank", format="#%d", width="small"),
+                "Guerreiro": st.column_config.TextColumn("Guerreiro", width="medium"),
+                "Questões": st.column_config.ProgressColumn(
+                    "Poder de Fogo", 
+                    format="%d", 
+                    min_value=0, 
+                    max_value=max(df_rank['Questões']) if not df_rank.empty else 100
+                ),
+                "Patente": st.column_config.TextColumn("Patente", width="large"),
+                "Desde": st.column_config.TextColumn("Promovido em", width="small"),
+            }
+        )
+
+        promocoes = progression.recent_promotions(db, get_today_br() - timedelta(days=PROMOTIONS_WINDOW_DAYS))
+        if promocoes:
+            st.subheader(f"🎖️ Promoções dos Últimos {PROMOTIONS_WINDOW_DAYS} Dias")
+            for p in promocoes:
+                st.markdown(f"**{format_date_br(p['Data'])}** — {p['User']} chegou a *{p['Patente']}*")
+    else:
+        st.info("O exército ainda está sendo recrutado.")
+
+# --- TAB 4: AVISOS ---
+def render_alert_page(feed, cursor, key, can_delete=False, channel=alerts.GLOBAL):
+    """Uma página do canal (mais recentes primeiro); avisos depois do cursor saem marcados como novos."""
+    pages = feed.pages()
+    page = st.selectbox("Página", range(pages), format_func=lambda n: f"Página {n + 1} de {pages}", key=key) if pages > 1 else 0
+    for a in feed.page(page):
+        novo = "🆕 " if a['id'] > cursor else ""
+        st.markdown(f"<div class='mod-message'><strong>{novo}{a['data']}</strong><br>{a['texto']}</div>", unsafe_allow_html=True)
+        if can_delete and st.button(f"🗑️ Apagar #{a['id']}", key=f"del_{key}_{a['id']}"):
+            get_alert_store().delete(channel, a['id'])
+            st.rerun()
 
-        # --- ÁREA DO ADMIN (ESCRITA) ---
-        if user == ADMIN_USER:
-            st.divider()
-            st.subheader("🛡️ Painel de Transmissão (Moderador)")
-            
-            with st.container(border=True):
-                mode = st.radio("Destino da Mensagem:", ["📢 Todos (Geral)", "👤 Espartano (Pessoal)"], horizontal=True)
-                
-                if "Todos" in mode:
-                    new_alert_text = st.text_area("Novo Alerta Geral:", height=100)
-                    if st.button("🚀 Publicar para Todos"):
-                        if new_alert_text:
-                            if "global_alerts" not in db: db["global_alerts"] = []
-                            # Insere no início para ser o mais recente
-                            db["global_alerts"].insert(0, {
-                                "date": get_now_br().strftime("%d/%m/%Y %H:%M"), 
-                                "text": new_alert_text
-                            })
-                            data_manager.save(db)
-                            st.success("Alerta Global enviado!")
-                            time.sleep(1)
+def render_avisos(user, user_data):
+    """Aba Avisos: mensagens pessoais, alertas gerais e transmissão do moderador."""
+    st.header("📢 Central de Comandos")
+    store = get_alert_store()
+    cursor_geral = store.cursors.cursor(user, alerts.GLOBAL)
+    cursor_pessoal = store.cursors.cursor(user, user)
+
+    # --- ÁREA DO USUÁRIO (LEITURA) ---
+    # 1. Mensagens Pessoais (histórico, mais recente primeiro)
+    mensagens = store.feed(user)
+    if mensagens.live:
+        st.subheader("📨 Mensagens do Mentor")
+        render_alert_page(mensagens, cursor_pessoal, "pag_mensagens")
+    elif user != ADMIN_USER:
+        st.info("Nenhuma mensagem pessoal do mentor.")
+
+    st.divider()
+
+    # 2. Alertas Gerais
+    st.subheader("📢 Alertas Gerais")
+    geral = store.feed(alerts.GLOBAL)
+    if not geral.live:
+        st.caption("Sem alertas globais no momento.")
+    else:
+        # Se for admin, mostra botão de apagar aqui mesmo
+        render_alert_page(geral, cursor_geral, "pag_alertas", can_delete=(user == ADMIN_USER))
+
+    # Abrir a aba conta como leitura de tudo que existe agora (o moderador vendo o painel do aluno não conta)
+    if st.session_state.get('admin_user') != ADMIN_USER:
+        store.mark_read(user)
+
+    # --- ÁREA DO ADMIN (ESCRITA) ---
+    if user == ADMIN_USER:
+        st.divider()
+        st.subheader("🛡️ Painel de Transmissão (Moderador)")
+        if not store.synced:
+            st.warning("A planilha de avisos não respondeu: os últimos envios estão só neste servidor e sobem no próximo envio.")
+
+        with st.container(border=True):
+            mode = st.radio("Destino da Mensagem:", ["📢 Todos (Geral)", "👤 Espartano (Pessoal)"], horizontal=True)
+
+            if "Todos" in mode:
+                new_alert_text = st.text_area("Novo Alerta Geral:", height=100)
+                if st.button("🚀 Publicar para Todos"):
+                    if new_alert_text:
+                        store.publish(new_alert_text, get_now_br().strftime("%d/%m/%Y %H:%M"))
+                        st.success("Alerta Global enviado!")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.warning("Escreva algo.")
+            else:
+                # Carrega usuários para o selectbox
+                db = data_manager.load()
+                all_users = [u for u in db.keys() if u not in ["global_alerts", ADMIN_USER]]
+                target_u = st.selectbox("Selecione o Soldado:", all_users)
+
+                if target_u:
+                    historico = store.feed(target_u)
+                    lidas = store.cursors.cursor(target_u, target_u)
+                    st.caption(f"{len(historico.live)} mensagem(ns) enviada(s), {historico.unread(lidas)} não lida(s).")
+
+                    msg_text = st.text_area("Nova Mensagem Pessoal:", height=100)
+                    if st.button("📨 Enviar"):
+                        if msg_text:
+                            store.send(target_u, msg_text, get_now_br().strftime("%d/%m/%Y %H:%M"))
+                            st.success(f"Mensagem para {target_u} enviada!")
                             st.rerun()
                         else:
                             st.warning("Escreva algo.")
-                else:
-                    # Carrega usuários para o selectbox
-                    all_users = [u for u in db.keys() if u not in ["global_alerts", ADMIN_USER]]
-                    target_u = st.selectbox("Selecione o Soldado:", all_users)
-                    
-                    if target_u:
-                        current_msg = db[target_u].get("mod_message", "")
-                        st.caption(f"Mensagem atual: {current_msg if current_msg else '(Vazio)'}")
-                        
-                        msg_text = st.text_area("Mensagem Pessoal:", value=current_msg, height=100)
-                        
-                        c_save, c_clear = st.columns(2)
-                        with c_save:
-                            if st.button("💾 Enviar/Atualizar"):
-                                db[target_u]["mod_message"] = msg_text
-                                data_manager.save(db)
-                                st.success(f"Mensagem para {target_u} atualizada!")
-                        with c_clear:
-                            if st.button("🗑️ Apagar Mensagem"):
-                                db[target_u]["mod_message"] = ""
-                                data_manager.save(db)
-                                st.success(f"Mensagem para {target_u} removida!")
-
-    # --- TAB 5: AGENDA ---
-    with tabs[4]:
-        st.header("📅 Agenda")
-        
-        # Seção de Planejamento (existente)
-        st.subheader("Traçar Meta")
-        # Default para amanhã, conforme solicitado
-        plan_date = st.date_input("Data Alvo:", value=get_today_br() + timedelta(days=1), format="DD/MM/YYYY") 
-        pk = plan_date.strftime("%Y-%m-%d")
-        curr = user_data['agendas'].get(pk, "")
-        nt = st.text_area("Plano para este dia:", value=curr, placeholder="Ex. Fazer 2 cadernos do TEC de Constitucional e 1 de Penal.", height=150)
-        
-        if st.button("💾 Salvar Meta"):
-            if nt.strip():
-                user_data['agendas'][pk] = nt
-                save_current_user_data()
-                st.success("Meta definida!")
-            else:
-                if pk in user_data['agendas']:
-                    del user_data['agendas'][pk]
-                    save_current_user_data()
-                    st.success("Meta removida.")
-                else:
-                    st.warning("A meta está vazia.")
+                    if historico.live:
+                        render_alert_page(historico, lidas, f"pag_msg_{target_u}", can_delete=True, channel=target_u)
+
+# --- TAB 5: AGENDA ---
+def render_agenda(user, user_data):
+    """Aba Agenda: metas diárias, metas recorrentes e consistência do planejamento."""
+    st.header("📅 Agenda")
+    index = user_agenda(user, user_data)
+    today = get_today_br()
 
-        st.divider()
-        
-        # Seção de Estatísticas (nova)
-        st.subheader("📊 Consistência do Planejamento")
-        
-        # 1. Identificar meses disponíveis
-        agendas_keys = list(user_data['agendas'].keys())
-        # Convert keys to date objects to sort and extract months
-        dates = []
-        for k in agendas_keys:
-            try:
-                dates.append(datetime.strptime(k, "%Y-%m-%d").date())
-            except: pass
-            
-        # Add current month to ensure it's always an option
-        today = get_today_br()
-        if today not in dates:
-            dates.append(today)
-            
-        # Extract unique months (YYYY-MM)
-        unique_months = sorted(list(set([d.strftime("%Y-%m") for d in dates])), reverse=True)
-        
-        # Formatter for display
-        def format_month(m_str):
-            y, m = m_str.split('-')
-            return f"{m}/{y}"
-            
-        # Selectbox
-        selected_month_str = st.selectbox("Selecione o Mês:", unique_months, format_func=format_month)
-        
-        # Count days planned in selected month
-        count_planned = 0
-        if selected_month_str:
-            y_sel, m_sel = selected_month_str.split('-')
-            for k, v in user_data['agendas'].items():
-                if v and v.strip(): # Check if not empty
-                    try:
-                        kd = datetime.strptime(k, "%Y-%m-%d").date()
-                        if kd.year == int(y_sel) and kd.month == int(m_sel):
-                            count_planned += 1
-                    except: pass
-        
-        # Display Metric
-        st.metric(label=f"Dias Planejados em {format_month(selected_month_str)}", value=f"{count_planned} dias")
-        
-        # Visual feedback (Progress bar)
-        year = int(selected_month_str.split('-')[0])
-        month = int(selected_month_str.split('-')[1])
-        _, num_days = calendar.monthrange(year, month)
-        
-        progress = min(count_planned / num_days, 1.0)
-        st.progress(progress)
-        st.caption(f"Você planejou {int(progress*100)}% dos dias deste mês.")
-
-    # --- TAB 6: COMPORTAMENTO ---
-    with tabs[5]:
-        st.header("🦁 Comportamento")
-        if user_data['logs']:
-            df_beh = pd.DataFrame(user_data['logs'])
-            if 'data' in df_beh.columns:
-                df_beh['dt'] = pd.to_datetime(df_beh['data'])
-                df_beh['month_year'] = df_beh['dt'].dt.strftime('%m/%Y')
-            
-                av_months = sorted(df_beh['month_year'].unique(), reverse=True)
-                sel_m = st.selectbox("Mês:", av_months)
-                df_m = df_beh[df_beh['month_year'] == sel_m]
-                
-                cw, cs, ct, cr = 0, 0, 0, 0
-                for _, r in df_m.iterrows():
-                    tw = parse_time_str_to_obj(str(r.get('acordou', '')))
-                    # Lógica simplificada e segura
-                    if tw and tw < datetime.strptime("06:00", "%H:%M").time(): cw += 1
-                    
-                    ts = parse_time_str_to_obj(str(r.get('dormiu', '')))
-                    if ts and ts >= datetime.strptime("18:00", "%H:%M").time() and ts < datetime.strptime("22:00", "%H:%M").time(): cs += 1
-                    
-                    if int(r.get('series', 0)) > 0: ct += 1
-                    if int(r.get('paginas', 0)) > 0: cr += 1
-                    
-                st.markdown(f"### {sel_m}")
-                c1, c2, c3, c4 = st.columns(4)
-                c1.metric("🌅 < 6h", f"{cw} dias")
-                c2.metric("🌙 < 22h", f"{cs} dias")
-                c3.metric("💪 Treino", f"{ct} dias")
-                c4.metric("📚 Leitura", f"{cr} dias")
-        else: st.info("Sem dados suficientes.")
-
-    # --- TAB 7: MATÉRIAS (NOVA) ---
-    with tabs[6]:
-        st.header("📚 Gerenciar Matérias")
-        st.caption("Adicione ou remova disciplinas do seu plano de estudo.")
-        
-        c_add, c_rem = st.columns(2)
-        
-        with c_add:
-            st.subheader("Adicionar")
-            new_sub = st.text_input("Nova Matéria:")
-            if st.button("➕ Adicionar Matéria", type="primary") and new_sub:
-                if new_sub not in user_data['subjects_list']:
-                    user_data['subjects_list'].append(new_sub)
-                    save_current_user_data()
-                    st.success(f"{new_sub} adicionada com sucesso!")
-                    time.sleep(0.5)
+    # Seção de Planejamento (existente)
+    st.subheader("Traçar Meta")
+    # Default para amanhã, conforme solicitado
+    plan_date = st.date_input("Data Alvo:", value=today + timedelta(days=1), format="DD/MM/YYYY") 
+    curr, recorrente = index.goal_for(user_data['agendas'], plan_date)
+    nt = st.text_area("Plano para este dia:", value=curr, placeholder="Ex. Fazer 2 cadernos do TEC de Constitucional e 1 de Penal.", height=150)
+    if recorrente: st.caption("🔁 Meta recorrente. Salvar aqui cria uma meta só para este dia.")
+
+    if st.button("💾 Salvar Meta"):
+        if agenda.save_goal(user_data, plan_date, nt, index):
+            save_current_user_data(user_data)
+            st.success("Meta definida!" if nt.strip() else "Meta removida.")
+        else:
+            st.warning("A meta está vazia.")
+
+    with st.expander("🔁 Metas Recorrentes"):
+        for i, t in enumerate(list(index.templates)):
+            c_t, c_b = st.columns([5, 1])
+            c_t.write(t.describe())
+            if c_b.button("🗑️", key=f"rem_tpl_{i}"):
+                agenda.remove_template(user_data, i, index)
+                save_current_user_data(user_data)
+                st.rerun()
+        with st.form("form_recorrente", clear_on_submit=True):
+            dias = st.multiselect("Dias da semana:", range(7), format_func=lambda w: agenda.WEEKDAYS[w])
+            texto = st.text_input("Meta:")
+            c_i, c_f = st.columns(2)
+            inicio = c_i.date_input("A partir de:", value=today, format="DD/MM/YYYY")
+            fim = c_f.date_input("Até (opcional):", value=None, format="DD/MM/YYYY")
+            if st.form_submit_button("➕ Adicionar Recorrente"):
+                if dias and texto.strip():
+                    agenda.add_template(user_data, agenda.RecurringGoal(frozenset(dias), texto.strip(), inicio, fim), index)
+                    save_current_user_data(user_data)
                     st.rerun()
                 else:
-                    st.warning("Essa matéria já existe na sua lista.")
-        
-        with c_rem:
-            st.subheader("Remover")
-            rem_sub = st.selectbox("Selecione para remover:", [""] + user_data['subjects_list'])
-            if st.button("🗑️ Remover Matéria") and rem_sub:
-                user_data['subjects_list'].remove(rem_sub)
-                save_current_user_data()
-                st.success(f"{rem_sub} removida!")
+                    st.warning("Escolha os dias e escreva a meta.")
+
+    st.divider()
+
+    # Seção de Estatísticas (nova)
+    st.subheader("📊 Consistência do Planejamento")
+
+    unique_months = index.months_with_goals(today)
+    selected_month_str = st.selectbox("Selecione o Mês:", unique_months, format_func=agenda.format_month, key="agenda_mes")
+    count_planned, num_days = index.planned_days(selected_month_str)
+
+    # Display Metric
+    st.metric(label=f"Dias Planejados em {agenda.format_month(selected_month_str)}", value=f"{count_planned} dias")
+
+    # Visual feedback (Progress bar)
+    progress = min(count_planned / num_days, 1.0)
+    st.progress(progress)
+    st.caption(f"Você planejou {int(progress*100)}% dos dias deste mês.")
+
+    series = user_series(user, user_data)
+    st.subheader("🎯 Planejado x Executado")
+    pve = agenda.planned_vs_executed(index, series, selected_month_str, today)
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("✅ Metas cumpridas", f"{pve['cumpridos']} dias")
+    c2.metric("❌ Metas sem estudo", f"{pve['nao_cumpridos']} dias")
+    c3.metric("📖 Estudo sem meta", f"{pve['sem_meta']} dias")
+    c4.metric("⏳ Metas futuras", f"{pve['futuros']} dias")
+    avaliados = pve['cumpridos'] + pve['nao_cumpridos']
+    if avaliados:
+        st.caption(f"Você cumpriu {pve['cumpridos'] / avaliados:.0%} das metas já vencidas deste mês.")
+
+    st.subheader("📈 Tendência (últimos 6 meses)")
+    trend = index.trend(today.strftime("%Y-%m"), 6)
+    planejado, cumprido = [], []
+    for month, count, days in trend:
+        r = agenda.planned_vs_executed(index, series, month, today)
+        planejado.append(count / days * 100)
+        vencidas = r['cumpridos'] + r['nao_cumpridos']
+        cumprido.append(r['cumpridos'] / vencidas * 100 if vencidas else 0)
+    fig, ax = plt.subplots(figsize=(6, 2))
+    fig.patch.set_facecolor('#F5F4EF')
+    ax.set_facecolor('#F5F4EF')
+    x = range(len(trend))
+    ax.bar([i - 0.2 for i in x], planejado, width=0.4, color='#DAA520', label="% dias planejados")
+    ax.bar([i + 0.2 for i in x], cumprido, width=0.4, color='#9E0000', label="% metas cumpridas")
+    ax.set_xticks(list(x), [agenda.format_month(m) for m, _, _ in trend])
+    ax.set_ylim(0, 100)
+    ax.tick_params(colors='#5D4037', labelsize=7)
+    ax.legend(frameon=False, fontsize=7, labelcolor='#5D4037')
+    for spine in ax.spines.values(): spine.set_edgecolor('#DAA520')
+    render_chart(fig, "tendencia_agenda")
+
+# --- TAB 6: COMPORTAMENTO ---
+def render_comportamento(user, user_data):
+    """Aba Comportamento: hábitos do mês."""
+    st.header("🦁 Comportamento")
+    series = user_series(user, user_data)
+    av_months = routine.series_behavior_months(series)
+    if av_months:
+        sel_m = st.selectbox("Mês:", av_months, key="comp_mes")
+        hab = routine.series_month_behavior(series, sel_m)
+
+        st.markdown(f"### {sel_m}")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("🌅 < 6h", f"{hab['acordou_cedo']} dias")
+        c2.metric("🌙 < 22h", f"{hab['dormiu_cedo']} dias")
+        c3.metric("💪 Treino", f"{hab['treino']} dias")
+        c4.metric("📚 Leitura", f"{hab['leitura']} dias")
+        render_sleep_routine(series)
+    else: st.info("Sem dados suficientes.")
+
+ROUTINE_PERIODS = {"30 dias": 30, "90 dias": 90, "1 ano": 365}
+
+def render_sleep_routine(series):
+    """Sono, regularidade dos horários, sono x rendimento e carga semanal de treino."""
+    st.divider()
+    st.subheader("😴 Sono e Rotina")
+    periodo = st.radio("Período:", list(ROUTINE_PERIODS), horizontal=True, key="rotina_periodo")
+    end = get_today_br()
+    rep = routine_analytics.routine_report(series, end - timedelta(days=ROUTINE_PERIODS[periodo] - 1), end)
+    fmt = routine_analytics.format_clock
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("🛌 Sono médio", "—" if rep.sono_medio_h is None else f"{rep.sono_medio_h:.1f} h",
+              help=None if rep.sono_desvio_h is None else f"Desvio-padrão: {rep.sono_desvio_h:.1f} h")
+    c2.metric("🌅 Acorda em média", fmt(rep.acordar_medio))
+    c3.metric("📏 Regularidade (acordar)", "—" if rep.acordar_desvio_min is None else f"± {rep.acordar_desvio_min:.0f} min",
+              help="Desvio-padrão do horário de acordar: quanto menor, mais regular a rotina.")
+    c4.metric("🌙 Dorme em média", fmt(rep.dormir_medio),
+              help=None if rep.dormir_desvio_min is None else f"± {rep.dormir_desvio_min:.0f} min")
+
+    st.caption(f"Sono da noite anterior x questões do dia: **{routine_analytics.describe_correlation(rep.corr_sono_questoes)}** • "
+               f"x páginas: **{routine_analytics.describe_correlation(rep.corr_sono_paginas)}**")
+
+    c_s, c_t = st.columns(2)
+    with c_s:
+        fig, ax = plt.subplots(figsize=(4, 2))
+        fig.patch.set_facecolor('#F5F4EF')
+        ax.set_facecolor('#F5F4EF')
+        ax.plot(rep.dias, rep.sono_h, marker='o', markersize=2, color='#5D4037', linewidth=1)
+        if rep.sono_medio_h is not None: ax.axhline(rep.sono_medio_h, color='#9E0000', linestyle='--', linewidth=1)
+        ax.set_title("Horas de sono", fontsize=8, color='#5D4037')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+        ax.tick_params(colors='#5D4037', labelsize=6)
+        for spine in ax.spines.values(): spine.set_edgecolor('#DAA520')
+        render_chart(fig, "horas_sono")
+    with c_t:
+        fig, ax = plt.subplots(figsize=(4, 2))
+        fig.patch.set_facecolor('#F5F4EF')
+        ax.set_facecolor('#F5F4EF')
+        ax.bar(rep.semanas, rep.carga_semanal, width=5, color='#DAA520')
+        ax.set_title("Séries de musculação por semana", fontsize=8, color='#5D4037')
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+        ax.tick_params(colors='#5D4037', labelsize=6)
+        for spine in ax.spines.values(): spine.set_edgecolor('#DAA520')
+        render_chart(fig, "carga_treino")
+    if rep.dias_treino.size:
+        st.caption(f"Treinos nesta semana: {int(rep.dias_treino[-1])} dia(s) • média do período: {rep.dias_treino.mean():.1f} dia(s)/semana.")
+
+# --- TAB 7: MATÉRIAS (NOVA) ---
+def render_materias(user, user_data):
+    """Aba Matérias: gerenciar a lista de disciplinas."""
+    st.header("📚 Gerenciar Matérias")
+    st.caption("Adicione ou remova disciplinas do seu plano de estudo.")
+
+    c_add, c_rem = st.columns(2)
+
+    with c_add:
+        st.subheader("Adicionar")
+        new_sub = st.text_input("Nova Matéria:")
+        if st.button("➕ Adicionar Matéria", type="primary") and new_sub:
+            if new_sub not in user_data['subjects_list']:
+                user_data['subjects_list'].append(new_sub)
+                save_current_user_data(user_data)
+                st.success(f"{new_sub} adicionada com sucesso!")
                 time.sleep(0.5)
                 st.rerun()
-                
-        st.divider()
-        st.markdown("### 📋 Lista Atual")
-        st.write(", ".join(user_data['subjects_list']))
+            else:
+                st.warning("Essa matéria já existe na sua lista.")
+
+    with c_rem:
+        st.subheader("Remover")
+        rem_sub = st.selectbox("Selecione para remover:", [""] + user_data['subjects_list'])
+        if st.button("🗑️ Remover Matéria") and rem_sub:
+            user_data['subjects_list'].remove(rem_sub)
+            save_current_user_data(user_data)
+            st.success(f"{rem_sub} removida!")
+            time.sleep(0.5)
+            st.rerun()
 
-    # --- TAB 8: SIMULADOS (ATUALIZADA) ---
-    with tabs[7]:
-        st.header("📝 Batalhas e Simulados")
-        simulados_db = load_simulados()
-        
-        if not simulados_db:
-            st.info("Nenhum simulado disponível no momento. O Mestre de Armas está preparando novas batalhas.")
+    st.divider()
+    st.markdown("### 📋 Lista Atual")
+    st.write(", ".join(user_data['subjects_list']))
+
+# --- TAB 8: SIMULADOS (ATUALIZADA) ---
+def attempt_order(sim_key, questoes, sim_stats, ordem, attempt):
+    """
+    Ordem das questões fixada por tentativa: cada resposta muda as estatísticas
+    da coorte, mas a navegação (por posição) não pode mudar no meio da tentativa.
+    Refeita só quando o simulado, a opção de ordem ou a tentativa mudam.
+    """
+    if ordem == "Original": return questoes
+    key = f"ordem_questoes_{sim_key}"
+    saved = st.session_state.get(key)
+    if not saved or (saved["ordem"], saved["tentativa"], saved["total"]) != (ordem, attempt, len(questoes)):
+        pos = {id(q): i for i, q in enumerate(questoes)}
+        ordered = question_stats.order_by_difficulty(questoes, sim_stats, hardest_first=(ordem == "Mais difíceis primeiro"))
+        saved = st.session_state[key] = {"ordem": ordem, "tentativa": attempt, "total": len(questoes), "posicoes": [pos[id(q)] for q in ordered]}
+    return [questoes[i] for i in saved["posicoes"]]
+
+def render_simulados(user, user_data):
+    """Aba Simulados: resolução e visão do mentor."""
+    is_real_admin = (user == ADMIN_USER)
+    is_admin_mode = (st.session_state.get('admin_user') == ADMIN_USER)
+    st.header("📝 Batalhas e Simulados")
+    simulados_db = load_simulados()
+
+    if not simulados_db:
+        st.info("Nenhum simulado disponível no momento. O Mestre de Armas está preparando novas batalhas.")
+    else:
+        sim_opts = list(simulados_db.keys())
+        sim_titles = {k: v.get("titulo", k) for k, v in simulados_db.items()}
+
+        c_sel, c_admin = st.columns([3, 1])
+        with c_sel:
+            selected_sim_key = st.selectbox("Escolha sua Batalha:", sim_opts, format_func=lambda x: sim_titles[x], key="sim_sel")
+            ordem = st.radio("Ordem das questões:", ["Original", "Mais difíceis primeiro", "Mais fáceis primeiro"], horizontal=True, key="ordem_simulado")
+
+        sim_data = simulados_db[selected_sim_key]
+        sim_materia = sim_data.get("materia", "Geral")
+        questoes = sim_data.get("questoes", [])
+        total_questoes = len(questoes)
+
+        # Estatísticas pré-calculadas da coorte (nenhuma varredura de usuários aqui)
+        sim_stats = get_question_stats().simulado_stats(selected_sim_key)
+
+        # --- MODO ADMIN / VISÃO DO MENTOR ---
+        modo_mentor = False
+        if is_real_admin or is_admin_mode:
+            with c_admin:
+                st.write("") 
+                st.write("")
+                modo_mentor = st.checkbox("👁️ Visão do Mentor")
+
+        if modo_mentor:
+            if ordem != "Original":
+                questoes = question_stats.order_by_difficulty(questoes, sim_stats, hardest_first=(ordem == "Mais difíceis primeiro"))
+            st.markdown(f"### 👁️ Gabarito Integral: {sim_titles[selected_sim_key]}")
+            st.info("Modo de leitura ativado. Mecânica de testes suspensa.")
+            if is_real_admin and st.button("🔄 Recalcular Estatísticas da Coorte"):
+                get_question_stats().refresh(data_manager.load())
+                st.rerun()
+            for i, q in enumerate(questoes, 1):
+                q_stats = sim_stats.get(str(q.get("id", i)))
+                if q_stats:
+                    disc = q_stats.get("discriminacao")
+                    disc_txt = f"{disc:+.2f}" if disc is not None else "—"
+                    resumo = f" | 🎯 {q_stats['acuracia']*100:.0f}% de acerto em {q_stats['tentativas']} tentativas | Discriminação: {disc_txt}"
+                else:
+                    resumo = " | Sem tentativas"
+                with st.expander(f"Questão {i} - Gabarito Oficial: {q.get('resposta_correta')}{resumo}"):
+                    st.markdown(f"<p style='color:#5D4037;'><strong>Enunciado:</strong> {q.get('enunciado')}</p>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='mod-message' style='border-left-color:#DAA520;'><strong>Justificativa:</strong> {q.get('justificativa')}</div>", unsafe_allow_html=True)
         else:
-            # Assegura a estrutura de dados de progresso no JSON
-            if 'simulados_progress' not in user_data:
-                user_data['simulados_progress'] = {}
-                
-            sim_opts = list(simulados_db.keys())
-            sim_titles = {k: v.get("titulo", k) for k, v in simulados_db.items()}
-            
-            c_sel, c_admin = st.columns([3, 1])
-            with c_sel:
-                selected_sim_key = st.selectbox("Escolha sua Batalha:", sim_opts, format_func=lambda x: sim_titles[x])
-            
-            sim_data = simulados_db[selected_sim_key]
-            sim_materia = sim_data.get("materia", "Geral")
-            questoes = sim_data.get("questoes", [])
-            total_questoes = len(questoes)
-            
-            # --- MODO ADMIN / VISÃO DO MENTOR ---
-            modo_mentor = False
-            if is_real_admin or is_admin_mode:
-                with c_admin:
-                    st.write("") 
-                    st.write("")
-                    modo_mentor = st.checkbox("👁️ Visão do Mentor")
-            
-            if modo_mentor:
-                st.markdown(f"### 👁️ Gabarito Integral: {sim_titles[selected_sim_key]}")
-                st.info("Modo de leitura ativado. Mecânica de testes suspensa.")
-                for i, q in enumerate(questoes, 1):
-                    with st.expander(f"Questão {i} - Gabarito Oficial: {q.get('resposta_correta')}"):
-                        st.markdown(f"<p style='color:#5D4037;'><strong>Enunciado:</strong> {q.get('enunciado')}</p>", unsafe_allow_html=True)
-                        st.markdown(f"<div class='mod-message' style='border-left-color:#DAA520;'><strong>Justificativa:</strong> {q.get('justificativa')}</div>", unsafe_allow_html=True)
+            # --- MODO ESTUDANTE (RESOLUÇÃO) ---
+            progress = simulado_progress.get_progress(user_data, selected_sim_key)
+            questoes = attempt_order(selected_sim_key, questoes, sim_stats, ordem, len(progress.get("historico", [])))
+
+            # --- VERIFICAÇÃO DE FINALIZAÇÃO DA TENTATIVA ATUAL ---
+            if simulado_progress.finish_if_complete(progress, total_questoes, get_now_br().strftime("%d/%m/%Y %H:%M")):
+                save_current_user_data(user_data)
+
+            # --- EXIBIÇÃO DO TÍTULO E HISTÓRICO FIXO ---
+            st.markdown("---")
+            st.markdown(f"<h3 style='color: #9E0000; margin-bottom: 0;'>{sim_titles[selected_sim_key]}</h3>", unsafe_allow_html=True)
+            st.caption(f"🛡️ Disciplina: {sim_materia} | Total: {total_questoes} questões")
+
+            historico = simulado_progress.history(progress)
+            if historico:
+                with st.expander("🏆 Histórico de Conclusões", expanded=True):
+                    for hist in historico:
+                        st.markdown(f"<div style='background-color: #E3DFD3; padding: 10px; border-radius: 5px; margin-bottom: 5px; border-left: 4px solid #DAA520; color: #5D4037; font-size: 0.9em;'><strong>📅 {hist.data}</strong> | Modo: <em>{hist.modo}</em> | Desempenho: <strong>{hist.acertos} / {hist.total} acertos ({hist.percentual:.1f}%)</strong></div>", unsafe_allow_html=True)
+
+            # --- PAINEL VISUAL (GRID DE NAVEGAÇÃO NATIVA) ---
+            st.markdown("<h5 style='color: #5D4037; margin-top: 15px;'>Navegação Rápida</h5>", unsafe_allow_html=True)
+
+            nav_key = f"nav_{selected_sim_key}"
+            if nav_key not in st.session_state:
+                st.session_state[nav_key] = 1
+
+            # Organiza os botões em colunas para ficarem lado a lado e perfeitamente clicáveis
+            cols_per_row = 10
+            for i in range(0, total_questoes, cols_per_row):
+                cols = st.columns(cols_per_row)
+                for j in range(cols_per_row):
+                    idx = i + j
+                    if idx < total_questoes:
+                        q_num = idx + 1
+                        q_id = str(questoes[idx].get("id", q_num))
+
+                        # Define o ícone com base no status da resposta salva
+                        resposta = simulado_progress.answer_of(progress, q_id)
+                        btn_icon = "⬜" if resposta is None else ("✅" if resposta["acertou"] else "❌")
+
+                        # O botão nativo atualiza o nav_key ao ser clicado
+                        if cols[j].button(f"{btn_icon} {q_num}", key=f"grid_nav_{selected_sim_key}_{q_id}", use_container_width=True):
+                            st.session_state[nav_key] = q_num
+                            st.rerun()
+
+            st.markdown("---")
+
+            # --- MODO DE RESOLUÇÃO OU RELATÓRIO FINAL ---
+            if not progress.get("em_andamento", True):
+                # --- TELA DE SIMULADO FINALIZADO ---
+                acertos = simulado_progress.count_correct(progress)
+                pct = (acertos / total_questoes) * 100
+
+                st.markdown(f"""
+                <div style='background: linear-gradient(135deg, #E3DFD3, #F5F4EF); border: 2px solid #9E0000; border-radius: 12px; padding: 25px; text-align: center; box-shadow: 0 4px 10px rgba(0,0,0,0.1); margin-bottom: 20px;'>
+                    <h2 style='color: #9E0000; margin: 0;'>🛡️ Batalha Concluída!</h2>
+                    <p style='font-size: 1.3em; color: #5D4037; margin-top: 15px;'>
+                        Seu desempenho atual: <strong>{acertos}</strong> acertos de <strong>{total_questoes}</strong> embates ({pct:.1f}%).
+                    </p>
+                </div>
+                """, unsafe_allow_html=True)
+
+                st.markdown("### 🔄 Iniciar Nova Tentativa")
+                c_ref1, c_ref2 = st.columns(2)
+
+                with c_ref1:
+                    if st.button("🔄 Refazer Simulado Completo", use_container_width=True, type="primary"):
+                        simulado_progress.restart_full(user_data, selected_sim_key)
+                        save_current_user_data(user_data)
+                        st.session_state[nav_key] = 1
+                        st.rerun()
+
+                with c_ref2:
+                    if st.button("🎯 Refazer Apenas as Erradas", use_container_width=True):
+                        # Apaga apenas as respostas que foram incorretas
+                        simulado_progress.restart_wrong_only(progress)
+                        save_current_user_data(user_data)
+                        st.session_state[nav_key] = 1
+                        st.rerun()
+
+                st.divider()
+
+                # Salvar log no diário
+                if progress.get("log_salvo_no_diario"):
+                    st.success("✅ O saldo da sua primeira vitória nesta batalha já foi forjado em seu Diário!")
+                else:
+                    if st.button("💾 Gravar Conquista no Diário e Regar a Árvore", use_container_width=True):
+                        study_logs.add_questions_to_day(user_data, get_today_br(), sim_materia, total_questoes, user_series(user, user_data))
+                        progress["log_salvo_no_diario"] = True
+                        save_current_user_data(user_data)
+                        st.success("Conquista forjada com sucesso! A Glória o aguarda.")
+                        time.sleep(2)
+                        st.rerun()
+
             else:
-                # --- MODO ESTUDANTE (RESOLUÇÃO) ---
-                if selected_sim_key not in user_data['simulados_progress']:
-                    user_data['simulados_progress'][selected_sim_key] = {}
-                progress = user_data['simulados_progress'][selected_sim_key]
-                
-                # --- VERIFICAÇÃO DE FINALIZAÇÃO DA TENTATIVA ATUAL ---
-                def contar_respondidas(prog):
-                    return sum(1 for k, v in prog.items() if isinstance(v, dict) and "acertou" in v)
-                
-                respondidas = contar_respondidas(progress)
-                em_andamento = progress.get("em_andamento", True)
-                
-                if respondidas == total_questoes and total_questoes > 0 and em_andamento:
-                    # O simulado acaba de ser finalizado
-                    acertos = sum(1 for k, v in progress.items() if isinstance(v, dict) and v.get("acertou"))
-                    modo_atual = "Somente Erradas" if progress.get("modo_repescagem") else "Completo"
-                    
-                    if "historico" not in progress:
-                        progress["historico"] = []
-                        
-                    progress["historico"].append({
-                        "data": get_now_br().strftime("%d/%m/%Y %H:%M"),
-                        "modo": modo_atual,
-                        "acertos": acertos,
-                        "total": total_questoes
-                    })
-                    progress["em_andamento"] = False
-                    save_current_user_data()
-
-                # --- EXIBIÇÃO DO TÍTULO E HISTÓRICO FIXO ---
-                st.markdown("---")
-                st.markdown(f"<h3 style='color: #9E0000; margin-bottom: 0;'>{sim_titles[selected_sim_key]}</h3>", unsafe_allow_html=True)
-                st.caption(f"🛡️ Disciplina: {sim_materia} | Total: {total_questoes} questões")
-                
-                historico = progress.get("historico", [])
-                if historico:
-                    with st.expander("🏆 Histórico de Conclusões", expanded=True):
-                        for hist in historico:
-                            pct_hist = (hist.get('acertos', 0) / max(hist.get('total', 1), 1)) * 100
-                            st.markdown(f"<div style='background-color: #E3DFD3; padding: 10px; border-radius: 5px; margin-bottom: 5px; border-left: 4px solid #DAA520; color: #5D4037; font-size: 0.9em;'><strong>📅 {hist['data']}</strong> | Modo: <em>{hist['modo']}</em> | Desempenho: <strong>{hist['acertos']} / {hist['total']} acertos ({pct_hist:.1f}%)</strong></div>", unsafe_allow_html=True)
-
-                # --- PAINEL VISUAL (GRID DE NAVEGAÇÃO NATIVA) ---
-                st.markdown("<h5 style='color: #5D4037; margin-top: 15px;'>Navegação Rápida</h5>", unsafe_allow_html=True)
-                
-                nav_key = f"nav_{selected_sim_key}"
-                if nav_key not in st.session_state:
-                    st.session_state[nav_key] = 1
-
-                # Organiza os botões em colunas para ficarem lado a lado e perfeitamente clicáveis
-                cols_per_row = 10
-                for i in range(0, total_questoes, cols_per_row):
-                    cols = st.columns(cols_per_row)
-                    for j in range(cols_per_row):
-                        idx = i + j
-                        if idx < total_questoes:
-                            q_num = idx + 1
-                            q_id = str(questoes[idx].get("id", q_num))
-                            
-                            # Define o ícone com base no status da resposta salva
-                            btn_icon = "⬜" # Padrão
-                            if q_id in progress and isinstance(progress[q_id], dict) and "acertou" in progress[q_id]:
-                                if progress[q_id]["acertou"]:
-                                    btn_icon = "✅"
-                                else:
-                                    btn_icon = "❌"
-                            
-                            # O botão nativo atualiza o nav_key ao ser clicado
-                            if cols[j].button(f"{btn_icon} {q_num}", key=f"grid_nav_{selected_sim_key}_{q_id}", use_container_width=True):
-                                st.session_state[nav_key] = q_num
-                                st.rerun()
-
-                st.markdown("---")
-                
-                # --- MODO DE RESOLUÇÃO OU RELATÓRIO FINAL ---
-                if not progress.get("em_andamento", True):
-                    # --- TELA DE SIMULADO FINALIZADO ---
-                    acertos = sum(1 for k, v in progress.items() if isinstance(v, dict) and v.get("acertou"))
-                    pct = (acertos / total_questoes) * 100
-                    
-                    st.markdown(f"""
-                    <div style='background: linear-gradient(135deg, #E3DFD3, #F5F4EF); border: 2px solid #9E0000; border-radius: 12px; padding: 25px; text-align: center; box-shadow: 0 4px 10px rgba(0,0,0,0.1); margin-bottom: 20px;'>
-                        <h2 style='color: #9E0000; margin: 0;'>🛡️ Batalha Concluída!</h2>
-                        <p style='font-size: 1.3em; color: #5D4037; margin-top: 15px;'>
-                            Seu desempenho atual: <strong>{acertos}</strong> acertos de <strong>{total_questoes}</strong> embates ({pct:.1f}%).
-                        </p>
+                # --- NAVEGAÇÃO DE QUESTÕES (EM ANDAMENTO) ---
+                c_prev, c_space, c_next = st.columns([1, 2, 1])
+                with c_prev:
+                    if st.button("⬅️ Anterior", use_container_width=True) and st.session_state[nav_key] > 1:
+                        st.session_state[nav_key] -= 1
+                        st.rerun()
+                with c_next:
+                    if st.button("Próxima ➡️", use_container_width=True) and st.session_state[nav_key] < total_questoes:
+                        st.session_state[nav_key] += 1
+                        st.rerun()
+
+                # --- RENDERIZAÇÃO DA QUESTÃO ATUAL ---
+                current_q_idx = st.session_state[nav_key] - 1
+                q_data = questoes[current_q_idx]
+                q_id = str(q_data.get("id", current_q_idx + 1))
+                gabarito = q_data.get("resposta_correta")
+                is_answered = (q_id in progress and isinstance(progress[q_id], dict))
+
+                st.markdown(f"""
+                <div style='background-color: #F5F4EF; border: 2px solid #DAA520; border-radius: 8px; padding: 25px; margin-top: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.05);'>
+                    <div style='display:flex; justify-content:space-between; align-items:center; border-bottom: 1px solid #E3DFD3; padding-bottom: 10px; margin-bottom: 15px;'>
+                        <h5 style='color: #9E0000; margin: 0;'>Questão {current_q_idx + 1}</h5>
+                        <span style='color: #8C7B75; font-size: 0.8em;'>ID: {q_id}</span>
                     </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown("### 🔄 Iniciar Nova Tentativa")
-                    c_ref1, c_ref2 = st.columns(2)
-                    
-                    with c_ref1:
-                        if st.button("🔄 Refazer Simulado Completo", use_container_width=True, type="primary"):
-                            historico_salvo = progress.get("historico", [])
-                            log_diario = progress.get("log_salvo_no_diario", False)
-                            
-                            user_data['simulados_progress'][selected_sim_key] = {
-                                "historico": historico_salvo,
-                                "em_andamento": True,
-                                "modo_repescagem": False,
-                                "log_salvo_no_diario": log_diario
-                            }
-                            save_current_user_data()
-                            st.session_state[nav_key] = 1
-                            st.rerun()
-                            
-                    with c_ref2:
-                        if st.button("🎯 Refazer Apenas as Erradas", use_container_width=True):
-                            # Varre e deleta apenas as respostas que foram incorretas
-                            keys_to_remove = [k for k, v in progress.items() if isinstance(v, dict) and v.get("acertou") == False]
-                            for k in keys_to_remove:
-                                del progress[k]
-                                
-                            progress["em_andamento"] = True
-                            progress["modo_repescagem"] = True
-                            save_current_user_data()
-                            st.session_state[nav_key] = 1
+                    <p style='font-size: 1.15em; color: #5D4037; line-height: 1.6;'>{q_data.get("enunciado")}</p>
+                </div>
+                """, unsafe_allow_html=True)
+
+                st.write("") # Espaço
+
+                # Lógica da Trava de Segurança
+                default_idx = None
+                if is_answered:
+                    resp_salva = progress[q_id].get("resposta")
+                    default_idx = 0 if resp_salva == "Certo" else 1
+
+                user_resp = st.radio(
+                    "Sua Tática:", 
+                    ["Certo", "Errado"], 
+                    index=default_idx, 
+                    disabled=is_answered, # Desabilita se já respondeu
+                    label_visibility="collapsed", # Esconde o texto "Sua Tática:"
+                    key=f"radio_{selected_sim_key}_{q_id}"
+                )
+
+                if not is_answered:
+                    if st.button("⚔️ Golpear (Responder)", type="primary", key=f"btn_resp_{selected_sim_key}_{q_id}"):
+                        if user_resp:
+                            simulado_progress.record_answer(progress, q_id, user_resp, gabarito)
+                            save_current_user_data(user_data)
                             st.rerun()
-                            
-                    st.divider()
-                    
-                    # Salvar log no diário
-                    if progress.get("log_salvo_no_diario"):
-                        st.success("✅ O saldo da sua primeira vitória nesta batalha já foi forjado em seu Diário!")
+                        else:
+                            st.warning("Selecione sua arma ('Certo' ou 'Errado') antes de golpear.")
+                else:
+                    # Feedbacks e Justificativas só aparecem pós-bloqueio
+                    acertou = progress[q_id].get("acertou")
+                    if acertou:
+                        st.success(f"**Acerto Glorioso!** O gabarito é **{gabarito}**.")
                     else:
-                        if st.button("💾 Gravar Conquista no Diário e Regar a Árvore", use_container_width=True):
-                            d_str = get_today_br().strftime("%Y-%m-%d")
-                            q_details = {sim_materia: total_questoes}
-                            new_log = {
-                                "data": d_str, "acordou": "06:00", "dormiu": "22:00", 
-                                "paginas": 0, "series": 0, "questoes": total_questoes, 
-                                "questoes_detalhadas": q_details, "estudou": True
-                            }
-                            
-                            exists = False
-                            for idx, l in enumerate(user_data['logs']):
-                                if l['data'] == new_log['data']:
-                                    user_data['logs'][idx]['questoes'] = user_data['logs'][idx].get('questoes', 0) + total_questoes
-                                    user_data['logs'][idx]['estudou'] = True
-                                    if sim_materia not in user_data['logs'][idx]['questoes_detalhadas']:
-                                        user_data['logs'][idx]['questoes_detalhadas'][sim_materia] = 0
-                                    user_data['logs'][idx]['questoes_detalhadas'][sim_materia] += total_questoes
-                                    exists = True
-                                    break
-                            if not exists:
-                                user_data['logs'].append(new_log)
-                                user_data['tree_branches'] += 1 
-                            
-                            progress["log_salvo_no_diario"] = True
-                            save_current_user_data()
-                            st.success("Conquista forjada com sucesso! A Glória o aguarda.")
-                            time.sleep(2)
-                            st.rerun()
+                        st.error(f"**Golpe Falho.** Sua resposta foi '{progress[q_id].get('resposta')}', mas o correto era **{gabarito}**.")
 
-                else:
-                    # --- NAVEGAÇÃO DE QUESTÕES (EM ANDAMENTO) ---
-                    c_prev, c_space, c_next = st.columns([1, 2, 1])
-                    with c_prev:
-                        if st.button("⬅️ Anterior", use_container_width=True) and st.session_state[nav_key] > 1:
-                            st.session_state[nav_key] -= 1
-                            st.rerun()
-                    with c_next:
-                        if st.button("Próxima ➡️", use_container_width=True) and st.session_state[nav_key] < total_questoes:
-                            st.session_state[nav_key] += 1
-                            st.rerun()
-                            
-                    # --- RENDERIZAÇÃO DA QUESTÃO ATUAL ---
-                    current_q_idx = st.session_state[nav_key] - 1
-                    q_data = questoes[current_q_idx]
-                    q_id = str(q_data.get("id", current_q_idx + 1))
-                    gabarito = q_data.get("resposta_correta")
-                    is_answered = (q_id in progress and isinstance(progress[q_id], dict))
-                    
                     st.markdown(f"""
-                    <div style='background-color: #F5F4EF; border: 2px solid #DAA520; border-radius: 8px; padding: 25px; margin-top: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.05);'>
-                        <div style='display:flex; justify-content:space-between; align-items:center; border-bottom: 1px solid #E3DFD3; padding-bottom: 10px; margin-bottom: 15px;'>
-                            <h5 style='color: #9E0000; margin: 0;'>Questão {current_q_idx + 1}</h5>
-                            <span style='color: #8C7B75; font-size: 0.8em;'>ID: {q_id}</span>
-                        </div>
-                        <p style='font-size: 1.15em; color: #5D4037; line-height: 1.6;'>{q_data.get("enunciado")}</p>
+                    <div style='background-color: #E3DFD3; border-left: 4px solid #DAA520; padding: 15px; border-radius: 4px; color: #5D4037;'>
+                        <strong>📖 Pergaminho de Justificativa:</strong><br>{q_data.get('justificativa')}
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    st.write("") # Espaço
-
-                    # Lógica da Trava de Segurança
-                    default_idx = None
-                    if is_answered:
-                        resp_salva = progress[q_id].get("resposta")
-                        default_idx = 0 if resp_salva == "Certo" else 1
-
-                    user_resp = st.radio(
-                        "Sua Tática:", 
-                        ["Certo", "Errado"], 
-                        index=default_idx, 
-                        disabled=is_answered, # Desabilita se já respondeu
-                        label_visibility="collapsed", # Esconde o texto "Sua Tática:"
-                        key=f"radio_{selected_sim_key}_{q_id}"
-                    )
-                    
-                    if not is_answered:
-                        if st.button("⚔️ Golpear (Responder)", type="primary", key=f"btn_resp_{selected_sim_key}_{q_id}"):
-                            if user_resp:
-                                acertou = (user_resp == gabarito)
-                                progress[q_id] = {
-                                    "resposta": user_resp,
-                                    "acertou": acertou
-                                }
-                                save_current_user_data()
-                                st.rerun()
-                            else:
-                                st.warning("Selecione sua arma ('Certo' ou 'Errado') antes de golpear.")
-                    else:
-                        # Feedbacks e Justificativas só aparecem pós-bloqueio
-                        acertou = progress[q_id].get("acertou")
-                        if acertou:
-                            st.success(f"**Acerto Glorioso!** O gabarito é **{gabarito}**.")
-                        else:
-                            st.error(f"**Golpe Falho.** Sua resposta foi '{progress[q_id].get('resposta')}', mas o correto era **{gabarito}**.")
-                        
-                        st.markdown(f"""
-                        <div style='background-color: #E3DFD3; border-left: 4px solid #DAA520; padding: 15px; border-radius: 4px; color: #5D4037;'>
-                            <strong>📖 Pergaminho de Justificativa:</strong><br>{q_data.get('justificativa')}
-                        </div>
-                        """, unsafe_allow_html=True)
-
-    # --- TAB 9: ADMIN (SE TIVER PERMISSÃO) ---
-    if user == ADMIN_USER:
-        with tabs[8]:
-            st.header("🛡️ Moderação")
-            ca, cd = st.columns(2)
-            with ca:
-                st.subheader("Recrutar")
-                with st.form("new_usr"):
-                    nu = st.text_input("User")
-                    np = st.text_input("Pass", type="password")
-                    if st.form_submit_button("Criar"):
-                        db = data_manager.load()
-                        if nu not in db:
-                            db[nu] = {
-                                "password": hash_password(np), # Hash aqui também
-                                "logs": [], "agendas": {}, "tree_branches": 1, 
-                                "created_at": str(datetime.now()), "mod_message": ""
-                            }
-                            data_manager.save(db)
-                            st.success("Recruta adicionado!")
-                        else: st.error("Já existe.")
-            with cd:
-                st.subheader("Banir")
+
+# --- TAB 9: ADMIN (SE TIVER PERMISSÃO) ---
+def save_batch(db, touched=(), removed=()):
+    """Fecha um lote do moderador: uma gravação local, um sync e os caches e tabelas acertados uma vez só."""
+    with st.spinner("Gravando e sincronizando..."):
+        data_manager.save(db)
+    get_user_cache().invalidate()
+    # O esboço frio não leva simulados_progress: as respostas de quem congelou seguem na dificuldade
+    get_question_stats().update_users(db, [u for u in touched if not tiering.is_cold(db.get(u))])
+    get_cohort_analytics().update_users(db, touched)
+    for u in removed:
+        get_question_stats().remove_user(u)
+        get_cohort_analytics().remove_user(u)
+
+def render_bulk_admin():
+    """Operações em lote: recrutas por CSV, banir/arquivar, matérias e mensagens para vários usuários."""
+    st.subheader("📦 Operações em Lote")
+    t_csv, t_status, t_mat, t_msg = st.tabs(["📥 Importar Recrutas", "🚫 Banir/Arquivar", "📚 Matérias", "📨 Mensagens"])
+
+    with t_csv:
+        st.caption("CSV com cabeçalho usuario[,senha][,materias]. Senha vazia é gerada; matérias separadas por '|'.")
+        arquivo_csv = st.file_uploader("Arquivo CSV:", type=["csv", "txt"], key="csv_recrutas")
+        if arquivo_csv is not None and st.button("📥 Importar Recrutas"):
+            recrutas, erros = bulk_admin.parse_recruits(arquivo_csv.getvalue().decode("utf-8-sig"))
+            db = data_manager.load()
+            barra = st.progress(0.0, text="Gerando senhas...")
+            rel = bulk_admin.import_recruits(db, recrutas, get_now_br(), progress=lambda n, total: barra.progress(n / total, text=f"{n}/{total} recrutas"))
+            if rel['criados']: save_batch(db, touched=[r.usuario for r in rel['criados']])
+            barra.progress(1.0, text="Concluído")
+            st.success(f"{len(rel['criados'])} recrutas criados, {len(rel['existentes'])} já existiam.")
+            if rel['existentes']: st.caption("Já existiam: " + ", ".join(rel['existentes']))
+            for erro in erros + rel['erros']:
+                st.warning(f"Ignorado — {erro}")
+            st.session_state['senhas_lote'] = bulk_admin.credentials_csv(rel['criados'])
+        if st.session_state.get('senhas_lote', "").count("\n") > 1:
+            st.download_button("🔑 Baixar Senhas Geradas (.csv)", st.session_state['senhas_lote'], "senhas_recrutas.csv", "text/csv")
+
+    db = data_manager.load()
+    usuarios = [u for u, d in db.items() if u not in ["global_alerts", ADMIN_USER] and isinstance(d, dict)]
+
+    def rotulo(u):
+        return f"{u} (arquivado)" if is_archived(db[u]) else u
+
+    with t_status:
+        alvos = st.multiselect("Espartanos:", usuarios, format_func=rotulo, key="lote_status")
+        c_arq, c_rea, c_ban = st.columns(3)
+        with c_arq:
+            if st.button("🗄️ Arquivar", disabled=not alvos):
+                feitos = bulk_admin.archive_users(db, alvos, get_now_br())
+                if feitos: save_batch(db, touched=feitos)
+                st.success(f"{len(feitos)} arquivado(s).")
+        with c_rea:
+            if st.button("♻️ Reativar", disabled=not alvos):
+                feitos = bulk_admin.reactivate_users(db, alvos)
+                if feitos: save_batch(db, touched=feitos)
+                st.success(f"{len(feitos)} reativado(s).")
+        with c_ban:
+            confirma = st.checkbox("Confirmo o banimento", key="lote_confirma_ban")
+            if st.button("🚫 Banir", disabled=not (alvos and confirma)):
+                data_manager.snapshot_now(f"antes de banir {len(alvos)} usuário(s) em lote")
+                feitos = bulk_admin.ban_users(db, alvos)
+                save_batch(db, removed=feitos)
+                st.success(f"{len(feitos)} banido(s).")
+                time.sleep(1)
+                st.rerun()
+
+    with t_mat:
+        alvos = st.multiselect("Espartanos:", usuarios, format_func=rotulo, key="lote_materias")
+        materias = st.text_input("Matérias (separadas por vírgula):", key="lote_lista_materias")
+        substituir = st.radio("Aplicar como:", ["Acrescentar às atuais", "Substituir a lista"], horizontal=True, key="lote_modo_materias") == "Substituir a lista"
+        if st.button("📚 Aplicar Matérias", disabled=not (alvos and materias.strip())):
+            if substituir: data_manager.snapshot_now(f"antes de substituir matérias de {len(alvos)} usuário(s)")
+            feitos = bulk_admin.assign_subjects(db, alvos, materias.split(","), replace=substituir)
+            if feitos: save_batch(db, touched=feitos)
+            st.success(f"Matérias atualizadas para {len(feitos)} usuário(s).")
+
+    with t_msg:
+        alvos = st.multiselect("Espartanos:", usuarios, format_func=rotulo, key="lote_mensagem")
+        todos = st.checkbox("Todos os ativos", key="lote_msg_todos")
+        texto = st.text_area("Mensagem Pessoal:", height=100, key="lote_msg_texto")
+        destino = [u for u in usuarios if not is_archived(db[u])] if todos else alvos
+        if st.button(f"📨 Enviar para {len(destino)}", disabled=not (destino and texto)):
+            n = get_alert_store().send_many(destino, texto, get_now_br().strftime("%d/%m/%Y %H:%M"))
+            st.success(f"Mensagem enviada para {n} espartano(s).")
+
+def cold_counts(db):
+    """(usuários no arquivo frio, usuários com logs antigos arquivados)."""
+    return (sum(1 for d in db.values() if tiering.is_cold(d)),
+            sum(1 for d in db.values() if isinstance(d, dict) and tiering.cold_logs(d)))
+
+def render_tiering():
+    """Arquivamento em camadas: congela usuários inativos e logs antigos no arquivo frio."""
+    st.subheader("🧊 Arquivamento em Camadas")
+    db = data_manager.load()
+    frios, com_logs_frios = cold_counts(db)
+    st.caption(f"{frios} usuário(s) no arquivo frio, {com_logs_frios} com logs antigos arquivados. O arquivo frio fica em '{tiering.COLD_DIR}/' e na aba '{tiering.COLD_SHEET}' da planilha; os backups completos já o incluem.")
+    c_ina, c_hor = st.columns(2)
+    with c_ina: dias_inativo = st.number_input("Inativo há (dias):", min_value=30, value=tiering.INACTIVE_DAYS, step=30)
+    with c_hor: horizonte = st.number_input("Logs mais antigos que (dias):", min_value=90, value=tiering.LOG_HORIZON_DAYS, step=30)
+    if st.button("🧊 Aplicar Arquivamento"):
+        data_manager.snapshot_now("antes do arquivamento em camadas")
+        rel = tiering.apply_policy(db, get_cold_store(), get_today_br(), int(dias_inativo), int(horizonte), protected={ADMIN_USER})
+        # Logs congelados não listam o usuário no relatório: todos passam (assinatura igual não reagrega)
+        if rel['usuarios'] or rel['logs']: save_batch(db, touched=list(db))
+        st.success(f"{len(rel['usuarios'])} usuário(s) congelado(s), {rel['logs']} log(s) antigos arquivados. "
+                   f"Banco quente: {rel['bytes_antes'] / 1e6:.2f} MB → {rel['bytes_depois'] / 1e6:.2f} MB.")
+        for erro in rel['erros']:
+            st.warning(f"Não arquivado — {erro}")
+
+def render_admin(user, user_data):
+    """Aba Admin: recrutamento, banimento, restauração e análise da coorte."""
+    st.header("🛡️ Moderação")
+    ca, cd = st.columns(2)
+    with ca:
+        st.subheader("Recrutar")
+        with st.form("new_usr"):
+            nu = st.text_input("User")
+            np = st.text_input("Pass", type="password")
+            if st.form_submit_button("Criar"):
                 db = data_manager.load()
-                usrs = [u for u in db.keys() if u not in ["global_alerts", ADMIN_USER]]
-                if usrs:
-                    target = st.selectbox("Alvo:", usrs)
-                    if st.button("Banir"):
-                        del db[target]
-                        data_manager.save(db)
-                        st.success("Banido!")
-                        time.sleep(1)
-                        st.rerun()
-                else: st.info("Ninguém para banir.")
+                if nu not in db:
+                    db[nu] = new_user_record(credentials.hash_password(np), get_now_br()) # Hash aqui também
+                    data_manager.save(db)
+                    get_cohort_analytics().update_user(nu, db[nu])
+                    st.success("Recruta adicionado!")
+                else: st.error("Já existe.")
+    with cd:
+        st.subheader("Banir")
+        db = data_manager.load()
+        usrs = [u for u in db.keys() if u not in ["global_alerts", ADMIN_USER]]
+        if usrs:
+            target = st.selectbox("Alvo:", usrs)
+            if st.button("Banir"):
+                data_manager.snapshot_now(f"antes de banir {target}")
+                del db[target]
+                data_manager.save(db)
+                get_user_cache().invalidate(target)
+                get_question_stats().remove_user(target)
+                get_cohort_analytics().remove_user(target)
+                st.success("Banido!")
+                time.sleep(1)
+                st.rerun()
+        else: st.info("Ninguém para banir.")
+
+    st.divider()
+    render_bulk_admin()
+
+    st.divider()
+    render_tiering()
+
+    with st.expander("🚀 Preparação do servidor"):
+        preparo = get_warmup()
+        st.caption("Pronta." if preparo.ready else f"Em andamento: {preparo.current()}")
+        st.dataframe(pd.DataFrame([
+            {"Etapa": e["etapa"], "Estado": e["estado"], "Tempo (s)": round(e["segundos"], 2), "Erro": e["erro"] or ""}
+            for e in preparo.status()
+        ]), hide_index=True, use_container_width=True)
+
+    st.divider()
+    st.subheader("♻️ Restaurar Backup")
+    arquivo_backup = st.file_uploader("Arquivo de backup (.jsonl.gz ou .json legado):", type=["gz", "jsonl", "json"])
+    modo_restauro = st.radio("Modo:", ["mesclar", "substituir"], horizontal=True, format_func=lambda m: "Mesclar (preserva dados atuais)" if m == "mesclar" else "Substituir registros")
+    if arquivo_backup is not None and st.button("♻️ Restaurar"):
+        data_manager.snapshot_now("antes de restaurar backup")
+        db = data_manager.load()
+        barra = st.progress(0.0, text="Restaurando...")
+        try:
+            rel = backup.restore(db, arquivo_backup, mode=modo_restauro, progress=lambda n, total: barra.progress(min(n / max(total or n, 1), 1.0), text=f"{n} registros processados..."))
+        except ValueError as e:
+            st.error(f"Backup rejeitado: {e}")
+        else:
+            alerts.import_legacy(get_alert_store(), db)
+            data_manager.save(db)
+            get_user_cache().invalidate()
+            get_question_stats().refresh(db)
+            get_cohort_analytics().refresh(db)
+            barra.progress(1.0, text="Concluído")
+            st.success(f"{rel['processados']} registros: {rel['novos']} novos, {rel['mesclados']} mesclados, {rel['substituidos']} substituídos.")
+            for erro in rel['erros']:
+                st.warning(f"Ignorado — {erro}")
+
+    st.divider()
+    st.subheader("🕰️ Pontos de Restauração")
+    snaps = list(reversed(data_manager.snapshot_store.list_snapshots()))
+    if snaps:
+        snap_labels = {s['id']: f"{datetime.fromisoformat(s['criado_em']).astimezone(BRT).strftime('%d/%m/%Y %H:%M:%S')} — {s['motivo']} ({s['novos_objetos']} alterados)" for s in snaps}
+        snap_id = st.selectbox("Snapshot:", list(snap_labels), format_func=lambda i: snap_labels[i])
+        db = data_manager.load()
+        # Inclui quem só existe no snapshot (ex.: usuário banido por engano)
+        chaves_snap = data_manager.snapshot_store.load_manifest(snap_id)["registros"].keys()
+        alvos = sorted(set(db.keys()) | set(chaves_snap))
+        alvo_restauro = st.selectbox("Restaurar:", ["(Banco completo)"] + alvos, key="alvo_snapshot")
+        if st.button("🕰️ Voltar no Tempo"):
+            data_manager.snapshot_now("antes de restaurar snapshot")
+            if alvo_restauro == "(Banco completo)":
+                db = data_manager.snapshot_store.restore_db(snap_id)
+            else:
+                registro = data_manager.snapshot_store.restore_record(snap_id, alvo_restauro)
+                if registro is None:
+                    st.error(f"{alvo_restauro} não existia nesse snapshot.")
+                    st.stop()
+                db[alvo_restauro] = registro
+            alerts.import_legacy(get_alert_store(), db)
+            data_manager.save(db)
+            get_user_cache().invalidate()
+            get_question_stats().refresh(db)
+            get_cohort_analytics().refresh(db)
+            st.success("Restaurado!")
+            time.sleep(1)
+            st.rerun()
+    else:
+        st.caption("Nenhum snapshot gravado ainda.")
+
+    st.divider()
+    st.subheader("📊 Análise da Coorte")
+    c_info, c_refresh = st.columns([3, 1])
+    with c_refresh:
+        if st.button("🔄 Atualizar Análise"):
+            get_cohort_analytics().refresh(data_manager.load())
+            st.rerun()
+    report = get_cohort_analytics().report(get_today_br())
+    with c_info:
+        st.caption(f"{report['total_usuarios']} guerreiros resumidos | Última atualização: {report['atualizado_em'] or '—'}")
+        # Arquivados e frios ficam fora dos resumos; dos ativos, só os logs quentes entram
+        db_coorte = data_manager.load()
+        fora_coorte = sum(1 for u, d in db_coorte.items() if u != "global_alerts" and isinstance(d, dict) and (is_archived(d) or tiering.is_cold(d)))
+        com_logs_frios = cold_counts(db_coorte)[1]
+        fora = ([f"{fora_coorte} guerreiro(s) arquivado(s) ou no arquivo frio"] if fora_coorte else []) + \
+               ([f"o histórico arquivado de {com_logs_frios} guerreiro(s)"] if com_logs_frios else [])
+        if fora: st.caption(f"🧊 Fora destes números: {' e '.join(fora)}.")
+
+    st.markdown("##### 🗓️ Guerreiros Ativos por Dia (30 dias)")
+    df_ativos = pd.DataFrame(report['ativos_por_dia'], columns=["Dia", "Ativos"]).set_index("Dia")
+    st.bar_chart(df_ativos, color="#9E0000")
+
+    c_mat, c_fogo = st.columns(2)
+    with c_mat:
+        st.markdown("##### ⚔️ Questões por Matéria (Coorte)")
+        if report['questoes_por_materia']:
+            st.bar_chart(pd.DataFrame(report['questoes_por_materia'], columns=["Matéria", "Questões"]).set_index("Matéria"), color="#DAA520")
+        else: st.caption("Sem questões registradas.")
+    with c_fogo:
+        st.markdown("##### 🔥 Distribuição de Fogo (dias)")
+        st.bar_chart(pd.DataFrame(list(report['distribuicao_fogo'].items()), columns=["Faixa", "Guerreiros"]).set_index("Faixa"), color="#5D4037")
+
+    st.markdown("##### ⚠️ Guerreiros em Risco")
+    if report['em_risco']:
+        st.dataframe(pd.DataFrame(report['em_risco']).rename(columns={"usuario": "Guerreiro", "ultimo_estudo": "Último Estudo", "ramos": "Ramos", "motivo": "Motivo"}), hide_index=True, use_container_width=True)
+    else:
+        st.success("Nenhum guerreiro em risco. O exército marcha firme!")
+
+    st.divider()
+    st.subheader("⏱️ Desempenho")
+    if not instrumentation.ENABLED:
+        st.info("Instrumentação desligada (SPARTA_METRICS=0).")
+        return
+    linhas = instrumentation.registry.summary()
+    if not linhas:
+        st.caption("Nenhuma operação medida ainda neste processo.")
+    else:
+        st.caption(f"Medições do processo desde {datetime.fromtimestamp(instrumentation.registry.started_at, BRT).strftime('%d/%m/%Y %H:%M')}. Tempos em ms; percentis sobre as amostras mais recentes.")
+        st.dataframe(pd.DataFrame([{
+            "Operação": r["operacao"] + "".join(f" [{v}]" for v in r["rotulos"].values()),
+            "Chamadas": r["n"],
+            "p50": round(r["p50_s"] * 1000, 1), "p95": round(r["p95_s"] * 1000, 1), "p99": round(r["p99_s"] * 1000, 1),
+            "Máx": round(r["max_s"] * 1000, 1), "Total (s)": round(r["total_s"], 2),
+        } for r in linhas]), hide_index=True, use_container_width=True)
+    c_json, c_prom, c_zera = st.columns(3)
+    with c_json: st.download_button("Exportar JSON", instrumentation.registry.to_json(), "desempenho.json", "application/json")
+    with c_prom: st.download_button("Exportar Prometheus", instrumentation.registry.to_prometheus(), "desempenho.prom", "text/plain")
+    with c_zera:
+        if st.button("Zerar Medições"):
+            instrumentation.registry.reset()
+            st.rerun()
+
+
+# --- NAVEGAÇÃO POR SEÇÕES ---
+SECTION_RENDERERS = {
+    "📊 Diário": render_diario,
+    "📈 Dashboard": render_dashboard,
+    "🏆 Ranking": render_ranking,
+    "📢 Avisos": render_avisos,
+    "📅 Agenda": render_agenda,
+    "🦁 Comportamento": render_comportamento,
+    "📚 Matérias": render_materias,
+    "📝 Simulados": render_simulados,
+    "🛡️ Admin": render_admin,
+}
+ADMIN_SECTION = "🛡️ Admin"
+SECTIONS = [s for s in SECTION_RENDERERS if s != ADMIN_SECTION]
+
+# Widgets cujas escolhas devem sobreviver à troca de seção. O Streamlit descarta
+# o estado de widgets que não foram desenhados no rerun; regravar a chave no
+# início de cada execução mantém o valor até o widget voltar a aparecer.
+PERSISTENT_WIDGET_KEYS = ("sim_sel", "ordem_simulado", "agenda_mes", "comp_mes", "alvo_snapshot", "heatmap_ano", "media_metrica", "rotina_periodo")
+
+def keep_section_state():
+    for k in PERSISTENT_WIDGET_KEYS:
+        if k in st.session_state:
+            st.session_state[k] = st.session_state[k]
+
+def record_section_time(secao, elapsed):
+    """Guarda o último tempo de renderização (s) de cada seção nesta sessão."""
+    st.session_state.setdefault('tempos_secao', {})[secao] = elapsed
+
+def render_section_timings(secao):
+    """Relatório para o moderador: custo da seção atual vs. desenhar todas as abas a cada rerun."""
+    tempos = st.session_state.get('tempos_secao', {})
+    if secao not in tempos: return
+    with st.expander("⏱️ Tempo de renderização por seção"):
+        total = sum(tempos.values())
+        st.caption(f"Esta seção: {tempos[secao]*1000:.0f} ms | Todas as seções já visitadas (custo das abas antigas): {total*1000:.0f} ms")
+        st.dataframe(
+            pd.DataFrame([{"Seção": s, "Último tempo (ms)": round(t * 1000, 1)} for s, t in sorted(tempos.items(), key=lambda x: -x[1])]),
+            hide_index=True, use_container_width=True,
+        )
+
 
 # --- EXECUÇÃO ---
-if 'user' not in st.session_state: login_page()
-else: main_app()
+def main():
+    st.set_page_config(
+        page_title="Mentor SpartaJus",
+        page_icon="🏛️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+    get_warmup()
+    with instrumentation.span("rerun"):
+        if 'user' not in st.session_state: login_page()
+        else: main_app()
+
+
+if __name__ == "__main__":
+    main()